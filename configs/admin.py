@@ -1,6 +1,29 @@
 from django.contrib import admin
-from .models import ConfigRecord
+from .models import ConfigRecord, ConfigRevision, TargetGroup, UpdateJob, UpdateJobChunk
+from .store import get_config_store
 
 # Register your models here.
 
-admin.site.register(ConfigRecord)
+
+@admin.register(ConfigRecord)
+class ConfigRecordAdmin(admin.ModelAdmin):
+    """Admin edits bypass the config store, so report them to it like store writes"""
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        get_config_store().changed([obj.name])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        get_config_store().changed([obj.name])
+
+    def delete_queryset(self, request, queryset):
+        names = list(queryset.values_list('name', flat=True))
+        super().delete_queryset(request, queryset)
+        get_config_store().changed(names)
+
+
+admin.site.register(UpdateJob)
+admin.site.register(UpdateJobChunk)
+admin.site.register(ConfigRevision)
+admin.site.register(TargetGroup)
@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class ConfigsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'configs'
+
+    def ready(self):
+        # Connect the records_changed receivers
+        from . import cache, changes, history, keyindex  # noqa: F401
+
+        # Listeners only apply to clients created after registering, which
+        # happens before any database connection is opened
+        try:
+            from pymongo import monitoring
+        except ImportError:
+            return
+        from .instrumentation import pool_wait_listener
+        monitoring.register(pool_wait_listener())
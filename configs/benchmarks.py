@@ -0,0 +1,231 @@
+import json
+import os
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+
+from django.test import Client
+from django.test.utils import override_settings
+
+from .diff import color_diff, diff_configs, format_config_for_display, parse_formatted_config, render_diff_html
+from .operations import apply_operations_to_config, compile_operations, parse_config_string, stringify_config_object
+from .parallel import apply_plan_many, get_process_pool, preview_many
+from .store import get_config_store
+from .synthetic import generate_fleet
+
+
+STORE_BACKENDS = {
+    'memory': 'configs.store.MemoryConfigStore',
+    'django': 'configs.store.DjangoConfigStore',
+    'mongo': 'configs.store.MongoConfigStore',
+}
+
+# Operations used by every benchmark: edits are idempotent, so repeated runs of
+# the update benchmark keep working on the same data
+BENCHMARK_OPERATIONS = [
+    {'category': 'config1', 'op': 'edit', 'key': 'KEY1', 'value': 'edited', 'caseSensitive': False},
+    {'category': 'config1', 'op': 'delete', 'key': 'key2', 'value': '', 'caseSensitive': True},
+    {'category': 'config2', 'op': 'edit', 'key': 'newkey', 'value': 'added', 'caseSensitive': True},
+]
+
+# name -> function(fixture) returning the callable to time
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+class BenchmarkFixture:
+    """Synthetic fleet, compiled operations and derived inputs shared by the benchmarks"""
+
+    def __init__(self, records, categories, keys, value_length, duplication, batch, seed=0):
+        self.params = {
+            'records': records,
+            'categories': categories,
+            'keys': keys,
+            'value_length': value_length,
+            'duplication': duplication,
+            'batch': batch,
+            'seed': seed,
+        }
+        self.fleet = dict(generate_fleet(
+            records, categories=categories, keys=keys, value_length=value_length,
+            duplication=duplication, seed=seed, prefix='bench'
+        ))
+        self.names = list(self.fleet)[:batch]
+        self.configs = [self.fleet[name] for name in self.names]
+        self.plan = compile_operations(BENCHMARK_OPERATIONS)
+        self.category_strings = [config.get('config1', '') for config in self.configs]
+        self.category_objects = [parse_config_string(value) for value in self.category_strings]
+        self.formatted = [format_config_for_display(config) for config in self.configs]
+        self.new_configs = [self._apply(config) for config in self.configs]
+        self.new_formatted = [format_config_for_display(config) for config in self.new_configs]
+
+    def _apply(self, config):
+        new_config = dict(config)
+        for group in self.plan:
+            obj = apply_operations_to_config(parse_config_string(new_config.get(group.category, '')), group.operations)
+            new_config[group.category] = stringify_config_object(obj)
+        return new_config
+
+
+@benchmark('parse_config_string')
+def bench_parse(fixture):
+    return lambda: [parse_config_string(value) for value in fixture.category_strings]
+
+
+@benchmark('apply_operations_to_config')
+def bench_apply(fixture):
+    operations = fixture.plan[0].operations
+    return lambda: [apply_operations_to_config(obj, operations) for obj in fixture.category_objects]
+
+
+@benchmark('stringify_config_object')
+def bench_stringify(fixture):
+    return lambda: [stringify_config_object(obj) for obj in fixture.category_objects]
+
+
+@benchmark('parse_formatted_config')
+def bench_parse_formatted(fixture):
+    return lambda: [parse_formatted_config(value) for value in fixture.formatted]
+
+
+@benchmark('color_diff')
+def bench_color_diff(fixture):
+    pairs = list(zip(fixture.formatted, fixture.new_formatted))
+    return lambda: [color_diff(old, new) for old, new in pairs]
+
+
+@benchmark('diff_configs')
+def bench_diff_configs(fixture):
+    pairs = list(zip(fixture.configs, fixture.new_configs))
+    return lambda: [render_diff_html(diff_configs(old, new)) for old, new in pairs]
+
+
+@benchmark('api_get_configs')
+def bench_api_get_configs(fixture):
+    client = Client()
+    return lambda: client.get('/api/configs/')
+
+
+@benchmark('api_get_configs_page')
+def bench_api_get_configs_page(fixture):
+    client = Client()
+    return lambda: client.get('/api/configs/', {'draw': 1, 'start': 0, 'length': 50, 'search[value]': 'bench'})
+
+
+@benchmark('api_preview_configs')
+def bench_api_preview_configs(fixture):
+    client = Client()
+    body = json.dumps({'names': fixture.names, 'operations': BENCHMARK_OPERATIONS})
+    return lambda: client.post('/api/preview/', body, content_type='application/json')
+
+
+@benchmark('api_update_configs')
+def bench_api_update_configs(fixture):
+    client = Client()
+    body = json.dumps({'names': fixture.names, 'operations': BENCHMARK_OPERATIONS})
+    return lambda: client.post('/api/update/', body, content_type='application/json')
+
+
+def time_callable(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return {
+        'median_ms': statistics.median(timings) * 1000,
+        'best_ms': min(timings) * 1000,
+        'runs': repeat,
+    }
+
+
+def run_benchmarks(fixture, repeat=5, store='memory', selected=None):
+    """
+    Run the selected benchmarks (all by default) against a fleet seeded into the
+    given store and return a JSON-ready report.
+    """
+    selected = selected or list(BENCHMARKS)
+    # Preview tokens and background jobs would skew the view timings
+    with override_settings(
+        CONFIG_STORE={'BACKEND': STORE_BACKENDS[store], 'OPTIONS': {}},
+        CONFIG_JOBS={'ASYNC_THRESHOLD': len(fixture.names) + 1},
+        ALLOWED_HOSTS=['testserver'],
+    ):
+        config_store = get_config_store()
+        config_store.upsert_many(fixture.fleet)
+        try:
+            results = {name: time_callable(BENCHMARKS[name](fixture), repeat) for name in selected}
+        finally:
+            config_store.delete_many(list(fixture.fleet))
+
+    return {
+        'meta': {
+            **fixture.params,
+            'store': store,
+            'repeat': repeat,
+            'python': platform.python_version(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        },
+        'results': results,
+    }
+
+
+def run_scaling_benchmark(fixture, workers, chunk_size, repeat=5):
+    """
+    Time applying and previewing the plan over the whole fleet in-process and
+    sharded over pools of each worker count. Returns a JSON-ready report with
+    the speedup of every run against the in-process one.
+    """
+    configs = list(fixture.fleet.values())
+    items = list(fixture.fleet.items())
+    workloads = {
+        'apply': lambda: apply_plan_many(configs, fixture.plan, create_categories=True),
+        'preview': lambda: preview_many(items, fixture.plan, 'json', {}, {}, {}),
+    }
+
+    results = {}
+    with override_settings(CONFIG_PARALLEL={'ENABLED': False}):
+        results['in-process'] = {name: time_callable(func, repeat) for name, func in workloads.items()}
+    for count in workers:
+        with override_settings(CONFIG_PARALLEL={'THRESHOLD': 0, 'WORKERS': count, 'CHUNK_SIZE': chunk_size}):
+            # Start the workers before timing: a server pays this once
+            list(get_process_pool().map(abs, range(count)))
+            results[f'{count} workers'] = {name: time_callable(func, repeat) for name, func in workloads.items()}
+
+    baseline = results['in-process']
+    for result in results.values():
+        for name, timing in result.items():
+            timing['speedup'] = baseline[name]['median_ms'] / timing['median_ms'] if timing['median_ms'] else 0
+    return {
+        'meta': {
+            **fixture.params,
+            'chunk_size': chunk_size,
+            'repeat': repeat,
+            'cpus': os.cpu_count(),
+            'python': platform.python_version(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        },
+        'results': results,
+    }
+
+
+def compare_reports(report, baseline, tolerance=0.2):
+    """
+    Compare median timings with a baseline report.
+    Returns a list of (name, baseline_ms, current_ms, ratio, regressed) tuples.
+    """
+    comparison = []
+    for name, result in report['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        ratio = result['median_ms'] / previous['median_ms'] if previous['median_ms'] else float('inf')
+        comparison.append((name, previous['median_ms'], result['median_ms'], ratio, ratio > 1 + tolerance))
+    return comparison
@@ -0,0 +1,133 @@
+import hashlib
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.dispatch import receiver
+
+from .signals import records_changed
+
+
+DEFAULT_CONFIG_CACHE = {
+    'ENABLED': False,
+    'ALIAS': 'default',  # Entry of settings.CACHES to use (locmem, file-based, ...)
+    'TIMEOUT': 300,  # Seconds listings and records stay cached
+    # Seconds a process trusts its cached collection version. Writes update it
+    # right away in a shared cache (file, memcached); with locmem, other
+    # processes see the new version after at most this delay.
+    'VERSION_TIMEOUT': 5,
+    'KEY_PREFIX': 'configs',
+}
+
+
+def get_cache_settings():
+    return {**DEFAULT_CONFIG_CACHE, **getattr(settings, 'CONFIG_CACHE', {})}
+
+
+class CacheStats:
+    """Hit and miss counters per kind of cached value"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def record(self, kind, hits, misses):
+        with self._lock:
+            self._counts[kind, 'hits'] += hits
+            self._counts[kind, 'misses'] += misses
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        report = {}
+        for (kind, outcome), count in counts.items():
+            report.setdefault(kind, {'hits': 0, 'misses': 0})[outcome] = count
+        return report
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+stats = CacheStats()
+
+
+def _cache():
+    options = get_cache_settings()
+    return (caches[options['ALIAS']], options) if options['ENABLED'] else (None, options)
+
+
+def _key(options, *parts):
+    return ':'.join([options['KEY_PREFIX'], *map(str, parts)])
+
+
+def _record_key(options, version, name):
+    # Names may contain characters cache backends reject in keys
+    return _key(options, 'record', version, hashlib.blake2b(name.encode(), digest_size=16).hexdigest())
+
+
+def cached_version(store):
+    """The store's collection version, read through the cache"""
+    cache, options = _cache()
+    if cache is None:
+        return store.version()
+    key = _key(options, 'version')
+    version = cache.get(key)
+    stats.record('version', version is not None, version is None)
+    if version is None:
+        version = store.version()
+        cache.set(key, version, options['VERSION_TIMEOUT'])
+    return version
+
+
+def cached_listing(version, params, build):
+    """
+    Return build() for a listing identified by params (a sequence of request
+    parameters), cached under a key that includes the collection version, so a
+    write makes every cached listing unreachable.
+    """
+    cache, options = _cache()
+    if cache is None:
+        return build()
+    digest = hashlib.blake2b(repr(tuple(params)).encode(), digest_size=16).hexdigest()
+    key = _key(options, 'listing', version, digest)
+    value = cache.get(key)
+    stats.record('listing', value is not None, value is None)
+    if value is None:
+        value = build()
+        cache.set(key, value, options['TIMEOUT'])
+    return value
+
+
+def cached_records(store, names, version=None):
+    """
+    store.get_many(names), serving the records found in the cache from it.
+    Like listings, records are cached under the collection version (read
+    through the cache unless given), so processes that missed a write stop
+    serving its records once they see the new version.
+    """
+    cache, options = _cache()
+    if cache is None:
+        return store.get_many(names)
+    if version is None:
+        version = cached_version(store)
+    keys = {name: _record_key(options, version, name) for name in dict.fromkeys(names)}
+    found = cache.get_many(list(keys.values()))
+    configs = {name: found[key] for name, key in keys.items() if key in found}
+    missing = [name for name in keys if name not in configs]
+    stats.record('record', len(configs), len(missing))
+    if missing:
+        loaded = store.get_many(missing)
+        cache.set_many({keys[name]: config for name, config in loaded.items()}, options['TIMEOUT'])
+        configs.update(loaded)
+    return configs
+
+
+@receiver(records_changed)
+def invalidate_records(*, version, **kwargs):
+    """Write the new collection version through, which makes every cached listing and record unreachable"""
+    cache, options = _cache()
+    if cache is None:
+        return
+    cache.set(_key(options, 'version'), version, options['VERSION_TIMEOUT'])
@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import cached_version
+from .models import ConfigChange
+from .signals import records_changed
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_CHANGES = {
+    'RETAIN': 10000,  # Most recent writes kept in the feed
+    'MAX_NAMES': 1000,  # Changed names returned at most; larger gaps ask for a reload
+    # Hold requests with ?wait= until a write happens. Each held request ties
+    # up a server thread for up to MAX_WAIT seconds, and under ASGI every sync
+    # view shares one thread, so only enable this on a threaded WSGI server
+    # with a thread per open page to spare.
+    'LONG_POLL': False,
+    'MAX_WAIT': 25,  # Longest long-poll in seconds
+    'CLIENT_POLL_INTERVAL': 10,  # Seconds between the UI's polls when LONG_POLL is off
+    'POLL_INTERVAL': 0.5,  # Seconds between checks for writes made by other processes
+    # A missing seq newer than this many seconds is a write still being
+    # recorded; older gaps come from writers that died and are skipped
+    'GAP_TIMEOUT': 5,
+}
+
+# Writes between two prunings of the feed
+PRUNE_EVERY = 100
+
+
+def get_change_settings():
+    return {**DEFAULT_CONFIG_CHANGES, **getattr(settings, 'CONFIG_CHANGES', {})}
+
+
+# Wakes long-polls waiting in this process as soon as a write is recorded
+_changed = threading.Condition()
+
+
+@receiver(records_changed)
+def record_change(*, names, version, **kwargs):
+    """Append the write to the change feed, pruning writes older than RETAIN"""
+    options = get_change_settings()
+    try:
+        ConfigChange.objects.create(seq=version, names=list(dict.fromkeys(names)))
+        if version % PRUNE_EVERY == 0:
+            ConfigChange.objects.filter(seq__lte=version - options['RETAIN']).delete()
+    except DatabaseError:
+        # The records are written already; clients skip the gap after GAP_TIMEOUT
+        logger.exception('Could not record change %s', version)
+    with _changed:
+        _changed.notify_all()
+
+
+def changes_since(since, store):
+    """
+    Names of the records written after collection version since, with the
+    version they bring the client to. Returns {'seq', 'names', 'reset'}; reset
+    means the client is too far behind and should reload everything.
+    """
+    options = get_change_settings()
+    result = {'seq': since, 'names': [], 'reset': False}
+    if cached_version(store) <= since:
+        return result
+
+    oldest = ConfigChange.objects.order_by('seq').values_list('seq', flat=True).first()
+    if oldest is None or oldest > since + 1:
+        # Writes the client missed were pruned from the feed or predate it
+        return {**result, 'seq': store.version(), 'reset': True}
+
+    settled = timezone.now() - timedelta(seconds=options['GAP_TIMEOUT'])
+    names = {}
+    rows = ConfigChange.objects.filter(seq__gt=since).order_by('seq').values_list('seq', 'names', 'created_at')
+    for seq, changed, created_at in rows.iterator():
+        if seq > result['seq'] + 1 and created_at > settled:
+            # An earlier write is still being recorded: stop before it
+            break
+        names.update(dict.fromkeys(changed))
+        result['seq'] = seq
+        if len(names) > options['MAX_NAMES']:
+            return {**result, 'seq': store.version(), 'reset': True}
+    result['names'] = list(names)
+    return result
+
+
+def watch_options():
+    """How the UI follows the feed: long-polls of wait seconds, or polls every interval seconds"""
+    options = get_change_settings()
+    return {
+        'wait': options['MAX_WAIT'] if options['LONG_POLL'] else 0,
+        'interval': options['CLIENT_POLL_INTERVAL'],
+    }
+
+
+def wait_for_changes(since, store, wait):
+    """
+    changes_since(), waiting up to wait seconds (capped by MAX_WAIT) for a
+    write when LONG_POLL is on
+    """
+    options = get_change_settings()
+    if not options['LONG_POLL']:
+        wait = 0
+    deadline = time.monotonic() + min(max(wait, 0), options['MAX_WAIT'])
+    while True:
+        result = changes_since(since, store)
+        remaining = deadline - time.monotonic()
+        if result['names'] or result['reset'] or remaining <= 0:
+            return result
+        with _changed:
+            _changed.wait(min(remaining, options['POLL_INTERVAL']))
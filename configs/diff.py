@@ -0,0 +1,192 @@
+from collections import namedtuple
+
+from .operations import parse_config_string
+
+
+# Category statuses: 'added', 'deleted', 'changed' or 'unchanged'.
+# old/new are the category strings ('' when absent). keys is only filled for
+# 'changed' categories.
+CategoryDiff = namedtuple('CategoryDiff', ['category', 'status', 'old', 'new', 'keys'])
+
+# Key statuses: 'added', 'appended', 'edited', 'deleted' or 'unchanged'.
+# old/new are None when the key is absent on that side.
+KeyDiff = namedtuple('KeyDiff', ['key', 'status', 'old', 'new'])
+
+
+def diff_configs(old_config, new_config, memo=None, skip_empty=True):
+    """
+    Compare two {category: config_string} dicts and return a list of CategoryDiff.
+    With skip_empty, categories with an empty string count as absent, as they are
+    not displayed. Categories follow new_config order, followed by categories
+    deleted from old_config.
+
+    memo is an optional dict shared across calls in one request; it caches the key
+    diff of each distinct (old string, new string) pair.
+    """
+    if skip_empty:
+        old_config = {category: value for category, value in old_config.items() if value}
+        new_config = {category: value for category, value in new_config.items() if value}
+
+    diff = []
+    for category, new_str in new_config.items():
+        old_str = old_config.get(category)
+        if old_str is None:
+            diff.append(CategoryDiff(category, 'added', '', new_str, ()))
+        elif old_str == new_str:
+            diff.append(CategoryDiff(category, 'unchanged', old_str, new_str, ()))
+        else:
+            if memo is None:
+                keys = diff_config_strings(old_str, new_str)
+            else:
+                memo_key = (old_str, new_str)
+                keys = memo.get(memo_key)
+                if keys is None:
+                    keys = memo[memo_key] = diff_config_strings(old_str, new_str)
+            diff.append(CategoryDiff(category, 'changed', old_str, new_str, keys))
+
+    for category, old_str in old_config.items():
+        if category not in new_config:
+            diff.append(CategoryDiff(category, 'deleted', old_str, '', ()))
+    return diff
+
+
+def diff_config_strings(old_str, new_str):
+    """Return a tuple of KeyDiff comparing two config strings of one category"""
+    old_obj = parse_config_string(old_str)
+    new_obj = parse_config_string(new_str)
+
+    keys = []
+    for k, v in new_obj.items():
+        old_value = old_obj.get(k)
+        if old_value is None:
+            keys.append(KeyDiff(k, 'added', None, v))
+        elif old_value == v:
+            keys.append(KeyDiff(k, 'unchanged', old_value, v))
+        elif v.startswith(old_value) and len(v) > len(old_value):
+            # New value contains old value + more: treated as an append
+            keys.append(KeyDiff(k, 'appended', old_value, v))
+        else:
+            keys.append(KeyDiff(k, 'edited', old_value, v))
+
+    for k, v in old_obj.items():
+        if k not in new_obj:
+            keys.append(KeyDiff(k, 'deleted', v, None))
+    return tuple(keys)
+
+
+# CSS class used for each status when rendering HTML (deletions render as edits)
+HTML_DIFF_CLASSES = {
+    'added': 'added',
+    'appended': 'appended',
+    'edited': 'edited',
+    'deleted': 'edited',
+}
+
+
+def render_diff_html(diff):
+    """Render a diff as color-coded HTML in format 'config1:"key1 value1;key2 value2;"'"""
+    html_parts = []
+    for category_diff in diff:
+        category = category_diff.category
+        if category_diff.status == 'added':
+            html_parts.append(f'<span class="added">{category}:"{category_diff.new}"</span>')
+        elif category_diff.status == 'deleted':
+            html_parts.append(f'<span class="edited">{category}:"{category_diff.old}"</span>')
+        elif category_diff.status == 'unchanged':
+            html_parts.append(f'{category}:"{category_diff.new}"')
+        else:
+            category_html_parts = []
+            for key_diff in category_diff.keys:
+                if key_diff.status == 'deleted':
+                    pair = f'{key_diff.key} {key_diff.old}'
+                else:
+                    pair = f'{key_diff.key} {key_diff.new}'
+                css_class = HTML_DIFF_CLASSES.get(key_diff.status)
+                category_html_parts.append(f'<span class="{css_class}">{pair}</span>' if css_class else pair)
+            category_diff_html = ';'.join(category_html_parts)
+            html_parts.append(f'{category}:"{category_diff_html}"')
+    return '<br>'.join(html_parts)
+
+
+def serialize_diff(diff):
+    """
+    Compact JSON-ready form of a diff: unchanged categories and keys are left out,
+    added and deleted categories carry their whole string.
+    """
+    data = []
+    for category_diff in diff:
+        if category_diff.status == 'unchanged':
+            continue
+        entry = {'category': category_diff.category, 'status': category_diff.status}
+        if category_diff.status == 'changed':
+            entry['keys'] = [
+                {'key': key_diff.key, 'status': key_diff.status, 'old': key_diff.old, 'new': key_diff.new}
+                for key_diff in category_diff.keys
+                if key_diff.status != 'unchanged'
+            ]
+        else:
+            entry['old'] = category_diff.old
+            entry['new'] = category_diff.new
+        data.append(entry)
+    return data
+
+
+# Helper: Generate color-coded diff for formatted config strings
+def color_diff(old_formatted_str, new_formatted_str):
+    """Generate color-coded diff for config strings in format 'config1:"key1 value1;key2 value2;"'"""
+    old_config = parse_formatted_config(old_formatted_str)
+    new_config = parse_formatted_config(new_formatted_str)
+    return render_diff_html(diff_configs(old_config, new_config, skip_empty=False))
+
+
+def parse_formatted_config(formatted_str):
+    """Parse formatted config string back to dictionary"""
+    if not formatted_str:
+        return {}
+
+    config_dict = {}
+
+    # Split by semicolon, line breaks, or <br> tags but be careful not to split inside quotes
+    # First replace <br> tags with newlines for easier parsing
+    formatted_str = formatted_str.replace('<br>', '\n')
+
+    parts = []
+    part_start = 0
+    in_quotes = False
+
+    for position, char in enumerate(formatted_str):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif (char == ';' or char == '\n') and not in_quotes:
+            part = formatted_str[part_start:position].strip()
+            if part:
+                parts.append(part)
+            part_start = position + 1
+
+    # Add the last part
+    part = formatted_str[part_start:].strip()
+    if part:
+        parts.append(part)
+
+    for part in parts:
+        # Look for pattern: category:"config_string"
+        if ':"' in part and part.endswith('"'):
+            colon_quote_pos = part.find(':"')
+            category = part[:colon_quote_pos]
+            config_str = part[colon_quote_pos + 2:-1]  # Remove ':"' and '"'
+            config_dict[category] = config_str
+
+    return config_dict
+
+
+def format_config_for_display(config_dict):
+    """Convert config dictionary to string format like 'config1:"key1 value1;key2 value2;"'"""
+    if not config_dict:
+        return ""
+
+    formatted_parts = []
+    for category, config_str in config_dict.items():
+        if config_str:  # Only include non-empty configs
+            formatted_parts.append(f'{category}:"{config_str}"')
+
+    return '<br>'.join(formatted_parts)
@@ -0,0 +1,163 @@
+import re
+from itertools import accumulate
+
+
+# A config string exactly as stringify_config_object() writes it: 'key value;'
+# pairs whose key has no space and neither key nor value starts or ends with
+# whitespace. Keys must also be unique, which is checked separately.
+CANONICAL_CONFIG = re.compile(r'(?:[^;\s](?:[^; ]*[^;\s])? [^;\s][^;]*(?<!\s);)*')
+CONFIG_KEY = re.compile(r'([^ ;]*) [^;]*;')
+CONFIG_PAIR = re.compile(r'[^;]*;')
+
+# Source pairs looked up by searching for their key before the offsets of
+# every pair are computed at once
+SPAN_SEARCHES = 2
+
+
+class ConfigDocument:
+    """
+    A category config string ('key1 value1;key2 value2;') read and edited as a
+    {key: value} mapping without rebuilding it.
+
+    Only the keys are indexed, on first access. Values of untouched pairs are
+    sliced out of the source when read, and serialize() copies the source
+    around the edited and deleted pairs, writing those and the added keys
+    only. Nothing changed, it returns the source itself.
+
+    The result is byte-identical to stringify_config_object(parse_config_string())
+    with the same edits. A source that format would not reproduce (duplicate
+    keys, stray whitespace, malformed pairs...) is parsed like
+    parse_config_string() and written out in full instead.
+    """
+
+    __slots__ = ('source', '_entries', '_edited', '_deleted', '_canonical', '_spans', '_searches')
+
+    def __init__(self, source):
+        self.source = source or ''
+        # key -> value in key order; None for a pair still read from source
+        self._entries = None
+        self._edited = set()  # Source keys given a new value
+        self._deleted = set()  # Source keys removed
+        self._canonical = True
+        self._spans = None  # Source key -> (start, end) of its pair, once computed
+        self._searches = 0
+
+    def _index(self):
+        source = self.source
+        entries = None
+        if CANONICAL_CONFIG.fullmatch(source):
+            keys = CONFIG_KEY.findall(source)
+            entries = dict.fromkeys(keys)
+            if len(entries) != len(keys):
+                entries = None  # Duplicate keys: only the last value is kept
+        if entries is None:
+            entries = _parse(source)
+            self._canonical = False
+        self._entries = entries
+        return entries
+
+    def _span(self, key):
+        """(start, end) of the 'key value' pair of a source key, without its ';'"""
+        if self._spans is not None:
+            return self._spans[key]
+        source = self.source
+        if self._searches < SPAN_SEARCHES:
+            self._searches += 1
+            start = 0 if source.startswith(key + ' ') else source.index(';' + key + ' ') + 1
+            return start, source.index(';', start + len(key) + 1)
+        offsets = list(accumulate(map(len, CONFIG_PAIR.findall(source)), initial=0))
+        self._spans = dict(zip(CONFIG_KEY.findall(source), zip(offsets, [offset - 1 for offset in offsets[1:]])))
+        return self._spans[key]
+
+    def _is_source_key(self, key, value):
+        return value is None or key in self._edited
+
+    def __len__(self):
+        return len(self._entries if self._entries is not None else self._index())
+
+    def __iter__(self):
+        return iter(self._entries if self._entries is not None else self._index())
+
+    def __contains__(self, key):
+        return key in (self._entries if self._entries is not None else self._index())
+
+    def __getitem__(self, key):
+        value = (self._entries if self._entries is not None else self._index())[key]
+        if value is None:
+            start, end = self._span(key)
+            return self.source[start + len(key) + 1:end]
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __setitem__(self, key, value):
+        entries = self._entries if self._entries is not None else self._index()
+        if key in entries and entries[key] is None:
+            self._edited.add(key)
+        entries[key] = value
+
+    def __delitem__(self, key):
+        entries = self._entries if self._entries is not None else self._index()
+        if self._is_source_key(key, entries.pop(key)):
+            self._edited.discard(key)
+            self._deleted.add(key)
+
+    def keys(self):
+        return (self._entries if self._entries is not None else self._index()).keys()
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def copy(self):
+        document = ConfigDocument.__new__(ConfigDocument)
+        document.source = self.source
+        document._entries = dict(self._entries if self._entries is not None else self._index())
+        document._edited = set(self._edited)
+        document._deleted = set(self._deleted)
+        document._canonical = self._canonical
+        document._spans = self._spans
+        document._searches = self._searches
+        return document
+
+    def serialize(self):
+        """The config string, in the format of stringify_config_object()"""
+        entries = self._entries if self._entries is not None else self._index()
+        if not self._canonical:
+            return ''.join(_pair(key, value) for key, value in entries.items())
+
+        # Keys added after indexing come after every source key
+        added = []
+        for key in reversed(entries):
+            if self._is_source_key(key, entries[key]):
+                break
+            added.append(_pair(key, entries[key]))
+        if not added and not self._edited and not self._deleted:
+            return self.source
+
+        replaced = sorted(
+            [(*self._span(key), _pair(key, entries[key])) for key in self._edited]
+            + [(*self._span(key), '') for key in self._deleted]
+        )
+        source = self.source
+        parts = []
+        copied = 0  # The source before this offset is written
+        for start, end, pair in replaced:
+            parts.append(source[copied:start])
+            parts.append(pair)
+            copied = end + 1
+        parts.append(source[copied:])
+        parts.extend(reversed(added))
+        return ''.join(parts)
+
+
+def _pair(key, value):
+    """'key value;' sanitized like stringify_config_object(), '' for an empty key"""
+    key = key.strip() if key else ''
+    return f'{key} {value.strip() if value else ""};' if key else ''
+
+
+def _parse(source):
+    # Imported here: operations builds on this module
+    from .operations import parse_config_string
+    return parse_config_string(source)
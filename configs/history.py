@@ -0,0 +1,305 @@
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Max, Q
+from django.dispatch import receiver
+
+from .models import ConfigRevision
+from .operations import parse_config_string, stringify_config_object
+from .previews import config_fingerprint
+from .signals import records_changed
+from .store import WRITE_CONFLICT, get_config_store
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_HISTORY = {
+    'ENABLED': True,
+    'SNAPSHOT_EVERY': 20,  # A revision in this many stores the full config
+}
+
+# Names per history query
+HISTORY_BATCH_SIZE = 500
+
+# Attempts at numbering a revision while concurrent writers take the next numbers
+MAX_REVISION_ATTEMPTS = 5
+
+
+def get_history_settings():
+    return {**DEFAULT_CONFIG_HISTORY, **getattr(settings, 'CONFIG_HISTORY', {})}
+
+
+def _batches(items):
+    items = list(items)
+    for start in range(0, len(items), HISTORY_BATCH_SIZE):
+        yield items[start:start + HISTORY_BATCH_SIZE]
+
+
+# Deltas map each changed category to None (removed), its new config string,
+# or {key: new value, or None for a removed key} when the string can be
+# rebuilt from the key changes exactly.
+
+def category_delta(old, new):
+    if old is None:
+        return new
+    old_obj = parse_config_string(old)
+    new_obj = parse_config_string(new)
+    keys = {key: value for key, value in new_obj.items() if old_obj.get(key) != value or key not in old_obj}
+    keys.update((key, None) for key in old_obj if key not in new_obj)
+    if stringify_config_object(_apply_keys(old_obj, keys)) != new:
+        return new
+    return keys
+
+
+def _apply_keys(obj, keys):
+    obj = dict(obj)
+    for key, value in keys.items():
+        if value is None:
+            obj.pop(key, None)
+        else:
+            obj[key] = value
+    return obj
+
+
+def config_delta(old, new):
+    """Delta turning config old into new, or None when new cannot be rebuilt from one"""
+    delta = {category: category_delta(old.get(category), value)
+             for category, value in new.items() if old.get(category) != value}
+    delta.update((category, None) for category in old if category not in new)
+    if list(apply_delta(old, delta).items()) != list(new.items()):
+        # Categories were reordered: only a snapshot keeps the order
+        return None
+    return delta
+
+
+def apply_delta(config, delta):
+    config = dict(config)
+    for category, change in delta.items():
+        if change is None:
+            config.pop(category, None)
+        elif isinstance(change, str):
+            config[category] = change
+        else:
+            config[category] = stringify_config_object(_apply_keys(parse_config_string(config[category]), change))
+    return config
+
+
+def _state(revision, config):
+    """Config after a revision row given the config before it"""
+    if revision.deleted:
+        return None
+    if revision.snapshot is not None:
+        return revision.snapshot
+    return apply_delta(config or {}, revision.delta)
+
+
+def _tips(names):
+    """
+    {name: (latest revision number, seq of the latest write, fingerprint of
+    the config it left)} of the names with history
+    """
+    heads = {
+        row['name']: row for row in
+        ConfigRevision.objects.filter(name__in=names)
+        .values('name').annotate(head=Max('revision'), seq=Max('seq'))
+    }
+    if not heads:
+        return {}
+    latest = Q()
+    for name, row in heads.items():
+        latest |= Q(name=name, seq=row['seq'])
+    fingerprints = dict(ConfigRevision.objects.filter(latest).values_list('name', 'fingerprint'))
+    return {name: (row['head'], row['seq'], fingerprints.get(name)) for name, row in heads.items()}
+
+
+def _insert_revision(revision, config):
+    """
+    Insert a revision whose number a concurrent writer took, numbering it after
+    the latest one instead. It becomes a snapshot: the revision that took the
+    number may be the one this write's delta should have followed.
+    """
+    for attempt in range(MAX_REVISION_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                revision.save(force_insert=True)
+            return
+        except IntegrityError:
+            if attempt == MAX_REVISION_ATTEMPTS - 1:
+                raise
+            revision.revision = _tips([revision.name]).get(revision.name, (0,))[0] + 1
+            if not revision.deleted:
+                revision.snapshot = config
+                revision.delta = None
+
+
+@receiver(records_changed)
+def record_revisions(*, store, names, version, configs=None, previous=None, **kwargs):
+    """
+    Add a revision per written record: a delta against the config it replaced
+    when the writer knows it and history ends with that config, a snapshot
+    every SNAPSHOT_EVERY revisions or otherwise, and a checkpoint for
+    deletions. Revisions whose number a concurrent writer took are
+    renumbered one at a time.
+    """
+    options = get_history_settings()
+    if not options['ENABLED']:
+        return
+    previous = previous or {}
+    if configs is None:
+        # Writers like the admin only report names: read what they wrote
+        configs = {name: None for name in names}
+        try:
+            configs.update(store.get_many(names))
+        except DatabaseError:
+            logger.exception('Could not read the records of change %s, no revisions recorded', version)
+            return
+
+    for batch in _batches(dict.fromkeys(names)):
+        try:
+            _record_batch(batch, configs, previous, version, options)
+        except DatabaseError:
+            # The records are written already and the other receivers still
+            # have to run; the next revisions of this batch will be snapshots
+            logger.exception('Could not record revisions of %s records for change %s', len(batch), version)
+
+
+def _record_batch(batch, configs, previous, version, options):
+    tips = _tips(batch)
+    revisions = []
+    for name in batch:
+        head, seq, fingerprint = tips.get(name, (0, None, None))
+        number = head + 1
+        config = configs.get(name)
+        revision = ConfigRevision(
+            name=name, revision=number, seq=version, fingerprint=config_fingerprint(config) or ''
+        )
+        if config is None:
+            revision.deleted = True
+        elif name in previous and previous[name] is None:
+            revision.created = True
+            revision.snapshot = config
+        elif (
+            name in previous and number % options['SNAPSHOT_EVERY'] != 1
+            # A delta needs the write it follows recorded last: not the
+            # case after a failed insert or when writers raced
+            and seq is not None and seq < version and fingerprint == config_fingerprint(previous[name])
+        ):
+            revision.delta = config_delta(previous[name], config)
+            if revision.delta is None:
+                revision.snapshot = config
+        else:
+            revision.snapshot = config
+        revisions.append(revision)
+    try:
+        with transaction.atomic():
+            ConfigRevision.objects.bulk_create(revisions)
+        return
+    except IntegrityError:
+        pass
+    for revision in revisions:
+        try:
+            _insert_revision(revision, configs.get(revision.name))
+        except DatabaseError:
+            # The record is written already; its next revision no longer
+            # follows the config this one left, so it will be a snapshot
+            logger.exception('Could not record revision of %s for change %s', revision.name, version)
+
+
+def list_revisions(name):
+    return list(
+        ConfigRevision.objects.filter(name=name).order_by('seq', 'revision')
+        .values('revision', 'seq', 'created_at', 'created', 'deleted')
+    )
+
+
+def seq_at(moment):
+    """Collection version as of a datetime: the last write recorded by then, 0 before any"""
+    return ConfigRevision.objects.filter(created_at__lte=moment).aggregate(seq=Max('seq'))['seq'] or 0
+
+
+def configs_at(names, seq=None, revision=None):
+    """
+    Reconstruct the configs of names as of collection version seq (or, for a
+    single name, as of its revision number). Only the revisions since the last
+    checkpoint are read, in seq order. Returns {name: config}; records that did
+    not exist or were deleted at that point map to None. Names whose state is
+    unknown, i.e. history starts later and not with the record's creation, are
+    left out.
+    """
+    if revision is not None:
+        revisions = ConfigRevision.objects.filter(name__in=names)
+        seq = (
+            revisions.filter(revision=revision).aggregate(seq=Max('seq'))['seq']
+            or revisions.filter(revision__lte=revision).aggregate(seq=Max('seq'))['seq']
+            or 0
+        )
+    checkpoint = Q(snapshot__isnull=False) | Q(deleted=True)
+    configs = {}
+    for batch in _batches(dict.fromkeys(names)):
+        starts = dict(
+            ConfigRevision.objects.filter(checkpoint, name__in=batch, seq__lte=seq)
+            .values('name').annotate(start=Max('seq')).values_list('name', 'start')
+        )
+        unknown = [name for name in batch if name not in starts]
+        if unknown:
+            # Before their first checkpoint, records only known not to exist
+            # yet are the ones history saw being created
+            configs.update(
+                (name, None) for name in
+                ConfigRevision.objects.filter(name__in=unknown, revision=1, created=True).values_list('name', flat=True)
+            )
+        if not starts:
+            continue
+        configs.update(dict.fromkeys(starts))
+        chains = Q()
+        for name, start in starts.items():
+            chains |= Q(name=name, seq__gte=start)
+        for rev in ConfigRevision.objects.filter(chains, seq__lte=seq).order_by('name', 'seq'):
+            configs[rev.name] = _state(rev, configs[rev.name])
+    return configs
+
+
+def rollback_records(names, seq):
+    """
+    Restore names to their configs as of collection version seq with bulk
+    writes: records are updated (compare-and-set against the config read),
+    re-created, or deleted if they did not exist then.
+    Returns a result dict per name, in names order.
+    """
+    names = list(dict.fromkeys(names))
+    store = get_config_store()
+    targets = configs_at(names, seq=seq)
+    current = store.get_many(names)
+
+    updates = {}
+    creates = {}
+    deletes = []
+    results = {}
+    for name in names:
+        if name not in targets:
+            results[name] = {'name': name, 'success': False, 'error': 'No history at that point'}
+            continue
+        target = targets[name]
+        old_config = current.get(name)
+        if target == old_config:
+            results[name] = {'name': name, 'success': True, 'changed': False}
+            continue
+        if target is None:
+            deletes.append(name)
+        elif old_config is None:
+            creates[name] = target
+        else:
+            updates[name] = target
+        results[name] = {'name': name, 'success': True, 'changed': True,
+                         'old_config': old_config, 'new_config': target}
+
+    failures = store.write_many(updates, creates, expected=current)
+    if deletes:
+        store.delete_many(deletes)
+    for name, error in failures.items():
+        results[name]['success'] = False
+        results[name]['error'] = error
+        if error == WRITE_CONFLICT:
+            results[name]['error'] = f'{error}, roll back again to retry'
+    return [results[name] for name in names]
@@ -0,0 +1,264 @@
+import functools
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INSTRUMENTATION = {
+    'ENABLED': False,
+    'SAMPLES': 1000,  # Most recent timings kept per endpoint and phase
+}
+
+
+def get_instrumentation_settings():
+    return {**DEFAULT_INSTRUMENTATION, **getattr(settings, 'CONFIG_INSTRUMENTATION', {})}
+
+
+class RequestTimer:
+    """Per-request phase durations, DB round trips and response size"""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.phases = defaultdict(float)
+        self.queries = 0
+        self.bytes = 0
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        entries = [f'{name};dur={duration * 1000:.2f}' for name, duration in self.phases.items()]
+        entries.append(f'total;dur={total * 1000:.2f};desc="queries={self.queries} bytes={self.bytes}"')
+        return ', '.join(entries)
+
+
+class _Phase:
+    __slots__ = ('timer', 'name', 'started')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timer.phases[self.name] += time.perf_counter() - self.started
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+
+_NULL_PHASE = _NullPhase()
+_local = threading.local()
+
+
+def current_timer():
+    return getattr(_local, 'timer', None)
+
+
+def phase(name):
+    """Context manager timing a phase of the current request; a no-op when not instrumented"""
+    timer = getattr(_local, 'timer', None)
+    return timer.phase(name) if timer is not None else _NULL_PHASE
+
+
+def count_round_trip():
+    """Count a database round trip made outside the Django ORM (e.g. pymongo)"""
+    timer = getattr(_local, 'timer', None)
+    if timer is not None:
+        timer.queries += 1
+
+
+class _Aggregate:
+    """Recent timings per (endpoint, phase) for percentile reporting"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def record(self, endpoint, phases, samples):
+        with self._lock:
+            for name, duration in phases.items():
+                key = (endpoint, name)
+                if key not in self._samples:
+                    self._samples[key] = deque(maxlen=samples)
+                self._samples[key].append(duration)
+
+    def snapshot(self):
+        with self._lock:
+            items = [(key, sorted(values)) for key, values in self._samples.items()]
+        report = defaultdict(dict)
+        for (endpoint, name), values in items:
+            report[endpoint][name] = {
+                'count': len(values),
+                'p50_ms': round(_percentile(values, 50) * 1000, 3),
+                'p95_ms': round(_percentile(values, 95) * 1000, 3),
+                'p99_ms': round(_percentile(values, 99) * 1000, 3),
+            }
+        return dict(report)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+
+def _percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+aggregate = _Aggregate()
+
+
+def instrumented(endpoint):
+    """
+    View decorator timing the request phases recorded with phase(), counting DB
+    round trips and response bytes. Results go to a Server-Timing header, a
+    structured log line and the in-process aggregate. When
+    CONFIG_INSTRUMENTATION['ENABLED'] is off the view is called directly.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            options = get_instrumentation_settings()
+            if not options['ENABLED']:
+                return view(request, *args, **kwargs)
+
+            timer = RequestTimer(endpoint)
+            _local.timer = timer
+            try:
+                with ExitStack() as stack:
+                    for connection in connections.all():
+                        stack.enter_context(connection.execute_wrapper(timer.count_query))
+                    response = view(request, *args, **kwargs)
+            finally:
+                _local.timer = None
+
+            if not getattr(response, 'streaming', False):
+                timer.bytes = len(response.content)
+            total = timer.total
+            response['Server-Timing'] = timer.server_timing(total)
+
+            aggregate.record(endpoint, {**timer.phases, 'total': total}, options['SAMPLES'])
+            logger.info(json.dumps({
+                'endpoint': endpoint,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 2),
+                'phases_ms': {name: round(duration * 1000, 2) for name, duration in timer.phases.items()},
+                'queries': timer.queries,
+                'bytes': timer.bytes,
+            }))
+            return response
+        return wrapper
+    return decorator
+
+
+class _PoolStats:
+    """Connection checkouts from the pymongo pools, and those that failed by reason"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.failures = defaultdict(int)
+
+    def record(self, failure=None):
+        with self._lock:
+            self.checkouts += 1
+            if failure is not None:
+                self.failures[failure] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {'checkouts': self.checkouts, 'failures': dict(self.failures)}
+
+
+pool_stats = _PoolStats()
+
+
+def pool_wait_listener():
+    """
+    pymongo ConnectionPoolListener timing how long threads wait to check a
+    connection out of a pool (djongo's and the Mongo store's clients alike).
+    The wait is added to the 'pool_wait' phase of the instrumented request
+    and, when instrumentation is enabled, to the 'mongo_pool' aggregate.
+    """
+    from pymongo import monitoring
+
+    class PoolWaitListener(monitoring.ConnectionPoolListener):
+        # Checkout events are published by the thread checking out
+        _started = threading.local()
+
+        def connection_check_out_started(self, event):
+            self._started.at = time.perf_counter()
+
+        def connection_checked_out(self, event):
+            self._record(None)
+
+        def connection_check_out_failed(self, event):
+            self._record(str(event.reason))
+
+        def _record(self, failure):
+            started = getattr(self._started, 'at', None)
+            if started is None:
+                return
+            self._started.at = None
+            wait = time.perf_counter() - started
+            pool_stats.record(failure)
+            timer = current_timer()
+            if timer is not None:
+                timer.phases['pool_wait'] += wait
+            options = get_instrumentation_settings()
+            if options['ENABLED']:
+                aggregate.record('mongo_pool', {'checkout_wait': wait}, options['SAMPLES'])
+
+        def pool_created(self, event):
+            pass
+
+        def pool_ready(self, event):
+            pass
+
+        def pool_cleared(self, event):
+            pass
+
+        def pool_closed(self, event):
+            pass
+
+        def connection_created(self, event):
+            pass
+
+        def connection_ready(self, event):
+            pass
+
+        def connection_closed(self, event):
+            pass
+
+        def connection_checked_in(self, event):
+            pass
+
+    return PoolWaitListener()
@@ -0,0 +1,163 @@
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UpdateJob, UpdateJobChunk
+from .operations import compile_operations
+from .updates import update_records
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_JOBS = {
+    'ASYNC_THRESHOLD': 1000,  # Updates with more names than this run as jobs
+    'CHUNK_SIZE': 500,  # Names per chunk claimed by a worker
+    'MAX_CHUNK_SIZE': 5000,  # Largest chunk_size a client may ask for
+    'PROGRESS_EVERY': 100,  # Names a worker updates between saving results
+    'STALE_AFTER': 600,  # Seconds without progress before a running chunk is considered abandoned
+}
+
+
+# Result of the names a worker was updating when it stopped: they may or may
+# not have been written, and are not applied again
+INTERRUPTED = 'Interrupted while updating, check the record before retrying'
+
+
+def get_job_settings():
+    return {**DEFAULT_CONFIG_JOBS, **getattr(settings, 'CONFIG_JOBS', {})}
+
+
+def submit_update_job(names, operations, chunk_size=None):
+    """Queue an update of names with sanitized operations and return the UpdateJob"""
+    chunk_size = chunk_size or get_job_settings()['CHUNK_SIZE']
+    with transaction.atomic():
+        job = UpdateJob.objects.create(operations=operations, total=len(names))
+        UpdateJobChunk.objects.bulk_create([
+            UpdateJobChunk(job=job, index=index, names=names[start:start + chunk_size])
+            for index, start in enumerate(range(0, len(names), chunk_size))
+        ])
+    return job
+
+
+def claim_chunk(stale_after=None):
+    """
+    Claim the oldest pending chunk, or a running chunk whose worker went quiet
+    for stale_after seconds, under a new claim token. Returns the chunk, or
+    None when the queue is empty.
+    """
+    if stale_after is None:
+        stale_after = get_job_settings()['STALE_AFTER']
+    stale_before = timezone.now() - timedelta(seconds=stale_after)
+
+    while True:
+        chunk = (
+            UpdateJobChunk.objects
+            .filter(status=UpdateJobChunk.STATUS_PENDING)
+            .order_by('id')
+            .first()
+        ) or (
+            UpdateJobChunk.objects
+            .filter(status=UpdateJobChunk.STATUS_RUNNING, claimed_at__lt=stale_before)
+            .order_by('id')
+            .first()
+        )
+        if chunk is None:
+            return None
+
+        # Only one worker wins the conditional update of the claim it read,
+        # and a worker that saved progress since then keeps its chunk
+        now = timezone.now()
+        token = uuid.uuid4().hex
+        claimed = UpdateJobChunk.objects.filter(
+            pk=chunk.pk, status=chunk.status, claim_token=chunk.claim_token, claimed_at=chunk.claimed_at
+        ).update(status=UpdateJobChunk.STATUS_RUNNING, claim_token=token, claimed_at=now)
+        if claimed:
+            chunk.status = UpdateJobChunk.STATUS_RUNNING
+            chunk.claim_token = token
+            chunk.claimed_at = now
+            return chunk
+
+
+def _save_chunk(chunk, **fields):
+    """Save fields of a chunk this worker still holds; False once another worker reclaimed it"""
+    return bool(UpdateJobChunk.objects.filter(pk=chunk.pk, claim_token=chunk.claim_token).update(**fields))
+
+
+def process_chunk(chunk, progress_every=None):
+    """
+    Apply the job's operations to the chunk's names, progress_every names at a
+    time. Each batch is saved as interrupted before it is applied and with its
+    results after, so a reclaimed chunk resumes after the last batch started:
+    names of a batch its worker died in are reported failed rather than
+    updated twice. The worker stops once another one reclaimed the chunk; an
+    error marks it failed. Returns whether the chunk was finished by this worker.
+    """
+    progress_every = progress_every or get_job_settings()['PROGRESS_EVERY']
+    results = list(chunk.results)
+    try:
+        plan = compile_operations(chunk.job.operations)
+        done = {result['name'] for result in results}
+        names = [name for name in chunk.names if name not in done]
+        for start in range(0, len(names), progress_every):
+            batch = names[start:start + progress_every]
+            interrupted = [{'name': name, 'success': False, 'error': INTERRUPTED} for name in batch]
+            if not _save_chunk(chunk, results=results + interrupted, claimed_at=timezone.now()):
+                logger.warning('%s was reclaimed by another worker', chunk)
+                return False
+            batch_results, _ = update_records(batch, plan)
+            results.extend(batch_results)
+            if not _save_chunk(chunk, results=results, claimed_at=timezone.now()):
+                logger.warning('%s was reclaimed by another worker', chunk)
+                return False
+    except Exception as exc:
+        logger.exception('Could not process %s', chunk)
+        _save_chunk(chunk, results=results, status=UpdateJobChunk.STATUS_FAILED, error=f'{type(exc).__name__}: {exc}')
+        return False
+    chunk.results = results
+    chunk.status = UpdateJobChunk.STATUS_DONE
+    return _save_chunk(chunk, results=results, status=UpdateJobChunk.STATUS_DONE)
+
+
+def job_progress(job, include_results=True):
+    """
+    Summarize a job from its chunks: status, done and failed counts, results.
+    Names a failed chunk did not get to count as failed, with the chunk's error.
+    The batch a running chunk is updating is not counted until it is saved.
+    """
+    chunks = list(job.chunks.order_by('index'))
+    results = []
+    for chunk in chunks:
+        if chunk.status == UpdateJobChunk.STATUS_RUNNING:
+            results.extend(result for result in chunk.results if result.get('error') != INTERRUPTED)
+        else:
+            results.extend(chunk.results)
+        if chunk.status == UpdateJobChunk.STATUS_FAILED:
+            processed = {result['name'] for result in chunk.results}
+            results.extend(
+                {'name': name, 'success': False, 'error': chunk.error}
+                for name in chunk.names if name not in processed
+            )
+    failed = sum(1 for result in results if not result['success'])
+
+    finished = (UpdateJobChunk.STATUS_DONE, UpdateJobChunk.STATUS_FAILED)
+    if all(chunk.status in finished for chunk in chunks):
+        status = 'done'
+    elif any(chunk.status != UpdateJobChunk.STATUS_PENDING for chunk in chunks):
+        status = 'running'
+    else:
+        status = 'pending'
+
+    progress = {
+        'job_id': job.pk,
+        'status': status,
+        'total': job.total,
+        'done': len(results) - failed,
+        'failed': failed,
+    }
+    if include_results:
+        progress['results'] = results
+    return progress
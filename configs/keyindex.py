@@ -0,0 +1,184 @@
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.dispatch import receiver
+
+from .models import ConfigKey
+from .operations import parse_config_string
+from .signals import records_changed
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_KEY_INDEX = {
+    # Off by default: every write then also replaces the index rows of its
+    # records in the same request, a cost bulk imports feel most
+    'ENABLED': False,
+}
+
+# Names whose index rows are replaced per query
+KEY_INDEX_BATCH_SIZE = 500
+
+# Longest key the index column holds; longer keys are not indexed
+MAX_KEY_LENGTH = ConfigKey._meta.get_field('key').max_length
+
+
+def get_key_index_settings():
+    return {**DEFAULT_CONFIG_KEY_INDEX, **getattr(settings, 'CONFIG_KEY_INDEX', {})}
+
+
+def _indexable(key):
+    return len(key) <= MAX_KEY_LENGTH and len(key.lower()) <= MAX_KEY_LENGTH
+
+
+def _row(name, category, key, value):
+    return ConfigKey(name=name, category=category, key=key, lower_key=key.lower(), value=value)
+
+
+def _category_keys(config_str):
+    return {key: value for key, value in parse_config_string(config_str or '').items() if _indexable(key)}
+
+
+def index_rows(name, config):
+    """ConfigKey rows for every key of every category of a record"""
+    return [
+        _row(name, category, key, value)
+        for category, config_str in config.items()
+        for key, value in _category_keys(config_str).items()
+    ]
+
+
+def key_changes(old, new):
+    """
+    Index changes turning config old into new: the (category, key) pairs whose
+    rows are removed or get a new value, and the (category, key, value) rows
+    added in their place. Only the categories whose string changed are parsed.
+    """
+    stale = []
+    added = []
+    for category in dict.fromkeys([*old, *new]):
+        if old.get(category) == new.get(category):
+            continue
+        old_keys = _category_keys(old.get(category))
+        new_keys = _category_keys(new.get(category))
+        stale.extend((category, key) for key, value in old_keys.items() if new_keys.get(key) != value)
+        added.extend((category, key, value) for key, value in new_keys.items() if old_keys.get(key) != value)
+    return stale, added
+
+
+def reindex_records(configs):
+    """Replace the index rows of {name: config} records; None removes a record"""
+    names = list(configs)
+    for start in range(0, len(names), KEY_INDEX_BATCH_SIZE):
+        batch = names[start:start + KEY_INDEX_BATCH_SIZE]
+        rows = [row for name in batch if configs[name] is not None for row in index_rows(name, configs[name])]
+        with transaction.atomic():
+            ConfigKey.objects.filter(name__in=batch).delete()
+            ConfigKey.objects.bulk_create(rows, batch_size=KEY_INDEX_BATCH_SIZE * 10)
+
+
+def update_records_index(changes):
+    """
+    Apply the key_changes() of {name: (old config, new config)} records to the
+    index rows they have, which must be those of their old config
+    """
+    stale = []
+    added = []
+    for name, (old, new) in changes.items():
+        stale_keys, added_rows = key_changes(old, new)
+        stale.extend((name, category, key) for category, key in stale_keys)
+        added.extend(_row(name, *row) for row in added_rows)
+    with transaction.atomic():
+        for start in range(0, len(stale), KEY_INDEX_BATCH_SIZE):
+            rows = Q()
+            for name, category, key in stale[start:start + KEY_INDEX_BATCH_SIZE]:
+                rows |= Q(name=name, category=category, key=key)
+            ConfigKey.objects.filter(rows).delete()
+        ConfigKey.objects.bulk_create(added, batch_size=KEY_INDEX_BATCH_SIZE * 10)
+
+
+@receiver(records_changed)
+def update_key_index(*, store, names, version, configs=None, previous=None, **kwargs):
+    """
+    Update the index rows of the records a write changed: the keys that changed
+    when the writer knows the configs it replaced, every key otherwise
+    """
+    if not get_key_index_settings()['ENABLED']:
+        return
+    if configs is None:
+        # Writers like the admin only report names: read what they wrote
+        configs = {name: None for name in names}
+        configs.update(store.get_many(names))
+    previous = previous or {}
+    changes = {
+        name: (previous[name] or {}, config) for name, config in configs.items()
+        if name in previous and config is not None
+    }
+    try:
+        update_records_index(changes)
+        reindex_records({name: config for name, config in configs.items() if name not in changes})
+    except DatabaseError:
+        # The records are written already; rebuild_key_index repairs the index
+        logger.exception('Could not update the key index for change %s', version)
+
+
+def rebuild_key_index(records, batch_size=KEY_INDEX_BATCH_SIZE):
+    """Rebuild the whole index from (name, config) records. Returns the number of rows"""
+    ConfigKey.objects.all().delete()
+    total = 0
+    batch = []
+    for name, config in records:
+        batch.extend(index_rows(name, config))
+        if len(batch) >= batch_size * 10:
+            ConfigKey.objects.bulk_create(batch)
+            total += len(batch)
+            batch = []
+    ConfigKey.objects.bulk_create(batch)
+    return total + len(batch)
+
+
+def indexed_names(conditions):
+    """
+    Names of the records that have the keys of every selector KeyCondition
+    naming one, looked up in the index: a superset of the records matching
+    the conditions. None when the index is off or no condition narrows them.
+    """
+    if not get_key_index_settings()['ENABLED']:
+        return None
+    names = None
+    for condition in conditions:
+        if not condition.key or not _indexable(condition.key):
+            continue
+        rows = ConfigKey.objects.filter(category=condition.category)
+        if condition.case_sensitive:
+            rows = rows.filter(key=condition.key)
+        else:
+            rows = rows.filter(lower_key=condition.key.lower())
+        found = set(rows.values_list('name', flat=True))
+        names = found if names is None else names & found
+        if not names:
+            break
+    return names
+
+
+def search_keys(category='', key='', key_prefix='', value=None):
+    """
+    ConfigKey rows matching every lookup given, ordered on record name. A key
+    or key_prefix is required: values are only indexed along with their key.
+    Keys are matched case-sensitively, and keys longer than MAX_KEY_LENGTH
+    are not indexed, so never found.
+    """
+    if not key and not key_prefix:
+        raise ValueError('key or key_prefix is required')
+    queryset = ConfigKey.objects.all()
+    if category:
+        queryset = queryset.filter(category=category)
+    if key:
+        queryset = queryset.filter(key=key)
+    elif key_prefix:
+        queryset = queryset.filter(key__startswith=key_prefix)
+    if value is not None:
+        queryset = queryset.filter(value=value)
+    return queryset.order_by('name', 'category', 'key')
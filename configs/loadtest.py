@@ -0,0 +1,254 @@
+import http.client
+import json
+import platform
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+
+from .benchmarks import BENCHMARK_OPERATIONS, STORE_BACKENDS
+from .store import get_config_store
+
+
+# Operation sets a load test can send with previews and updates. All are
+# idempotent, so repeated updates keep working on the same data.
+LOAD_OPERATIONS = {
+    'simple': BENCHMARK_OPERATIONS,
+    'pattern': [
+        {'category': 'config1', 'op': 'edit_matching', 'key': 'key1*', 'value': 'matched', 'caseSensitive': True,
+         'match': 'glob'},
+        {'category': 'config2', 'op': 'substitute', 'key': '*', 'value': 'y', 'caseSensitive': True,
+         'match': 'glob', 'find': '[xy]'},
+    ],
+}
+LOAD_OPERATIONS['mixed'] = LOAD_OPERATIONS['simple'] + LOAD_OPERATIONS['pattern']
+
+# Default share of each workload in the request mix
+DEFAULT_MIX = {'page': 5, 'preview': 2, 'update': 1}
+
+# Records per listing page requested by the 'page' workload
+PAGE_LENGTH = 50
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class Workloads:
+    """Requests of each workload kind, as (method, path, body) built from a random generator"""
+
+    def __init__(self, names, batch, operations):
+        self.names = names
+        self.batch = min(batch, len(names))
+        self.body = {'operations': operations}
+
+    def _targets(self, rng):
+        return {**self.body, 'names': rng.sample(self.names, self.batch)}
+
+    def index(self, rng):
+        return 'GET', '/', None
+
+    def page(self, rng):
+        start = rng.randrange(0, max(len(self.names) - PAGE_LENGTH, 0) + 1)
+        query = urlencode({'draw': 1, 'start': start, 'length': PAGE_LENGTH, 'compact': 1})
+        return 'GET', f'/api/configs/?{query}', None
+
+    def preview(self, rng):
+        return 'POST', '/api/preview/', self._targets(rng)
+
+    def stream(self, rng):
+        return 'POST', '/api/preview/stream/', self._targets(rng)
+
+    def update(self, rng):
+        return 'POST', '/api/update/', self._targets(rng)
+
+
+WORKLOADS = ('index', 'page', 'preview', 'stream', 'update')
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an ascending list"""
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class LoadRecorder:
+    """Latencies and errors per workload, from every client thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, workload, latency, status):
+        with self._lock:
+            self.latencies[workload].append(latency)
+            self.statuses[workload][str(status)] += 1
+            if not isinstance(status, int) or status >= 400:
+                self.errors[workload] += 1
+
+    def summary(self, elapsed):
+        results = {}
+        for workload, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            results[workload] = {
+                'requests': len(latencies),
+                'errors': self.errors[workload],
+                'error_rate': self.errors[workload] / len(latencies),
+                'throughput_rps': len(latencies) / elapsed if elapsed else 0,
+                'mean_ms': sum(latencies) / len(latencies) * 1000,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+                'statuses': dict(self.statuses[workload]),
+            }
+        return results
+
+
+def send_request(host, port, method, path, body, timeout):
+    """Send one request on a new connection and read the whole response. Returns the status"""
+    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        connection.request(method, path, body=payload, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def run_clients(host, port, workloads, mix, concurrency, duration, warmup, timeout, seed):
+    """
+    Drive the server from concurrency threads for warmup + duration seconds,
+    each picking workloads at random with the mix weights. Only requests
+    started after the warmup are recorded. Returns (recorder, measured seconds).
+    """
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    recorder = LoadRecorder()
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    def client(index):
+        rng = random.Random(seed + index)
+        while True:
+            request_started = time.perf_counter()
+            if request_started >= stop_at:
+                return
+            kind = rng.choices(kinds, weights)[0]
+            method, path, body = getattr(workloads, kind)(rng)
+            try:
+                status = send_request(host, port, method, path, body, timeout)
+            except (OSError, http.client.HTTPException) as exc:
+                status = type(exc).__name__
+            if request_started >= measure_from:
+                recorder.record(kind, time.perf_counter() - request_started, status)
+
+    threads = [threading.Thread(target=client, args=(index,), daemon=True) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - measure_from
+
+
+def run_load_test(fleet, mix, batch=50, operations='simple', concurrency=8, duration=30, warmup=2,
+                  store='memory', url=None, timeout=60, seed=0):
+    """
+    Seed the fleet into the store, drive a mixed workload against the app and
+    return a JSON-ready report with throughput, latency percentiles and error
+    rates per workload. Without url the WSGI app is served in-process by a
+    threaded server on a free local port; with url the load goes to a server
+    already running (WSGI or ASGI) on the same database.
+    """
+    fleet = dict(fleet)
+    names = list(fleet)
+    workloads = Workloads(names, batch, LOAD_OPERATIONS[operations])
+    with override_settings(
+        CONFIG_STORE={'BACKEND': STORE_BACKENDS[store], 'OPTIONS': {}},
+        # Updates run in the request rather than as background jobs
+        CONFIG_JOBS={'ASYNC_THRESHOLD': batch + 1},
+        ALLOWED_HOSTS=['127.0.0.1', 'localhost', 'testserver'],
+    ):
+        config_store = get_config_store()
+        config_store.upsert_many(fleet)
+        server = None
+        try:
+            if url:
+                parts = urlsplit(url)
+                host, port = parts.hostname, parts.port or 80
+            else:
+                server = ThreadedWSGIServer(('127.0.0.1', 0), _QuietRequestHandler)
+                server.daemon_threads = True
+                server.set_app(get_wsgi_application())
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                host, port = server.server_address[:2]
+            recorder, elapsed = run_clients(
+                host, port, workloads, mix, concurrency, duration, warmup, timeout, seed
+            )
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+            config_store.delete_many(names)
+
+    results = recorder.summary(elapsed)
+    requests = sum(result['requests'] for result in results.values())
+    errors = sum(result['errors'] for result in results.values())
+    return {
+        'meta': {
+            'records': len(fleet),
+            'batch': batch,
+            'operations': operations,
+            'mix': mix,
+            'concurrency': concurrency,
+            'duration': duration,
+            'warmup': warmup,
+            'store': store,
+            'server': url or 'in-process wsgi',
+            'seed': seed,
+            'python': platform.python_version(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        },
+        'totals': {
+            'requests': requests,
+            'errors': errors,
+            'error_rate': errors / requests if requests else 0,
+            'throughput_rps': requests / elapsed if elapsed else 0,
+        },
+        'results': results,
+    }
+
+
+def compare_load_reports(report, baseline, tolerance=0.2):
+    """
+    Compare each workload with a baseline report: p95 latency and throughput
+    may not get worse than tolerance allows, nor the error rate grow.
+    Returns a list of (workload, metric, baseline, current, regressed) tuples.
+    """
+    comparison = []
+    for workload, result in report['results'].items():
+        previous = baseline.get('results', {}).get(workload)
+        if previous is None:
+            continue
+        comparison.append((workload, 'p95_ms', previous['p95_ms'], result['p95_ms'],
+                           result['p95_ms'] > previous['p95_ms'] * (1 + tolerance)))
+        comparison.append((workload, 'throughput_rps', previous['throughput_rps'], result['throughput_rps'],
+                           result['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance)))
+        comparison.append((workload, 'error_rate', previous['error_rate'], result['error_rate'],
+                           result['error_rate'] > previous['error_rate']))
+    return comparison
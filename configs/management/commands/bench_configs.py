@@ -0,0 +1,69 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from configs.benchmarks import BENCHMARKS, STORE_BACKENDS, BenchmarkFixture, compare_reports, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the config pipeline and API views on a synthetic fleet, optionally against a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=5000, help='Records in the synthetic fleet')
+        parser.add_argument('--categories', type=int, default=3)
+        parser.add_argument('--keys', type=int, default=20, help='Keys per category')
+        parser.add_argument('--value-length', type=int, default=12)
+        parser.add_argument('--duplication', type=float, default=0.5,
+                            help='Fraction of records sharing a config with another record (0-1)')
+        parser.add_argument('--batch', type=int, default=500, help='Names per preview/update request')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per benchmark')
+        parser.add_argument('--store', choices=sorted(STORE_BACKENDS), default='memory',
+                            help='Store the views run against')
+        parser.add_argument('--only', default='', help=f'Comma-separated benchmarks ({", ".join(BENCHMARKS)})')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--baseline', help='Compare against a JSON report saved earlier')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed slowdown against the baseline before flagging a regression')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        selected = [name.strip() for name in options['only'].split(',') if name.strip()]
+        unknown = [name for name in selected if name not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f'Unknown benchmark(s): {", ".join(unknown)}')
+
+        fixture = BenchmarkFixture(
+            records=options['records'],
+            categories=options['categories'],
+            keys=options['keys'],
+            value_length=options['value_length'],
+            duplication=options['duplication'],
+            batch=options['batch'],
+        )
+        report = run_benchmarks(fixture, repeat=options['repeat'], store=options['store'], selected=selected)
+
+        self.stdout.write(f'{"benchmark":<30}{"median ms":>12}{"best ms":>12}')
+        for name, result in report['results'].items():
+            self.stdout.write(f'{name:<30}{result["median_ms"]:>12.2f}{result["best_ms"]:>12.2f}')
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
+
+        if not options['baseline']:
+            return
+        with open(options['baseline']) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        regressions = []
+        self.stdout.write(f'\n{"benchmark":<30}{"baseline ms":>12}{"current ms":>12}{"ratio":>8}')
+        for name, baseline_ms, current_ms, ratio, regressed in compare_reports(report, baseline, options['tolerance']):
+            line = f'{name:<30}{baseline_ms:>12.2f}{current_ms:>12.2f}{ratio:>8.2f}'
+            if regressed:
+                regressions.append(name)
+                line = self.style.ERROR(line + '  REGRESSION')
+            self.stdout.write(line)
+
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'Performance regression in: {", ".join(regressions)}')
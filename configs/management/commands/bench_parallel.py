@@ -0,0 +1,61 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from configs.benchmarks import BenchmarkFixture, run_scaling_benchmark
+from configs.parallel import shutdown_process_pool
+
+
+class Command(BaseCommand):
+    help = 'Show how applying and previewing a large batch scales with the worker pool size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=50000, help='Records in the synthetic fleet')
+        parser.add_argument('--categories', type=int, default=3)
+        parser.add_argument('--keys', type=int, default=20, help='Keys per category')
+        parser.add_argument('--value-length', type=int, default=12)
+        parser.add_argument('--duplication', type=float, default=0.0,
+                            help='Fraction of records sharing a config with another record (0-1)')
+        parser.add_argument('--workers', default='',
+                            help='Comma-separated pool sizes (default: powers of two up to the CPU count)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Records per worker task')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        try:
+            workers = [int(count) for count in options['workers'].split(',') if count.strip()]
+        except ValueError:
+            raise CommandError('--workers takes comma-separated integers')
+        if not workers:
+            cpus = os.cpu_count() or 1
+            workers = [2 ** power for power in range(cpus.bit_length()) if 2 ** power <= cpus]
+        if any(count < 1 for count in workers):
+            raise CommandError('Worker counts must be at least 1')
+
+        fixture = BenchmarkFixture(
+            records=options['records'],
+            categories=options['categories'],
+            keys=options['keys'],
+            value_length=options['value_length'],
+            duplication=options['duplication'],
+            batch=options['records'],
+        )
+        try:
+            report = run_scaling_benchmark(fixture, workers, options['chunk_size'], repeat=options['repeat'])
+        finally:
+            shutdown_process_pool()
+
+        self.stdout.write(f'{"run":<16}{"apply ms":>12}{"speedup":>9}{"preview ms":>12}{"speedup":>9}')
+        for run, result in report['results'].items():
+            apply, preview = result['apply'], result['preview']
+            self.stdout.write(
+                f'{run:<16}{apply["median_ms"]:>12.2f}{apply["speedup"]:>8.2f}x'
+                f'{preview["median_ms"]:>12.2f}{preview["speedup"]:>8.2f}x'
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from configs.store import DjangoConfigStore, MemoryConfigStore, MongoConfigStore
+
+
+STORES = {
+    'django': DjangoConfigStore,
+    'mongo': MongoConfigStore,
+    'memory': MemoryConfigStore,
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare ConfigStore backends (djongo ORM path vs native pymongo) on batch reads and writes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=2000, help='Number of records per batch')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per operation; the best time is kept')
+        parser.add_argument(
+            '--stores', default='django,mongo',
+            help=f'Comma-separated stores to compare ({", ".join(STORES)})'
+        )
+
+    def handle(self, *args, **options):
+        store_names = [name.strip() for name in options['stores'].split(',') if name.strip()]
+        unknown = [name for name in store_names if name not in STORES]
+        if unknown:
+            raise CommandError(f'Unknown store(s): {", ".join(unknown)}')
+
+        names = [f'bench-store-{i:06d}' for i in range(options['records'])]
+        config = {
+            'config1': ';'.join(f'key{i} value{i}' for i in range(20)) + ';',
+            'config2': ';'.join(f'key{i} value{i}' for i in range(20, 40)) + ';',
+        }
+
+        self.stdout.write(f'{options["records"]} records, best of {options["repeat"]} runs (ms)')
+        self.stdout.write(f'{"store":<10}{"create":>10}{"get_many":>10}{"update":>10}{"page":>10}')
+        for store_name in store_names:
+            store = STORES[store_name]()
+            store.delete_many(names)
+            try:
+                timings = [
+                    self.best_of(options['repeat'], lambda: store.write_many({}, dict.fromkeys(names, config)),
+                                 reset=lambda: store.delete_many(names)),
+                    self.best_of(options['repeat'], lambda: store.get_many(names)),
+                    self.best_of(options['repeat'], lambda: store.write_many(dict.fromkeys(names, config), {})),
+                    self.best_of(options['repeat'], lambda: store.page(0, 100, search='bench-store-')),
+                ]
+            finally:
+                store.delete_many(names)
+            self.stdout.write(f'{store_name:<10}' + ''.join(f'{timing * 1000:>10.1f}' for timing in timings))
+
+    def best_of(self, repeat, func, reset=None):
+        best = None
+        for _ in range(repeat):
+            if reset is not None:
+                reset()
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
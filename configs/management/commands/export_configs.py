@@ -0,0 +1,23 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from configs.store import get_config_store
+from configs.transfer import EXPORT_FORMATS, export_records
+
+
+class Command(BaseCommand):
+    help = 'Stream every ConfigRecord to a NDJSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='ndjson')
+        parser.add_argument('--output', default='-', help='File to write, - for stdout')
+
+    def handle(self, *args, **options):
+        records = get_config_store().iter_records()
+        if options['output'] == '-':
+            sys.stdout.writelines(export_records(records, options['format']))
+            return
+        with open(options['output'], 'w', newline='') as output:
+            output.writelines(export_records(records, options['format']))
+        self.stderr.write(self.style.SUCCESS(f'Records exported to {options["output"]}'))
@@ -0,0 +1,43 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from configs.store import get_config_store
+from configs.synthetic import generate_fleet
+
+
+class Command(BaseCommand):
+    help = 'Write a synthetic fleet of ConfigRecords for load and performance testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=10000)
+        parser.add_argument('--categories', type=int, default=3)
+        parser.add_argument('--keys', type=int, default=20, help='Keys per category')
+        parser.add_argument('--value-length', type=int, default=12)
+        parser.add_argument('--duplication', type=float, default=0.5,
+                            help='Fraction of records sharing a config with another record (0-1)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='server', help='Record name prefix')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        store = get_config_store()
+        fleet = generate_fleet(
+            options['records'],
+            categories=options['categories'],
+            keys=options['keys'],
+            value_length=options['value_length'],
+            duplication=options['duplication'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+        )
+        written = 0
+        failed = 0
+        while True:
+            batch = dict(islice(fleet, options['batch_size']))
+            if not batch:
+                break
+            failures = store.upsert_many(batch)
+            written += len(batch) - len(failures)
+            failed += len(failures)
+        self.stdout.write(self.style.SUCCESS(f'{written} records written, {failed} failed.'))
@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from configs.store import get_config_store
+from configs.transfer import EXPORT_FORMATS, import_records, read_csv, read_ndjson
+
+
+class Command(BaseCommand):
+    help = 'Stream ConfigRecords from a NDJSON or CSV file, validating and upserting them in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to read, - for stdin')
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS),
+                            help='Input format, guessed from the file extension by default')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        import_format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        reader = read_csv if import_format == 'csv' else read_ndjson
+
+        if path == '-':
+            stats = import_records(reader(sys.stdin), get_config_store(), options['batch_size'])
+        else:
+            try:
+                with open(path, newline='') as source:
+                    stats = import_records(reader(source), get_config_store(), options['batch_size'])
+            except OSError as exc:
+                raise CommandError(str(exc))
+
+        for error in stats['errors']:
+            self.stderr.write(f'line {error["line"]} ({error["name"]}): {error["error"]}')
+        if stats['failed'] > len(stats['errors']):
+            self.stderr.write(f'... {stats["failed"] - len(stats["errors"])} more errors')
+        self.stdout.write(self.style.SUCCESS(f'{stats["imported"]} records imported, {stats["failed"]} failed.'))
@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from configs.models import ConfigRecord
+from configs.store import get_config_store
 
 class Command(BaseCommand):
     help = 'Insert dummy data into ConfigRecord collection'
@@ -28,6 +28,5 @@ class Command(BaseCommand):
                 }
             }
         ]
-        for entry in data:
-            ConfigRecord.objects.update_or_create(name=entry['name'], defaults={'config': entry['config']})
+        get_config_store().upsert_many({entry['name']: entry['config'] for entry in data})
         self.stdout.write(self.style.SUCCESS('Dummy data inserted.')) 
\ No newline at end of file
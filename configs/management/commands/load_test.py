@@ -0,0 +1,116 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from configs.benchmarks import STORE_BACKENDS
+from configs.loadtest import DEFAULT_MIX, LOAD_OPERATIONS, WORKLOADS, compare_load_reports, run_load_test
+from configs.synthetic import generate_fleet
+
+
+def parse_mix(value):
+    """'page=5,preview=2,update=1' -> {'page': 5, 'preview': 2, 'update': 1}"""
+    mix = {}
+    for entry in value.split(','):
+        if not entry.strip():
+            continue
+        workload, _, weight = entry.partition('=')
+        workload = workload.strip()
+        if workload not in WORKLOADS:
+            raise CommandError(f'Unknown workload {workload!r}, expected one of: {", ".join(WORKLOADS)}')
+        try:
+            mix[workload] = float(weight) if weight else 1.0
+        except ValueError:
+            raise CommandError(f'Invalid weight for {workload}: {weight!r}')
+    if not mix or not any(weight > 0 for weight in mix.values()):
+        raise CommandError('--mix needs at least one workload with a positive weight')
+    return mix
+
+
+class Command(BaseCommand):
+    help = 'Load-test the config API with concurrent mixed workloads and report latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=5000, help='Records in the synthetic fleet')
+        parser.add_argument('--categories', type=int, default=3)
+        parser.add_argument('--keys', type=int, default=20, help='Keys per category')
+        parser.add_argument('--value-length', type=int, default=12)
+        parser.add_argument('--duplication', type=float, default=0.5,
+                            help='Fraction of records sharing a config with another record (0-1)')
+        parser.add_argument('--mix', default=','.join(f'{name}={weight}' for name, weight in DEFAULT_MIX.items()),
+                            help=f'Comma-separated workload=weight ({", ".join(WORKLOADS)})')
+        parser.add_argument('--batch', type=int, default=50, help='Names per preview/update request')
+        parser.add_argument('--operations', choices=sorted(LOAD_OPERATIONS), default='simple',
+                            help='Operations sent with previews and updates')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds measured')
+        parser.add_argument('--warmup', type=float, default=2, help='Seconds run before measuring')
+        parser.add_argument('--timeout', type=float, default=60, help='Seconds before a request fails')
+        parser.add_argument('--store', choices=sorted(STORE_BACKENDS), default='memory',
+                            help='Store the fleet is seeded into and the in-process server uses')
+        parser.add_argument('--url', help='Load a server already running on the same database instead, '
+                                          'e.g. http://127.0.0.1:8000 (WSGI or ASGI)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--baseline', help='Compare against a JSON report saved earlier')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed p95 slowdown and throughput drop against the baseline')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        if options['concurrency'] < 1 or options['batch'] < 1:
+            raise CommandError('--concurrency and --batch must be at least 1')
+        if options['url'] and options['store'] == 'memory':
+            raise CommandError('A server at --url cannot see a fleet seeded into the memory store, pick --store')
+
+        fleet = generate_fleet(
+            options['records'], categories=options['categories'], keys=options['keys'],
+            value_length=options['value_length'], duplication=options['duplication'],
+            seed=options['seed'], prefix='load'
+        )
+        report = run_load_test(
+            fleet, mix,
+            batch=options['batch'],
+            operations=options['operations'],
+            concurrency=options['concurrency'],
+            duration=options['duration'],
+            warmup=options['warmup'],
+            store=options['store'],
+            url=options['url'],
+            timeout=options['timeout'],
+            seed=options['seed'],
+        )
+
+        self.stdout.write(f'{"workload":<12}{"requests":>10}{"errors":>8}{"req/s":>9}'
+                          f'{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}')
+        for workload, result in report['results'].items():
+            self.stdout.write(
+                f'{workload:<12}{result["requests"]:>10}{result["errors"]:>8}{result["throughput_rps"]:>9.1f}'
+                f'{result["p50_ms"]:>10.1f}{result["p95_ms"]:>10.1f}{result["p99_ms"]:>10.1f}'
+            )
+        totals = report['totals']
+        self.stdout.write(f'{"total":<12}{totals["requests"]:>10}{totals["errors"]:>8}{totals["throughput_rps"]:>9.1f}')
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
+
+        if not options['baseline']:
+            return
+        with open(options['baseline']) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        regressions = []
+        self.stdout.write(f'\n{"workload":<12}{"metric":<16}{"baseline":>12}{"current":>12}')
+        for workload, metric, previous, current, regressed in compare_load_reports(
+            report, baseline, options['tolerance']
+        ):
+            line = f'{workload:<12}{metric:<16}{previous:>12.3f}{current:>12.3f}'
+            if regressed:
+                regressions.append(f'{workload} {metric}')
+                line = self.style.ERROR(line + '  REGRESSION')
+            self.stdout.write(line)
+
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'Load test regression in: {", ".join(regressions)}')
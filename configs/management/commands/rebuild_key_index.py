@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from configs.keyindex import rebuild_key_index
+from configs.store import get_config_store
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the ConfigKey index from every ConfigRecord'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Records per bulk insert')
+
+    def handle(self, *args, **options):
+        total = rebuild_key_index(get_config_store().iter_records(), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{total} keys indexed.'))
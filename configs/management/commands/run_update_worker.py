@@ -0,0 +1,55 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from configs.jobs import claim_chunk, process_chunk
+
+
+def run_worker(once, poll_interval, stale_after):
+    """Claim and process job chunks until the queue is empty (once) or forever"""
+    while True:
+        close_old_connections()
+        chunk = claim_chunk(stale_after)
+        if chunk is not None:
+            process_chunk(chunk)
+            continue
+        if once:
+            return
+        time.sleep(poll_interval)
+
+
+def _run_worker_process(once, poll_interval, stale_after):
+    import django
+    django.setup()
+    run_worker(once, poll_interval, stale_after)
+
+
+class Command(BaseCommand):
+    help = 'Process queued bulk update jobs (submitted through /api/jobs/ or large /api/update/ batches)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Number of worker processes')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between queue polls')
+        parser.add_argument('--stale-after', type=int, default=None,
+                            help='Seconds after which a running chunk is reclaimed')
+
+    def handle(self, *args, **options):
+        worker_args = (options['once'], options['poll_interval'], options['stale_after'])
+        if options['processes'] <= 1:
+            run_worker(*worker_args)
+            return
+
+        # Child processes must not share the parent's database connections
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=_run_worker_process, args=worker_args)
+            for _ in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS('Workers stopped.'))
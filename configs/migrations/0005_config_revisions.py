@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configs', '0004_config_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfigRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('revision', models.IntegerField()),
+                ('seq', models.BigIntegerField(db_index=True)),
+                ('snapshot', models.JSONField(blank=True, null=True)),
+                ('delta', models.JSONField(blank=True, null=True)),
+                ('deleted', models.BooleanField(default=False)),
+                ('created', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('name', 'revision')},
+            },
+        ),
+    ]
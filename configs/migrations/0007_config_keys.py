@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configs', '0006_target_groups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfigKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('category', models.CharField(max_length=100)),
+                ('key', models.CharField(max_length=255)),
+                ('value', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='configkey',
+            index=models.Index(fields=['name'], name='configs_con_name_dd019c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='configkey',
+            index=models.Index(fields=['category', 'key'], name='configs_con_categor_1aaa2e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='configkey',
+            index=models.Index(fields=['key', 'value'], name='configs_con_key_5cb980_idx'),
+        ),
+    ]
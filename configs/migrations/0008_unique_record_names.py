@@ -0,0 +1,69 @@
+import json
+import logging
+
+from django.db import migrations, models
+
+
+logger = logging.getLogger(__name__)
+
+# Records deleted per query while removing duplicate names
+DEDUPE_BATCH_SIZE = 500
+
+
+def remove_duplicate_names(apps, schema_editor):
+    """
+    Keep the oldest record of each name, which is the one the stores read.
+    Every record removed is logged with its config, so it can be restored.
+    """
+    ConfigRecord = apps.get_model('configs', 'ConfigRecord')
+    records = ConfigRecord.objects.using(schema_editor.connection.alias)
+    seen = set()
+    duplicates = []
+    for record_id, name in records.order_by('id').values_list('id', 'name').iterator():
+        if name in seen:
+            duplicates.append(record_id)
+        else:
+            seen.add(name)
+    if duplicates:
+        logger.warning('Removing %s ConfigRecords whose name an older record has', len(duplicates))
+    for start in range(0, len(duplicates), DEDUPE_BATCH_SIZE):
+        batch = records.filter(id__in=duplicates[start:start + DEDUPE_BATCH_SIZE])
+        for record_id, name, config in batch.values_list('id', 'name', 'config'):
+            logger.warning('Removing duplicate ConfigRecord %s named %r: %s', record_id, name, json.dumps(config))
+        batch.delete()
+
+
+def structure_configs(apps, schema_editor):
+    """On MongoDB, store the structured form of every config next to its JSON text"""
+    connection = schema_editor.connection
+    if connection.settings_dict['ENGINE'] != 'djongo':
+        return
+    from configs.structured import convert_collection
+
+    ConfigRecord = apps.get_model('configs', 'ConfigRecord')
+    convert_collection(connection.cursor().db_conn[ConfigRecord._meta.db_table])
+
+
+def unstructure_configs(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.settings_dict['ENGINE'] != 'djongo':
+        return
+    ConfigRecord = apps.get_model('configs', 'ConfigRecord')
+    connection.cursor().db_conn[ConfigRecord._meta.db_table].update_many({}, {'$unset': {'data': ''}})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configs', '0007_config_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_names, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='configrecord',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.RunPython(structure_configs, unstructure_configs),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configs', '0008_unique_record_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configrevision',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+    ]
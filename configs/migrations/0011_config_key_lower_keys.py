@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+
+# Index rows updated per query while lowercasing their keys
+LOWER_KEYS_BATCH_SIZE = 1000
+
+
+def fill_lower_keys(apps, schema_editor):
+    ConfigKey = apps.get_model('configs', 'ConfigKey')
+    rows = ConfigKey.objects.using(schema_editor.connection.alias)
+    batch = []
+    for row in rows.only('id', 'key').iterator():
+        row.lower_key = row.key.lower()
+        batch.append(row)
+        if len(batch) >= LOWER_KEYS_BATCH_SIZE:
+            rows.bulk_update(batch, ['lower_key'])
+            batch = []
+    rows.bulk_update(batch, ['lower_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configs', '0010_update_job_failures'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configkey',
+            name='lower_key',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.RunPython(fill_lower_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='configkey',
+            index=models.Index(fields=['category', 'lower_key'], name='configs_con_categor_ee78e7_idx'),
+        ),
+    ]
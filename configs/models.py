@@ -3,8 +3,116 @@ from django.db import models
 # Create your models here.
 
 class ConfigRecord(models.Model):
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, unique=True)
     config = models.JSONField()
 
     def __str__(self):
         return self.name
+
+
+class UpdateJob(models.Model):
+    """A bulk update submitted for background processing by run_update_worker"""
+    operations = models.JSONField()
+    total = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'UpdateJob {self.pk}'
+
+
+class UpdateJobChunk(models.Model):
+    """A slice of an UpdateJob's names, claimed and processed by one worker"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    job = models.ForeignKey(UpdateJob, related_name='chunks', on_delete=models.CASCADE)
+    index = models.IntegerField()
+    names = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    results = models.JSONField(default=list)  # Saved as the worker progresses
+    error = models.TextField(blank=True, default='')
+    claim_token = models.CharField(max_length=32, blank=True, default='')  # Set by the worker holding the chunk
+    claimed_at = models.DateTimeField(null=True, blank=True)  # Refreshed while the worker progresses
+
+    def __str__(self):
+        return f'UpdateJob {self.job_id} chunk {self.index}'
+
+
+class CollectionVersion(models.Model):
+    """Counter bumped by every write to a collection, used for ETags and cache keys"""
+    name = models.CharField(max_length=100, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name} v{self.version}'
+
+
+class ConfigChange(models.Model):
+    """The records changed by one write; seq is the collection version the write produced"""
+    seq = models.BigIntegerField(unique=True)
+    names = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'Change {self.seq}'
+
+
+class ConfigRevision(models.Model):
+    """
+    One write to a record. Checkpoints hold the full config in snapshot (or
+    are deletions); other revisions hold a delta against the previous one in
+    seq order, which revision numbers follow unless concurrent writes raced.
+    """
+    name = models.CharField(max_length=100)
+    revision = models.IntegerField()
+    seq = models.BigIntegerField(db_index=True)  # Collection version of the write
+    snapshot = models.JSONField(null=True, blank=True)
+    delta = models.JSONField(null=True, blank=True)
+    deleted = models.BooleanField(default=False)
+    created = models.BooleanField(default=False)  # The write created the record
+    fingerprint = models.CharField(max_length=32, blank=True, default='')  # Of the config written, '' if deleted
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [('name', 'revision')]
+
+    def __str__(self):
+        return f'{self.name} r{self.revision}'
+
+
+class TargetGroup(models.Model):
+    """A saved selector (see configs.selectors) that preview and update can target by name"""
+    name = models.CharField(max_length=100, unique=True)
+    selector = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class ConfigKey(models.Model):
+    """One key of a record's category, denormalized for indexed key and value lookups"""
+    name = models.CharField(max_length=100)
+    category = models.CharField(max_length=100)
+    key = models.CharField(max_length=255)
+    lower_key = models.CharField(max_length=255, default='')  # key.lower(): databases differ in case folding
+    value = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name']),
+            models.Index(fields=['category', 'key']),
+            models.Index(fields=['category', 'lower_key']),
+            models.Index(fields=['key', 'value']),
+        ]
+
+    def __str__(self):
+        return f'{self.name} {self.category}.{self.key}'
@@ -0,0 +1,348 @@
+import fnmatch
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from .document import ConfigDocument
+
+
+# Operations applying to every key matching a pattern rather than one key:
+# key is a glob or, with 'match': 'regex', a regular expression matched
+# against the whole key. substitute replaces every match of the regex 'find'
+# in the values of those keys with the literal value.
+PATTERN_OPERATIONS = ('edit_matching', 'delete_matching', 'substitute')
+PATTERN_KINDS = ('glob', 'regex')
+
+# A sanitized operation with its lowercased key computed up front. Pattern
+# operations also carry their pattern kind (match), the substitute regex
+# (find) and the compiled KeyMatcher and find regex.
+CompiledOperation = namedtuple(
+    'CompiledOperation',
+    ['category', 'op', 'key', 'value', 'case_sensitive', 'lower_key', 'match', 'find', 'matcher', 'find_regex'],
+    defaults=(None, None, None, None)
+)
+
+# A compiled key pattern. Every matching key starts with literal (lowercased
+# for case-insensitive patterns), so keys without it are skipped before the
+# regex runs.
+KeyMatcher = namedtuple('KeyMatcher', ['literal', 'regex', 'case_sensitive'])
+
+# All operations of one category, in request order. add_operation is the first
+# 'add' operation of the group (or None), used to create missing categories.
+CategoryOperations = namedtuple('CategoryOperations', ['category', 'operations', 'add_operation'])
+
+
+def sanitize_key_value(key, value):
+    """
+    Sanitize key-value pairs (frontend validation already handled invalid data).
+    Returns (sanitized_key, sanitized_value)
+    """
+    # Strip whitespace
+    sanitized_key = key.strip() if key else ""
+    sanitized_value = value.strip() if value else ""
+
+    return sanitized_key, sanitized_value
+
+
+def sanitize_operation(operation):
+    """
+    Sanitize a single operation (frontend validation already handled invalid data).
+    Returns sanitized_operation
+    """
+    # Basic sanitization - frontend validation already handled the rest
+    sanitized_operation = {
+        'category': operation['category'].strip(),
+        'op': operation['op'].strip(),
+        'key': operation['key'].strip() if operation['key'] else "",
+        'value': operation['value'].strip() if operation['value'] else "",
+        'caseSensitive': bool(operation['caseSensitive'])
+    }
+    if sanitized_operation['op'] in PATTERN_OPERATIONS:
+        sanitized_operation['match'] = (operation.get('match') or 'glob').strip()
+        sanitized_operation['find'] = operation.get('find') or ''
+
+    return sanitized_operation
+
+
+def _regex_literal_prefix(pattern):
+    """Literal text every full match of a regex starts with ('' when unsure)"""
+    if '|' in pattern:
+        return ''
+    literal = []
+    position = 1 if pattern.startswith('^') else 0
+    while position < len(pattern):
+        char = pattern[position]
+        if char == '\\' and position + 1 < len(pattern) and not pattern[position + 1].isalnum():
+            literal.append(pattern[position + 1])
+            position += 2
+            continue
+        if char in '\\.^$*+?{}[]()':
+            break
+        literal.append(char)
+        position += 1
+    if literal and position < len(pattern) and pattern[position] in '*?{':
+        literal.pop()  # The last literal character is optional
+    return ''.join(literal)
+
+
+@lru_cache(maxsize=256)
+def compile_key_matcher(pattern, kind, case_sensitive):
+    """Compile a glob or regex key pattern once; matchers are shared by every record and request"""
+    if kind not in PATTERN_KINDS:
+        raise ValueError(f"Unknown pattern kind '{kind}', expected glob or regex")
+    if kind == 'glob':
+        regex, literal = fnmatch.translate(pattern), re.split(r'[*?\[]', pattern, maxsplit=1)[0]
+    else:
+        regex, literal = pattern, _regex_literal_prefix(pattern)
+    try:
+        compiled = re.compile(regex, 0 if case_sensitive else re.IGNORECASE)
+    except re.error as exc:
+        raise ValueError(f"Invalid pattern '{pattern}': {exc}")
+    if not case_sensitive:
+        # Ignoring case, non-ASCII letters can match ASCII ones: only trust ASCII literals
+        literal = literal.lower() if literal.isascii() else ''
+    return KeyMatcher(literal, compiled, case_sensitive)
+
+
+@lru_cache(maxsize=256)
+def compile_find_regex(pattern, case_sensitive):
+    try:
+        return re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+    except re.error as exc:
+        raise ValueError(f"Invalid find pattern '{pattern}': {exc}")
+
+
+def compile_operation(operation):
+    """
+    Convert a sanitized operation dict into an immutable CompiledOperation.
+    Raises ValueError for an invalid pattern.
+    """
+    compiled = CompiledOperation(
+        category=operation['category'],
+        op=operation['op'],
+        key=operation['key'],
+        value=operation['value'],
+        case_sensitive=operation['caseSensitive'],
+        lower_key=operation['key'].lower(),
+    )
+    if compiled.op not in PATTERN_OPERATIONS:
+        return compiled
+    if compiled.op == 'substitute' and not operation['find']:
+        raise ValueError('substitute needs a find pattern')
+    return compiled._replace(
+        match=operation['match'],
+        find=operation['find'],
+        matcher=compile_key_matcher(compiled.key, operation['match'], compiled.case_sensitive),
+        find_regex=compile_find_regex(operation['find'], compiled.case_sensitive) if operation['find'] else None,
+    )
+
+
+def compile_operations(operations):
+    """
+    Sanitize and compile request operations once per request.
+    Returns an immutable plan: a tuple of CategoryOperations, one per category,
+    in the order each category first appears in the request.
+    """
+    grouped = {}
+    for operation in operations:
+        compiled = compile_operation(sanitize_operation(operation))
+        grouped.setdefault(compiled.category, []).append(compiled)
+
+    plan = []
+    for category, ops in grouped.items():
+        add_operation = next((op for op in ops if op.op == 'add'), None)
+        plan.append(CategoryOperations(category, tuple(ops), add_operation))
+    return tuple(plan)
+
+
+def plan_operations(plan):
+    """Turn a compiled plan back into sanitized operation dicts, e.g. to store it"""
+    operations = []
+    for group in plan:
+        for op in group.operations:
+            operation = {
+                'category': op.category,
+                'op': op.op,
+                'key': op.key,
+                'value': op.value,
+                'caseSensitive': op.case_sensitive
+            }
+            if op.op in PATTERN_OPERATIONS:
+                operation.update(match=op.match, find=op.find)
+            operations.append(operation)
+    return operations
+
+
+# Helper: Converts a config string to a key-value object
+def parse_config_string(config_str):
+    obj = {}
+    if config_str:
+        for pair in config_str.split(';'):
+            pair = pair.strip()
+            if pair:
+                parts = pair.split(' ', 1)
+                if len(parts) == 2:
+                    k, v = parts
+                    # Sanitize the key-value pair
+                    sanitized_key, sanitized_value = sanitize_key_value(k, v)
+                    if sanitized_key:  # Only add if key is not empty
+                        obj[sanitized_key] = sanitized_value
+                # Skip malformed pairs (no space separator)
+    return obj
+
+
+# Helper: Converts a key-value object to a config string
+def stringify_config_object(obj):
+    """Convert config object to string format with semicolon delimiter at the end"""
+    if not obj:
+        return ""  # Empty config returns empty string (no semicolon)
+
+    # Sanitize and filter key-value pairs
+    valid_pairs = []
+    for k, v in obj.items():
+        sanitized_key, sanitized_value = sanitize_key_value(k, v)
+        if sanitized_key:  # Only include if key is not empty
+            valid_pairs.append(f"{sanitized_key} {sanitized_value}")
+
+    if not valid_pairs:
+        return ""  # No valid pairs, return empty string
+
+    # Join all valid key-value pairs with semicolon and add semicolon at the end
+    config_str = ';'.join(valid_pairs)
+    return config_str + ';'  # Add semicolon at the end for non-empty configs
+
+
+# Helper: Build a lowercase key -> [original keys] index, in dict order
+def build_key_index(obj):
+    index = {}
+    for k in obj:
+        index.setdefault(k.lower(), []).append(k)
+    return index
+
+
+def _set_new_key(obj, index, key, lower_key, value):
+    if index is not None and key not in obj:
+        index.setdefault(lower_key, []).append(key)
+    obj[key] = value
+
+
+# Helper: Apply operations to config objects
+def apply_operations_to_config(config_obj, operations):
+    """
+    Apply operations (CompiledOperation tuples or sanitized operation dicts) to a
+    key-value object (a dict or ConfigDocument) and return the new object.
+    Case-insensitive lookups go through a lowercase key index, so each
+    operation is a constant-time lookup. The index is only built when such an
+    operation or a pattern operation needs it.
+    """
+    operations = [op if isinstance(op, CompiledOperation) else compile_operation(op) for op in operations]
+    new_obj = config_obj.copy()
+    index = None
+    if any(not operation.case_sensitive or operation.matcher is not None for operation in operations):
+        index = build_key_index(new_obj)
+    for operation in operations:
+        if operation.matcher is not None:
+            _apply_pattern_operation(new_obj, index, operation)
+            continue
+        op = operation.op
+        key = operation.key
+        value = operation.value
+
+        if operation.case_sensitive:
+            existing_key = key if key in new_obj else None
+        else:
+            # Case insensitive: the first key (in dict order) matching ignoring case
+            matches = index.get(operation.lower_key)
+            existing_key = matches[0] if matches and matches[0] else None
+
+        if op == 'edit':
+            # Edit: Replace value if key exists, add if key doesn't exist
+            if existing_key is not None:
+                new_obj[existing_key] = value
+            else:
+                _set_new_key(new_obj, index, key, operation.lower_key, value)
+
+        elif op == 'append':
+            # Append: If key exists, add at end of existing value. If not, add new key
+            if existing_key is not None:
+                new_obj[existing_key] = new_obj[existing_key] + ' ' + value
+            else:
+                _set_new_key(new_obj, index, key, operation.lower_key, value)
+
+        elif op == 'delete':
+            if operation.case_sensitive:
+                if existing_key is not None:
+                    del new_obj[key]
+                    if index is not None:
+                        index[operation.lower_key].remove(key)
+            else:
+                # Case insensitive delete removes every case variant of the key
+                for k in index.pop(operation.lower_key, []):
+                    del new_obj[k]
+    return new_obj
+
+
+def matching_keys(obj, matcher):
+    """Keys of obj matching a KeyMatcher, in dict order"""
+    literal = matcher.literal
+    for key in obj:
+        if literal:
+            if matcher.case_sensitive:
+                if not key.startswith(literal):
+                    continue
+            elif key.isascii() and not key.lower().startswith(literal):
+                # Non-ASCII keys can match ASCII letters ignoring case, the regex decides
+                continue
+        if matcher.regex.fullmatch(key):
+            yield key
+
+
+def _apply_pattern_operation(new_obj, index, operation):
+    keys = list(matching_keys(new_obj, operation.matcher))
+    if operation.op == 'edit_matching':
+        for key in keys:
+            new_obj[key] = operation.value
+    elif operation.op == 'substitute':
+        for key in keys:
+            new_obj[key] = operation.find_regex.sub(lambda match: operation.value, new_obj[key])
+    elif operation.op == 'delete_matching':
+        for key in keys:
+            del new_obj[key]
+            index[key.lower()].remove(key)
+
+
+def apply_plan_to_config(config, plan, create_categories=False, memo=None):
+    """
+    Apply a compiled plan to a {category: config_string} dict and return the new dict.
+    With create_categories, a missing or empty category targeted by an 'add'
+    operation is created from that operation alone.
+
+    memo is an optional dict shared by every call made with the same plan (and the
+    same create_categories) during one request. It maps (group position, category
+    string) to the resulting category string, so byte-identical category strings
+    are parsed, transformed and stringified only once.
+    """
+    new_config = config.copy()
+    for position, group in enumerate(plan):
+        old_config_str = new_config.get(group.category, '')
+        if memo is not None:
+            memo_key = (position, old_config_str)
+            new_config_str = memo.get(memo_key)
+            if new_config_str is None:
+                new_config_str = memo[memo_key] = _apply_group(old_config_str, group, create_categories)
+        else:
+            new_config_str = _apply_group(old_config_str, group, create_categories)
+        new_config[group.category] = new_config_str
+    return new_config
+
+
+def _apply_group(config_str, group, create_categories):
+    if create_categories and group.add_operation is not None and not config_str:
+        add_op = group.add_operation
+        return stringify_config_object({add_op.key: add_op.value})
+    if any(operation.matcher is not None for operation in group.operations):
+        # Pattern operations may touch every key: rebuilding the string is cheaper
+        new_config_obj = apply_operations_to_config(parse_config_string(config_str), group.operations)
+        return stringify_config_object(new_config_obj)
+    # Edits of single keys are spliced into the string instead
+    return apply_operations_to_config(ConfigDocument(config_str), group.operations).serialize()
@@ -0,0 +1,129 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .instrumentation import phase
+from .operations import apply_plan_to_config
+from .previews import compute_preview
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_PARALLEL = {
+    'ENABLED': True,
+    # Fewest records sharded over the pool; smaller batches stay in-process.
+    # At most CONFIG_JOBS['ASYNC_THRESHOLD'], the largest update applied in a
+    # request, or updates never use the pool. Job chunks apply PROGRESS_EVERY
+    # names at a time and are not sharded: run several workers instead.
+    'THRESHOLD': 1000,
+    'WORKERS': None,  # Pool processes, os.cpu_count() when None
+    'CHUNK_SIZE': 250,  # Records per task sent to a worker
+}
+
+
+def get_parallel_settings():
+    return {**DEFAULT_CONFIG_PARALLEL, **getattr(settings, 'CONFIG_PARALLEL', {})}
+
+
+@lru_cache(maxsize=None)
+def get_process_pool():
+    """Return the process-wide worker pool, started on first use"""
+    workers = get_parallel_settings()['WORKERS'] or os.cpu_count() or 1
+    # Workers only run the pure config functions. Spawning them rather than
+    # forking keeps locks held by the server's other threads out of the children.
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def shutdown_process_pool():
+    if get_process_pool.cache_info().currsize:
+        get_process_pool().shutdown(wait=False)
+        get_process_pool.cache_clear()
+
+
+@receiver(setting_changed)
+def reset_process_pool(*, setting, **kwargs):
+    if setting == 'CONFIG_PARALLEL':
+        shutdown_process_pool()
+
+
+def use_pool(count):
+    options = get_parallel_settings()
+    return options['ENABLED'] and count >= options['THRESHOLD']
+
+
+def run_chunks(func, items, *args):
+    """
+    Call func(chunk, *args) on consecutive CHUNK_SIZE slices of items in the
+    process pool. func must be a module-level function and args picklable.
+    Returns the results of the chunks in items order. Should the pool break
+    (a worker died), it is replaced on next use and func runs in-process.
+    """
+    size = get_parallel_settings()['CHUNK_SIZE']
+    chunks = [items[start:start + size] for start in range(0, len(items), size)]
+    try:
+        with phase('pool'):
+            pool = get_process_pool()
+            futures = [pool.submit(func, chunk, *args) for chunk in chunks]
+            return [future.result() for future in futures]
+    except BrokenProcessPool:
+        logger.exception('Config worker pool broke, applying %s records in-process', len(items))
+        shutdown_process_pool()
+        return [func(items, *args)]
+
+
+def _apply_chunk(configs, plan, create_categories):
+    memo = {}
+    return [apply_plan_to_config(config, plan, create_categories, memo) for config in configs], memo
+
+
+def _preview_chunk(items, plan, diff_format):
+    memo = {}
+    submit_memo = {}
+    diff_memo = {}
+    preview_rows, submit_configs = compute_preview(items, plan, diff_format, memo, submit_memo, diff_memo)
+    return preview_rows, submit_configs, memo, submit_memo, len(diff_memo)
+
+
+def apply_plan_many(configs, plan, create_categories=False, memo=None):
+    """
+    apply_plan_to_config() over a list of configs, returning the new configs in
+    order. Batches of THRESHOLD configs or more are sharded over the process
+    pool; the transforms memoized by each chunk are merged into memo.
+    """
+    memo = {} if memo is None else memo
+    if not use_pool(len(configs)):
+        return [apply_plan_to_config(config, plan, create_categories, memo) for config in configs]
+    new_configs = []
+    for chunk_configs, chunk_memo in run_chunks(_apply_chunk, configs, plan, create_categories):
+        new_configs.extend(chunk_configs)
+        memo.update(chunk_memo)
+    return new_configs
+
+
+def preview_many(items, plan, diff_format, memo, submit_memo, diff_memo):
+    """
+    compute_preview(), sharded over the process pool for batches of THRESHOLD
+    items or more. Sharded diffs are memoized per chunk, so diff_memo is not
+    filled; the number of distinct diffs summed over the chunks is returned
+    with the preview rows and submit configs.
+    """
+    if not use_pool(len(items)):
+        preview_rows, submit_configs = compute_preview(items, plan, diff_format, memo, submit_memo, diff_memo)
+        return preview_rows, submit_configs, len(diff_memo)
+    preview_rows = []
+    submit_configs = []
+    distinct_diffs = 0
+    for chunk in run_chunks(_preview_chunk, items, plan, diff_format):
+        preview_rows.extend(chunk[0])
+        submit_configs.extend(chunk[1])
+        memo.update(chunk[2])
+        submit_memo.update(chunk[3])
+        distinct_diffs += chunk[4]
+    return preview_rows, submit_configs, distinct_diffs
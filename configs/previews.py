@@ -0,0 +1,206 @@
+import hashlib
+import json
+import logging
+import secrets
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .diff import diff_configs, format_config_for_display, render_diff_html, serialize_diff
+from .instrumentation import phase
+from .operations import apply_plan_to_config, compile_operations, plan_operations
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREVIEW_CACHE = {
+    # Entry of settings.CACHES previews are kept in. Give them one of their own
+    # whose entry limit bounds their memory: a preview holds at most
+    # CONFIG_JOBS['ASYNC_THRESHOLD'] configs.
+    'ALIAS': 'previews',
+    'KEY_PREFIX': 'configs-preview',
+    'TTL': 600,  # Seconds a preview stays usable
+}
+
+# A computed preview: the names and plan it was made for, the fingerprint of
+# each source config at preview time (None for missing records) and the
+# configs Submit should write.
+PreviewEntry = namedtuple('PreviewEntry', ['names', 'plan', 'fingerprints', 'new_configs'])
+
+# Records in the first chunk of a streamed preview, which bounds the time to
+# its first rows; chunks then double up to STREAM_CHUNK_SIZE
+STREAM_FIRST_CHUNK = 50
+STREAM_CHUNK_SIZE = 1000
+
+
+def config_fingerprint(config):
+    """Short digest identifying a config version, or None for a missing record"""
+    if config is None:
+        return None
+    return hashlib.blake2b(json.dumps(config).encode(), digest_size=16).hexdigest()
+
+
+def compute_preview(items, plan, diff_format, memo, submit_memo, diff_memo):
+    """
+    Apply a plan to (name, config) items and diff the results. Returns
+    (preview rows, configs Submit should write), both in items order; the
+    two only differ when 'add' operations create missing categories.
+    diff_format 'html' renders color-coded diffs, 'json' compact structured ones.
+    """
+    creates_categories = any(group.add_operation is not None for group in plan)
+    new_configs = []
+    submit_configs = []
+    with phase('apply'):
+        for name, old_config in items:
+            new_config = apply_plan_to_config(old_config, plan, memo=memo)
+            new_configs.append(new_config)
+            if creates_categories:
+                submit_configs.append(apply_plan_to_config(old_config, plan, create_categories=True, memo=submit_memo))
+            else:
+                submit_configs.append(new_config)
+
+    preview_rows = []
+    with phase('diff'):
+        for (name, old_config), new_config in zip(items, new_configs):
+            diff = diff_configs(old_config, new_config, memo=diff_memo)
+            if diff_format == 'json':
+                preview_rows.append({'name': name, 'diff': serialize_diff(diff)})
+            else:
+                preview_rows.append({
+                    'name': name,
+                    'old_config': format_config_for_display(old_config),
+                    'new_config': render_diff_html(diff)
+                })
+    return preview_rows, submit_configs
+
+
+def stream_chunks(items, first=STREAM_FIRST_CHUNK, size=STREAM_CHUNK_SIZE):
+    """Split an iterable into lists of first items, then twice as many each time up to size"""
+    chunk = []
+    limit = first
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= limit:
+            yield chunk
+            chunk = []
+            limit = min(limit * 2, size)
+    if chunk:
+        yield chunk
+
+
+def stream_preview(chunks, plan, diff_format, count=None):
+    """
+    Compute a preview chunk by chunk as NDJSON lines: {"count"} first (None
+    when not known upfront), a {"rows"} line per chunk of (name, config or
+    None) records, then {"done"} with the preview token and totals. A failure
+    midway ends the stream with an {"error"} line instead.
+    Chunks are read lazily, so the records are only fetched as rows are sent.
+    """
+    yield _ndjson({'count': count})
+    memo = {}
+    submit_memo = {}
+    diff_memo = {}
+    names = []
+    fingerprints = {}
+    new_configs = {}
+    try:
+        for chunk in chunks:
+            items = [(name, config or {}) for name, config in chunk]
+            preview_rows, submit_configs = compute_preview(items, plan, diff_format, memo, submit_memo, diff_memo)
+            for (name, config), submit_config in zip(chunk, submit_configs):
+                names.append(name)
+                fingerprints.setdefault(name, config_fingerprint(config))
+                new_configs.setdefault(name, submit_config)
+            yield _ndjson({'rows': preview_rows})
+    except Exception:
+        logger.exception('Streamed preview failed after %s records', len(names))
+        yield _ndjson({'error': 'Preview failed, please try again'})
+        return
+
+    preview_token = get_preview_cache().add(PreviewEntry(
+        names=list(fingerprints), plan=plan, fingerprints=fingerprints, new_configs=new_configs
+    ))
+    yield _ndjson({
+        'done': True,
+        'count': len(names),
+        'preview_token': preview_token,
+        'distinct_inputs': len(memo),
+        'distinct_diffs': len(diff_memo),
+    })
+
+
+def _ndjson(value):
+    return json.dumps(value) + '\n'
+
+
+class PreviewCache:
+    """
+    Previews kept in a Django cache, keyed by token, so Submit finds them
+    whichever process serves it when the cache is shared (file, memcached).
+    The plan is stored as operations and compiled again when the preview is used.
+    """
+
+    def __init__(self, alias, key_prefix, ttl):
+        self.alias = alias
+        self.key_prefix = key_prefix
+        self.ttl = ttl
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _key(self, token):
+        return f'{self.key_prefix}:{token}'
+
+    def add(self, entry):
+        """
+        Store a preview and return its token. Previews of more than
+        CONFIG_JOBS['ASYNC_THRESHOLD'] records are submitted as jobs, which
+        recompute them, so they are not stored and get no token.
+        """
+        from .jobs import get_job_settings  # jobs imports this module through updates
+
+        if len(entry.names) > get_job_settings()['ASYNC_THRESHOLD']:
+            return None
+        token = secrets.token_urlsafe(16)
+        self.cache.set(self._key(token), {
+            'names': entry.names,
+            'operations': plan_operations(entry.plan),
+            'fingerprints': entry.fingerprints,
+            'new_configs': entry.new_configs,
+        }, self.ttl)
+        return token
+
+    def get(self, token):
+        stored = self.cache.get(self._key(token))
+        if stored is None:
+            return None
+        return PreviewEntry(
+            names=stored['names'],
+            plan=compile_operations(stored['operations']),
+            fingerprints=stored['fingerprints'],
+            new_configs=stored['new_configs'],
+        )
+
+    def pop(self, token):
+        entry = self.get(token)
+        if entry is not None:
+            self.cache.delete(self._key(token))
+        return entry
+
+
+@lru_cache(maxsize=None)
+def get_preview_cache():
+    """Return the preview cache configured by settings.CONFIG_PREVIEW_CACHE"""
+    options = {**DEFAULT_PREVIEW_CACHE, **getattr(settings, 'CONFIG_PREVIEW_CACHE', {})}
+    return PreviewCache(options['ALIAS'], options['KEY_PREFIX'], options['TTL'])
+
+
+@receiver(setting_changed)
+def reset_preview_cache(*, setting, **kwargs):
+    if setting == 'CONFIG_PREVIEW_CACHE':
+        get_preview_cache.cache_clear()
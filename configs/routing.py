@@ -0,0 +1,86 @@
+import functools
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+DEFAULT_CONFIG_ROUTING = {
+    # Database alias serving the reads made in replica_reads(), typically the
+    # same MongoDB with a secondaryPreferred read preference. Reads stay on
+    # 'default' when the alias is not in DATABASES.
+    'READ_ALIAS': 'replica',
+}
+
+_local = threading.local()
+
+
+def get_routing_settings():
+    return {**DEFAULT_CONFIG_ROUTING, **getattr(settings, 'CONFIG_ROUTING', {})}
+
+
+def read_alias():
+    """Alias the configs reads of this thread go to, None outside replica_reads()"""
+    return getattr(_local, 'alias', None)
+
+
+@contextmanager
+def replica_reads():
+    """
+    Send the ConfigRecord reads made within to the read alias. Only for
+    read-only work that tolerates replication lag (listings, previews): writes
+    and the compare-and-set reads before them always use the primary, and so
+    do reads of metadata like target groups, the key index or the collection
+    version, which a request may have written just before.
+    """
+    alias = get_routing_settings()['READ_ALIAS']
+    if alias not in settings.DATABASES:
+        alias = None
+    previous = read_alias()
+    _local.alias = alias
+    try:
+        yield alias
+    finally:
+        _local.alias = previous
+
+
+def reads_from_replica(view):
+    """View decorator running the view in replica_reads()"""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def iter_replica_reads(iterable):
+    """Iterate in replica_reads(), for generators consumed after their view returned"""
+    iterator = iter(iterable)
+    while True:
+        with replica_reads():
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+class ReadReplicaRouter:
+    """Routes ConfigRecord reads to the read alias within replica_reads()"""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label == 'configs.ConfigRecord':
+            return read_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The read alias is the same database seen through another connection
+        if db == get_routing_settings()['READ_ALIAS']:
+            return False
+        return None
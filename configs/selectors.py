@@ -0,0 +1,129 @@
+import fnmatch
+import re
+from collections import namedtuple
+
+from .models import TargetGroup
+from .operations import parse_config_string
+
+
+# Groups may refer to other groups up to this depth
+MAX_GROUP_DEPTH = 5
+
+# Records matching all of its conditions. prefix is a literal name prefix
+# (the one the database can use an index for), name_pattern the compiled
+# name globs or None, and keys a tuple of KeyCondition.
+Selector = namedtuple('Selector', ['prefix', 'name_pattern', 'keys'])
+
+# Category has key (compared case-insensitively unless case_sensitive), and
+# when pattern is set, the key's value matches it. A key of '' stands for any key.
+KeyCondition = namedtuple('KeyCondition', ['category', 'key', 'case_sensitive', 'pattern'])
+
+
+def _as_list(value):
+    return value if isinstance(value, list) else [value]
+
+
+def _key_condition(clause, with_pattern):
+    if not isinstance(clause, dict) or not str(clause.get('category') or '').strip():
+        raise ValueError('Key conditions need a category')
+    key = str(clause.get('key') or '').strip()
+    case_sensitive = bool(clause.get('caseSensitive', True))
+    pattern = None
+    if with_pattern:
+        try:
+            pattern = re.compile(str(clause.get('pattern') or ''), 0 if case_sensitive else re.IGNORECASE)
+        except re.error as exc:
+            raise ValueError(f'Invalid value pattern: {exc}')
+    elif not key:
+        raise ValueError('has_key conditions need a key')
+    return KeyCondition(str(clause['category']).strip(), key, case_sensitive, pattern)
+
+
+def compile_selector(data, depth=0):
+    """
+    Compile a selector request into a Selector. Every clause given must hold:
+    prefix (name prefix), glob (name glob such as 'web-*'), has_key
+    ({category, key, caseSensitive}), value_matches ({category, key, pattern,
+    caseSensitive}; the two key clauses also take lists) and group (the name
+    of a saved TargetGroup). Raises ValueError for an invalid selector.
+    """
+    if not isinstance(data, dict) or not data:
+        raise ValueError('Selector must be a non-empty object')
+    unknown = set(data) - {'prefix', 'glob', 'has_key', 'value_matches', 'group'}
+    if unknown:
+        raise ValueError(f'Unknown selector clause(s): {", ".join(sorted(unknown))}')
+
+    prefixes = []
+    patterns = []
+    keys = []
+    if data.get('prefix'):
+        prefixes.append(str(data['prefix']))
+    if data.get('glob'):
+        glob = str(data['glob'])
+        patterns.append(fnmatch.translate(glob))
+        # Literal head of the glob, usable as an indexed prefix
+        prefixes.append(re.split(r'[*?\[]', glob, maxsplit=1)[0])
+    keys.extend(_key_condition(clause, False) for clause in _as_list(data.get('has_key') or []))
+    keys.extend(_key_condition(clause, True) for clause in _as_list(data.get('value_matches') or []))
+
+    if data.get('group'):
+        if depth >= MAX_GROUP_DEPTH:
+            raise ValueError('Groups are nested too deeply')
+        try:
+            group = TargetGroup.objects.get(name=data['group'])
+        except TargetGroup.DoesNotExist:
+            raise ValueError(f'Unknown group: {data["group"]}')
+        nested = compile_selector(group.selector, depth + 1)
+        prefixes.append(nested.prefix)
+        if nested.name_pattern is not None:
+            patterns.append(nested.name_pattern.pattern)
+        keys.extend(nested.keys)
+
+    # The longest prefix implies the others, unless they contradict it
+    prefix = max(prefixes, key=len, default='')
+    name_pattern = None
+    if any(not prefix.startswith(other) for other in prefixes):
+        name_pattern = re.compile(r'(?!)')  # Matches nothing
+    elif len(patterns) == 1:
+        name_pattern = re.compile(patterns[0])
+    elif patterns:
+        # Every pattern must match: chain them as lookaheads
+        name_pattern = re.compile(''.join(f'(?={pattern})' for pattern in patterns))
+    return Selector(prefix, name_pattern, tuple(keys))
+
+
+def _key_matches(condition, config):
+    obj = parse_config_string(config.get(condition.category, ''))
+    if condition.key:
+        if condition.case_sensitive:
+            values = [obj[condition.key]] if condition.key in obj else []
+        else:
+            lower_key = condition.key.lower()
+            values = [value for key, value in obj.items() if key.lower() == lower_key]
+    else:
+        values = list(obj.values())
+    if condition.pattern is None:
+        return bool(values)
+    return any(condition.pattern.search(value) for value in values)
+
+
+def selector_matches(selector, name, config):
+    if not name.startswith(selector.prefix):
+        return False
+    if selector.name_pattern is not None and not selector.name_pattern.match(name):
+        return False
+    return all(_key_matches(condition, config) for condition in selector.keys)
+
+
+def select_page(records, start, length):
+    """
+    Count the (name, config) records of a selection and keep one page of them.
+    Returns (count, {name: config} of the page, in selection order).
+    """
+    count = 0
+    page = {}
+    for name, config in records:
+        if start <= count and (length < 0 or count < start + length):
+            page[name] = config
+        count += 1
+    return count, page
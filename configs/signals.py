@@ -0,0 +1,8 @@
+from django.dispatch import Signal
+
+
+# Sent by the config stores after records were written or deleted, with
+# names (the records that changed), version (the new collection version) and,
+# when the writer knows them, configs ({name: new config}, None once deleted)
+# and previous ({name: config the write replaced}, None for created records)
+records_changed = Signal()
@@ -1,55 +1,113 @@
 // Global variables and constants
 let maxSections = 3;
 let constantCategories = ['config1', 'config2', 'config3', 'config4', 'config5', 'config6', 'config7'];
+// Operations whose key is a glob or regex pattern applied to every matching key
+let patternOperations = ['edit_matching', 'delete_matching', 'substitute'];
 let table; // Global table reference
+let selectedNames = new Set(); // Names selected across all table pages
 let hasPreviewed = false; // Track if user has previewed current operations
+let previewToken = null; // Token of the last preview, lets Submit reuse its computed configs
+let changeSeq = null; // Position in the change feed the table is current with
+let previewRows = []; // Rows of the last preview, as streamed so far
+let previewRequest = null; // AbortController of the preview being streamed
+let previewRenderPending = false;
+// Preview rows have a fixed height so only those scrolled into view need to be in the DOM
+const PREVIEW_ROW_HEIGHT = 120;
+const PREVIEW_OVERSCAN = 10; // Rows rendered above and below the visible ones
 
 // Initialize the application when document is ready
 $(document).ready(function() {
-    // Check for success message from previous submission
-    if (sessionStorage.getItem('configUpdateSuccess') === 'true') {
-        alert('Configs updated successfully!');
-        sessionStorage.removeItem('configUpdateSuccess'); // Clear the flag
-    }
-    
     // Only essential initialization that needs to happen on page load
+    // (the table draws its first page from the one embedded by the index view)
     initializeDataTable();
     initializeRowSelection();
-    updateTable();
+    watchChanges();
 });
 
 // Initialize DataTable
 function initializeDataTable() {
+    let initialPage = readInitialPage();
     table = $('#configTable').DataTable({
+        // Paging, ordering and search are done by /api/configs/
+        serverSide: true,
+        processing: true,
+        searchDelay: 400,
+        ajax: function(data, callback) {
+            // The first draw is served from the page embedded by the index view
+            if (initialPage && isInitialPageRequest(data, initialPage)) {
+                let page = initialPage;
+                initialPage = null;
+                callback({ ...page, draw: data.draw });
+                return;
+            }
+            initialPage = null;
+            $.ajax({
+                // Compact rows carry only the structured config, see formatConfig()
+                url: '/api/configs/',
+                data: { ...data, compact: 1 },
+                dataType: 'json',
+                cache: false,
+                success: callback,
+                error: function(xhr, status, error) {
+                    alert('Error loading configs: ' + error);
+                }
+            });
+        },
         columns: [
             { data: 'name' },
-            { data: 'config' }
+            { data: 'config', orderable: false, render: formatConfig }
         ],
-        data: [],
+        order: [[0, 'asc']],
         rowCallback: function(row, data) {
-            if (!$(row).hasClass('selected')) {
-                $(row).removeClass('selected');
-            }
+            // Restore the selection of rows that were selected on another page
+            $(row).toggleClass('selected', selectedNames.has(data.name));
+        }
+    });
+    table.on('xhr', function(e, settings, json) {
+        // A freshly loaded page is current with the version it was read at
+        if (json && json.version !== undefined && (changeSeq === null || json.version > changeSeq)) {
+            changeSeq = json.version;
         }
     });
 }
 
+// The first listing page embedded in the index page, or null
+function readInitialPage() {
+    let element = document.getElementById('initial-page');
+    return element ? JSON.parse(element.textContent) : null;
+}
+
+function isInitialPageRequest(data, page) {
+    return data.start === page.start && data.length === page.length && !data.search.value &&
+           data.order.length === 1 && data.order[0].column === 0 && data.order[0].dir === 'asc';
+}
+
+// Flatten a {category: config_string} object for display: 'category1: ...; category2: ...'
+function formatConfig(config) {
+    return Object.entries(config || {}).map(([category, value]) => `${category}: ${value}`).join('; ');
+}
+
 // Initialize row selection
 function initializeRowSelection() {
     $('#configTable tbody').on('click', 'tr', function() {
-        $(this).toggleClass('selected');
+        let data = table.row(this).data();
+        if (!data) {
+            return; // Empty table or "processing" row
+        }
+        if (selectedNames.has(data.name)) {
+            selectedNames.delete(data.name);
+        } else {
+            selectedNames.add(data.name);
+        }
+        $(this).toggleClass('selected', selectedNames.has(data.name));
     });
 }
 
 // Main function called when modal button is clicked
 function initializeModal() {
-    let selectedRows = table.rows('.selected').data().toArray();
-    if (selectedRows.length === 0) {
-        alert('Please select at least one row in the table.');
-        return;
-    }
-    
-    let names = selectedRows.map(row => row.name).join(', ');
+    // Large selections are summarized, the names themselves stay in selectedNames
+    let names = selectedNames.size > 100 ? `${selectedNames.size} records selected`
+                                         : Array.from(selectedNames).join(', ');
     $('#recordName').val(names);
     resetSections();
     setupModalEventHandlers();
@@ -67,6 +125,7 @@ function setupModalEventHandlers() {
         $('#configForm input[type="checkbox"]').prop('checked', false);
         $('#configForm select').prop('selectedIndex', 0);
         hasPreviewed = false; // Reset preview flag when modal is closed
+        previewToken = null;
     });
 
     // Add section
@@ -92,14 +151,19 @@ function setupModalEventHandlers() {
     // Reset button
     $('#resetBtn').off('click').on('click', function() {
         resetSections();
+        cancelPreview();
         $('#modalPreviewTableContainer').html('');
         hasPreviewed = false; // Reset preview flag when reset is clicked
     });
 
+    $('#targetGlob').off('input').on('input', function() {
+        hasPreviewed = false; // The target changed
+    });
+
     // Preview button
     $('#previewBtn').off('click').on('click', function() {
-        let names = $('#recordName').val().split(',').map(n => n.trim()).filter(Boolean);
-        if (names.length === 0) {
+        let target = currentTarget();
+        if (!target) {
             alert('No names selected.');
             return;
         }
@@ -113,66 +177,13 @@ function setupModalEventHandlers() {
             return;
         }
 
-        $.ajax({
-            url: '/api/preview/',
-            method: 'POST',
-            contentType: 'application/json',
-            data: JSON.stringify({ names, operations }),
-            success: function(data) {
-                let previewRows = data.preview_rows;
-                let container = $('#modalPreviewTableContainer');
-                
-                console.log('Preview data received:', data);
-                console.log('Container found:', container.length > 0);
-                console.log('Container current HTML:', container.html());
-                
-                // Clear container
-                container.empty();
-                
-                // Ensure container is visible
-                container.show();
-                
-                // Add note section
-                container.append('<div class="mb-2"><strong>Note:</strong> <span class="added">Added</span> (green), <span class="appended">Appended</span> (pink), <span class="edited">Edited</span> (orange)</div>');
-                
-                // Create table
-                let table = $('<table class="table table-bordered table-sm" style="margin-bottom: 0; font-size: 0.875rem;"></table>');
-                let thead = $('<thead><tr><th style="width: 15%; padding: 0.5rem; word-wrap: break-word; max-width: 150px;">Name</th><th style="width: 42.5%; padding: 0.5rem; word-wrap: break-word; max-width: 300px;">Old Config</th><th style="width: 42.5%; padding: 0.5rem; word-wrap: break-word; max-width: 300px;">New Config (Preview)</th></tr></thead>');
-                let tbody = $('<tbody></tbody>');
-                
-                // Add rows
-                previewRows.forEach(function(row) {
-                    let tr = $('<tr></tr>');
-                    tr.append('<td style="vertical-align: top; padding: 0.5rem; word-wrap: break-word; max-width: 150px; white-space: pre-wrap; overflow-wrap: break-word;">' + row.name + '</td>');
-                    tr.append('<td style="vertical-align: top; padding: 0.5rem; word-wrap: break-word; max-width: 300px; white-space: pre-wrap; overflow-wrap: break-word;">' + row.old_config + '</td>');
-                    tr.append('<td style="vertical-align: top; padding: 0.5rem; word-wrap: break-word; max-width: 300px; white-space: pre-wrap; overflow-wrap: break-word;">' + row.new_config + '</td>'); // HTML color coding should work now
-                    tbody.append(tr);
-                });
-                
-                table.append(thead).append(tbody);
-                container.append(table);
-                
-                console.log('Table HTML created:', container.html());
-                console.log('Container final HTML:', container.html());
-                console.log('Container is visible:', container.is(':visible'));
-                
-                // Mark that preview has been done for current operations
-                hasPreviewed = true;
-            },
-            error: function(xhr, status, error) {
-                let errorMessage = 'Error generating preview: ' + error;
-                if (xhr.responseJSON && xhr.responseJSON.details) {
-                    errorMessage += '\n\nValidation errors:\n' + xhr.responseJSON.details.join('\n');
-                }
-                alert(errorMessage);
-            }
-        });
+        streamPreview({ ...target, operations });
     });
 
     // Submit button
     $('#submitBtn').off('click').on('click', function() {
-        let names = $('#recordName').val().split(',').map(n => n.trim()).filter(Boolean);
-        if (names.length === 0) {
+        let target = currentTarget();
+        if (!target) {
             alert('No names selected.');
             return;
         }
@@ -196,15 +207,17 @@ function setupModalEventHandlers() {
             url: '/api/update/',
             method: 'POST',
             contentType: 'application/json',
-            data: JSON.stringify({ names, operations }),
-            success: function(data) {
-                $('#configModal').modal('hide');
-                $('#modalPreviewTableContainer').html('');
-                hasPreviewed = false; // Reset preview flag
-                // Set success message in session storage before reload
-                sessionStorage.setItem('configUpdateSuccess', 'true');
-                // Reload the page to refresh all data
-                window.location.reload();
+            // The target and operations are still sent so the server can
+            // recompute if the preview token has expired
+            data: JSON.stringify({ ...target, operations, preview_token: previewToken }),
+            success: function(data, status, xhr) {
+                if (xhr.status === 202) {
+                    // Large batch queued as a background job: follow its progress
+                    $('#submitBtn').prop('disabled', true);
+                    pollJobProgress(data.job_id);
+                    return;
+                }
+                finishSubmit(data.results);
             },
             error: function(xhr, status, error) {
                 let errorMessage = 'Error updating configs: ' + error;
@@ -284,17 +297,37 @@ function setupModalEventHandlers() {
         validateSectionInRealTime($(this).closest('.modal-section'));
     });
     
+    $(document).off('change input', '.match-select, .find-input').on('change input', '.match-select, .find-input', function() {
+        hasPreviewed = false; // Reset preview flag when the pattern changes
+        validateSectionInRealTime($(this).closest('.modal-section'));
+    });
+
     $(document).off('change', '.case-checkbox').on('change', '.case-checkbox', function() {
         hasPreviewed = false; // Reset preview flag when case sensitivity changes
         validateSectionInRealTime($(this).closest('.modal-section'));
     });
 }
 
+// Records the operations apply to: a name pattern resolved by the server, or the selected rows
+function currentTarget() {
+    let glob = $('#targetGlob').val().trim();
+    if (glob) {
+        return { selector: { glob } };
+    }
+    if (selectedNames.size === 0) {
+        return null;
+    }
+    return { names: Array.from(selectedNames) };
+}
+
 function createSection() {
     let operationOptions = [
         { value: 'edit', label: 'Edit' },
         { value: 'append', label: 'Append' },
-        { value: 'delete', label: 'Delete' }
+        { value: 'delete', label: 'Delete' },
+        { value: 'edit_matching', label: 'Edit matching' },
+        { value: 'delete_matching', label: 'Delete matching' },
+        { value: 'substitute', label: 'Substitute' }
     ];
     
     let catSelect = '<select class="form-select category-select" name="category">';
@@ -315,10 +348,21 @@ function createSection() {
                         ${operationOptions.map(opt => `<option value="${opt.value}">${opt.label}</option>`).join('')}
                     </select>
                 </div>
+                <div class="pattern-group" style="flex: 0 0 7rem; display: none;">
+                    <label style="display: block; margin-bottom: 0.25rem; font-weight: 500; font-size: 0.875rem;">Match</label>
+                    <select class="form-select match-select" name="match">
+                        <option value="glob">Glob</option>
+                        <option value="regex">Regex</option>
+                    </select>
+                </div>
                 <div style="flex: 1; min-width: 0;">
                     <label style="display: block; margin-bottom: 0.25rem; font-weight: 500; font-size: 0.875rem;">Key</label>
                     <input type="text" class="form-control key-input" name="key" style="width: 100%;">
                 </div>
+                <div class="find-group" style="flex: 1; min-width: 0; display: none;">
+                    <label style="display: block; margin-bottom: 0.25rem; font-weight: 500; font-size: 0.875rem;">Find (regex)</label>
+                    <input type="text" class="form-control find-input" name="find" style="width: 100%;">
+                </div>
                 <div style="flex: 1; min-width: 0;">
                     <label style="display: block; margin-bottom: 0.25rem; font-weight: 500; font-size: 0.875rem;">Value</label>
                     <input type="text" class="form-control value-input" name="value" style="width: 100%;">
@@ -350,6 +394,8 @@ function updateSectionFields(specificSection = null) {
         } else {
             $(this).find('.value-group').show();
         }
+        $(this).find('.pattern-group').toggle(patternOperations.includes(op));
+        $(this).find('.find-group').toggle(op === 'substitute');
         
         let appendOption = $(this).find('.operation-select option[value="append"]');
         if (category === 'config1') {
@@ -395,7 +441,7 @@ function updateButtonVisibility() {
     }
 }
 
-function validateOperation(category, op, key, value, caseSensitive) {
+function validateOperation(category, op, key, value, caseSensitive, match, find) {
     // Strip whitespace
     key = key.trim();
     value = value.trim();
@@ -404,6 +450,10 @@ function validateOperation(category, op, key, value, caseSensitive) {
     if (!key) {
         return { isValid: false, error: "Key cannot be empty" };
     }
+
+    if (patternOperations.includes(op)) {
+        return validatePatternOperation(op, key, value, match, find);
+    }
     
     // Check for invalid characters in key
     if (/[;\s"'\\]/.test(key)) {
@@ -437,6 +487,37 @@ function validateOperation(category, op, key, value, caseSensitive) {
     return { isValid: true, error: "" };
 }
 
+// Key patterns may use regex syntax; values keep the usual restrictions
+function validatePatternOperation(op, key, value, match, find) {
+    if (/[;\s"']/.test(key)) {
+        return { isValid: false, error: `Key pattern '${key}' cannot contain spaces, semicolons or quotes` };
+    }
+    if (match === 'regex') {
+        try {
+            new RegExp(key);
+        } catch (e) {
+            return { isValid: false, error: `Invalid key pattern: ${e.message}` };
+        }
+    }
+    if (op === 'substitute') {
+        if (!find) {
+            return { isValid: false, error: "Find pattern is required for substitute" };
+        }
+        try {
+            new RegExp(find);
+        } catch (e) {
+            return { isValid: false, error: `Invalid find pattern: ${e.message}` };
+        }
+    }
+    if (op !== 'delete_matching' && /[;\s"'\\]/.test(value)) {
+        return { isValid: false, error: `Value '${value}' cannot contain spaces, semicolons, quotes or backslashes` };
+    }
+    if (op === 'edit_matching' && !value) {
+        return { isValid: false, error: "Value cannot be empty for edit matching" };
+    }
+    return { isValid: true, error: "" };
+}
+
 function validateSectionInRealTime(section) {
     let validation = validateOperationSection(section);
     let errorDiv = section.find('.validation-error');
@@ -457,7 +538,8 @@ function validateSectionInRealTime(section) {
         if (!keyInput.val().trim()) {
             keyInput.addClass('is-invalid');
         }
-        if (section.find('.operation-select').val() !== 'delete' && !valueInput.val().trim()) {
+        if (!['delete', 'delete_matching', 'substitute'].includes(section.find('.operation-select').val()) &&
+            !valueInput.val().trim()) {
             valueInput.addClass('is-invalid');
         }
         
@@ -473,18 +555,20 @@ function validateOperationSection(section) {
     let key = section.find('.key-input').val().trim();
     let value = section.find('.value-input').val().trim();
     let caseSensitive = section.find('.case-checkbox').is(':checked');
+    let match = section.find('.match-select').val();
+    let find = section.find('.find-input').val();
     
     // Basic validation - check if required fields are filled
     if (!key) {
         return { isValid: false, error: "Key is required" };
     }
     
-    if (op !== 'delete' && !value) {
+    if (['edit', 'append'].includes(op) && !value) {
         return { isValid: false, error: "Value is required for edit and append operations" };
     }
     
     // Detailed validation
-    return validateOperation(category, op, key, value, caseSensitive);
+    return validateOperation(category, op, key, value, caseSensitive, match, find);
 }
 
 function collectOperations() {
@@ -511,6 +595,10 @@ function collectOperations() {
         let validation = validateOperationSection(section);
         if (!validation.isValid) {
             validationErrors.push(`Section ${index + 1}: ${validation.error}`);
+        } else if (patternOperations.includes(op)) {
+            let match = section.find('.match-select').val();
+            let find = section.find('.find-input').val();
+            operations.push({ category, op, key, value, caseSensitive, match, find });
         } else {
             operations.push({ category, op, key, value, caseSensitive });
         }
@@ -540,14 +628,221 @@ function collectOperations() {
     return operations;
 }
 
+// Stream a preview from /api/preview/stream/ and show its rows as they arrive
+function streamPreview(payload) {
+    cancelPreview();
+    let request = previewRequest = new AbortController();
+    previewRows = [];
+    previewToken = null;
+    hasPreviewed = false;
+
+    let container = $('#modalPreviewTableContainer');
+    container.empty().show().scrollTop(0);
+    container.append('<div class="mb-2" id="previewStatus">Computing preview...</div>');
+    container.append('<div class="mb-2"><strong>Note:</strong> <span class="added">Added</span> (green), <span class="appended">Appended</span> (pink), <span class="edited">Edited</span> (orange)</div>');
+    container.append('<table class="table table-bordered table-sm" style="margin-bottom: 0; font-size: 0.875rem; table-layout: fixed;">' +
+                     '<thead><tr><th style="width: 15%; padding: 0.5rem;">Name</th><th style="width: 42.5%; padding: 0.5rem;">Old Config</th>' +
+                     '<th style="width: 42.5%; padding: 0.5rem;">New Config (Preview)</th></tr></thead>' +
+                     '<tbody id="previewBody"></tbody></table>');
+    container.off('scroll').on('scroll', schedulePreviewRender);
+
+    let count = null;
+    fetch('/api/preview/stream/', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(payload),
+        signal: request.signal
+    }).then(async function(response) {
+        if (!response.ok) {
+            let data = await response.json().catch(() => ({}));
+            throw { message: data.error || response.statusText, details: data.details };
+        }
+        await readNdjson(response, function(line) {
+            if (line.error) {
+                throw { message: line.error };
+            }
+            if (line.rows) {
+                line.rows.forEach(row => previewRows.push(row));
+                schedulePreviewRender();
+                $('#previewStatus').text(`Computing preview... ${previewRows.length}` + (count === null ? '' : ` of ${count}`) + ' record(s)');
+            } else if (line.done) {
+                $('#previewStatus').html(`<strong>${line.count}</strong> record(s)`);
+                hasPreviewed = true;
+                previewToken = line.preview_token;
+            } else {
+                count = line.count;
+            }
+        });
+    }).catch(function(error) {
+        if (error.name === 'AbortError') {
+            return; // Replaced by a newer preview or reset
+        }
+        $('#previewStatus').text('Preview failed');
+        let errorMessage = 'Error generating preview: ' + error.message;
+        if (error.details) {
+            errorMessage += '\n\nValidation errors:\n' + error.details.join('\n');
+        }
+        alert(errorMessage);
+    }).finally(function() {
+        if (previewRequest === request) {
+            previewRequest = null;
+        }
+    });
+}
+
+function cancelPreview() {
+    if (previewRequest) {
+        previewRequest.abort();
+        previewRequest = null;
+    }
+}
+
+// Call onLine with each JSON value of an NDJSON response as soon as its line is complete
+async function readNdjson(response, onLine) {
+    let reader = response.body.getReader();
+    let decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        let { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        let lines = buffer.split('\n');
+        buffer = lines.pop(); // Incomplete last line
+        lines.filter(line => line.trim()).forEach(line => onLine(JSON.parse(line)));
+    }
+    if (buffer.trim()) {
+        onLine(JSON.parse(buffer));
+    }
+}
+
+// Render at most once per frame however fast rows arrive or the list scrolls
+function schedulePreviewRender() {
+    if (!previewRenderPending) {
+        previewRenderPending = true;
+        requestAnimationFrame(renderPreviewRows);
+    }
+}
+
+// Render the preview rows in view, with spacer rows standing in for the others
+function renderPreviewRows() {
+    previewRenderPending = false;
+    let tbody = document.getElementById('previewBody');
+    if (!tbody) {
+        return; // Preview was cleared
+    }
+    let container = document.getElementById('modalPreviewTableContainer');
+    // Position of the first row within the scrolled content
+    let offset = tbody.getBoundingClientRect().top - container.getBoundingClientRect().top + container.scrollTop;
+    let first = Math.max(Math.floor((container.scrollTop - offset) / PREVIEW_ROW_HEIGHT) - PREVIEW_OVERSCAN, 0);
+    first = Math.min(first, previewRows.length);
+    let last = Math.min(first + Math.ceil(container.clientHeight / PREVIEW_ROW_HEIGHT) + 2 * PREVIEW_OVERSCAN, previewRows.length);
+
+    let html = [previewSpacer(first)];
+    for (let index = first; index < last; index++) {
+        html.push(previewRowHtml(previewRows[index]));
+    }
+    html.push(previewSpacer(previewRows.length - last));
+    tbody.innerHTML = html.join('');
+}
+
+function previewSpacer(rows) {
+    return rows > 0 ? `<tr style="height: ${rows * PREVIEW_ROW_HEIGHT}px;"><td colspan="3" style="padding: 0; border: 0;"></td></tr>` : '';
+}
+
+function previewRowHtml(row) {
+    // Cells scroll on their own so every row keeps PREVIEW_ROW_HEIGHT
+    let cell = content => '<td style="vertical-align: top; padding: 0.5rem;">' +
+        `<div style="max-height: ${PREVIEW_ROW_HEIGHT - 20}px; overflow-y: auto; white-space: pre-wrap; overflow-wrap: break-word;">` +
+        content + '</div></td>';
+    return `<tr style="height: ${PREVIEW_ROW_HEIGHT}px;">` + cell(row.name) + cell(row.old_config) + cell(row.new_config) + '</tr>';
+}
+
 function updateTable() {
-    $.get('/api/configs/', function(resp) {
-        let data = resp.data.map(rec => {
-            return {
-                name: rec.name,
-                config: rec.config
-            };
+    // Refetch the current page, keeping the paging position
+    table.ajax.reload(null, false);
+}
+
+// Fetch the records changed since changeSeq and patch them into the table.
+// With wait > 0 the server holds the request until something changes.
+function fetchChanges(wait) {
+    if (changeSeq === null) {
+        return $.Deferred().resolve().promise(); // First page not loaded yet
+    }
+    return $.get('/api/changes/', { since: changeSeq, wait: wait || 0, compact: 1 }).done(applyChanges);
+}
+
+function applyChanges(feed) {
+    if (feed.seq <= changeSeq) {
+        return; // Nothing new, or already applied by another request
+    }
+    changeSeq = feed.seq;
+    if (feed.reset || feed.changes.some(change => change.deleted)) {
+        updateTable(); // Too far behind, or rows left the page
+        return;
+    }
+    feed.changes.forEach(function(change) {
+        // Records on other pages show up when those pages are loaded
+        let row = table.row((index, data) => data.name === change.name);
+        if (row.any()) {
+            row.data({ ...row.data(), config: change.config });
+        }
+    });
+}
+
+// Follow the change feed so edits by other operators show up without reloading:
+// long-polls when the server holds them (CONFIG_CHANGES['LONG_POLL']), polls otherwise
+function watchChanges() {
+    let feed = readChangeFeed();
+    if (changeSeq === null) {
+        setTimeout(watchChanges, 1000); // Wait for the first page
+        return;
+    }
+    fetchChanges(feed.wait)
+        .done(function() { setTimeout(watchChanges, feed.wait > 0 ? 0 : feed.interval * 1000); })
+        .fail(function() { setTimeout(watchChanges, Math.max(feed.interval * 1000, 5000)); });
+}
+
+function readChangeFeed() {
+    let element = document.getElementById('change-feed');
+    return element ? JSON.parse(element.textContent) : { wait: 0, interval: 10 };
+}
+
+// Close the modal and refresh the table after an update completed
+function finishSubmit(results) {
+    $('#configModal').modal('hide');
+    previewRows = [];
+    $('#modalPreviewTableContainer').html('');
+    $('#submitBtn').prop('disabled', false);
+    hasPreviewed = false; // Reset preview flag
+    
+    let failed = results.filter(result => !result.success);
+    if (failed.length > 0) {
+        alert(`Configs updated with ${failed.length} failure(s):\n` +
+              failed.slice(0, 20).map(result => `${result.name}: ${result.error}`).join('\n'));
+    } else {
+        alert('Configs updated successfully!');
+    }
+    fetchChanges();
+}
+
+// Poll a background update job until all of its records are processed
+function pollJobProgress(jobId) {
+    let container = $('#modalPreviewTableContainer');
+    $.get(`/api/jobs/${jobId}/`, { results: 0 }, function(progress) {
+        container.html(`<div><strong>Update job ${jobId}:</strong> ${progress.done + progress.failed} of ${progress.total} processed` +
+                       ` (${progress.failed} failed)</div>`);
+        if (progress.status !== 'done') {
+            setTimeout(function() { pollJobProgress(jobId); }, 1000);
+            return;
+        }
+        // Fetch the per-record results once the job has finished
+        $.get(`/api/jobs/${jobId}/`, function(finished) {
+            finishSubmit(finished.results);
         });
-        table.clear().rows.add(data).draw();
+    }).fail(function(xhr, status, error) {
+        $('#submitBtn').prop('disabled', false);
+        alert('Error checking update progress: ' + error);
     });
-} 
\ No newline at end of file
+}
@@ -0,0 +1,717 @@
+import json
+import logging
+import re
+import threading
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import F, Q
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .instrumentation import count_round_trip
+from .keyindex import indexed_names
+from .models import CollectionVersion, ConfigRecord
+from .routing import read_alias
+from .selectors import selector_matches
+from .signals import records_changed
+from .structured import encode_config, in_sync_filter, stored_forms, structure_config, supports_plan, update_pipeline
+
+
+logger = logging.getLogger(__name__)
+
+# Number of names fetched per query and records written per bulk write
+RECORD_BATCH_SIZE = 500
+
+# Failure message for a compare-and-set write whose record changed since it was read
+WRITE_CONFLICT = 'Record changed since it was read'
+
+# CollectionVersion counter bumped by every write to the records
+RECORDS_VERSION = ConfigRecord._meta.db_table
+
+# Seconds after which a pending_updates entry is considered left behind by an
+# apply_plan() call whose process died before pulling it
+PENDING_UPDATE_TIMEOUT = 3600
+
+# OperationFailure codes of servers that cannot run the update pipelines:
+# FailedToParse (pipeline updates need MongoDB 4.2), InvalidPipelineOperator
+# ($replaceAll needs 4.4) and unrecognized pipeline stages
+UNSUPPORTED_PIPELINE_CODES = {9, 168, 40324}
+
+DEFAULT_CONFIG_STORE = {
+    'BACKEND': 'configs.store.DjangoConfigStore',
+    'OPTIONS': {},
+}
+
+
+class BaseConfigStore:
+    """
+    Storage for ConfigRecords. Configs are {category: config_string} dicts and
+    records are addressed by name; every method works on batches of names.
+    """
+
+    def __init__(self, batch_size=RECORD_BATCH_SIZE):
+        self.batch_size = batch_size
+
+    def batches(self, items):
+        items = list(items)
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
+
+    def get_many(self, names):
+        """Return a {name: config} dict for the names that exist"""
+        raise NotImplementedError
+
+    def write_many(self, updates, creates, expected=None):
+        """
+        Replace the config of existing records (updates) and insert new records
+        (creates), both {name: config} dicts.
+        With expected ({name: config}), an update is a compare-and-set: it is only
+        applied if the stored config still equals the expected one, and fails
+        with WRITE_CONFLICT otherwise.
+        Returns a {name: error_message} dict for records that could not be written.
+        """
+        failures = self._write_many(updates, creates, expected)
+        written = {name: config for name, config in (*updates.items(), *creates.items()) if name not in failures}
+        # Created records had no config before; replaced ones are only known
+        # for compare-and-set writes
+        previous = {name: None for name in creates if name in written}
+        if expected is not None:
+            previous.update((name, expected[name]) for name in updates if name in written and name in expected)
+        self.changed(written, configs=written, previous=previous)
+        return failures
+
+    def _write_many(self, updates, creates, expected):
+        raise NotImplementedError
+
+    def delete_many(self, names):
+        names = list(names)
+        self._delete_many(names)
+        self.changed(names, configs=dict.fromkeys(names))
+
+    def _delete_many(self, names):
+        raise NotImplementedError
+
+    def apply_plan(self, names, plan):
+        """
+        Apply a compiled plan to existing records inside the database, without
+        reading them first, for backends that can. Returns {name: (old config,
+        new config)} for the records updated; the caller reads and writes the others.
+        """
+        return {}
+
+    def version(self):
+        """Collection version: a counter bumped by every write"""
+        raise NotImplementedError
+
+    def _bump_version(self):
+        """Increment the collection version and return the new value"""
+        raise NotImplementedError
+
+    def changed(self, names, configs=None, previous=None):
+        """
+        Bump the collection version after names were written and notify
+        records_changed receivers. configs ({name: config}, None for deleted
+        records) and previous ({name: config before the write}, None for
+        created records) are passed on when the writer knows them.
+        """
+        names = list(names)
+        if not names:
+            return
+        version = self._bump_version()
+        records_changed.send(
+            sender=type(self), store=self, names=names, version=version, configs=configs, previous=previous
+        )
+
+    def count(self, search=''):
+        """Number of records, or of records whose name or config contains search"""
+        raise NotImplementedError
+
+    def page(self, start, length, search='', descending=False):
+        """
+        Return a list of (name, config) ordered on name, filtered like count().
+        A negative length returns every record from start on.
+        """
+        raise NotImplementedError
+
+    def iter_records(self):
+        """Yield every (name, config) pair"""
+        raise NotImplementedError
+
+    def select(self, selector):
+        """
+        Yield the (name, config) pairs matching a compiled Selector, ordered on
+        name. Backends narrow the scan down with an indexed query on the name
+        prefix; every candidate is then checked with selector_matches().
+        """
+        candidates = sorted(record for record in self.iter_records() if record[0].startswith(selector.prefix))
+        for name, config in candidates:
+            if selector_matches(selector, name, config):
+                yield name, config
+
+    def _select_indexed(self, selector):
+        """
+        select() reading only the records the key index finds every key of,
+        or None when it cannot narrow the selection down.
+        """
+        names = indexed_names(selector.keys)
+        if names is None:
+            return None
+        return self._select_names(selector, sorted(name for name in names if name.startswith(selector.prefix)))
+
+    def _select_names(self, selector, names):
+        for batch in self.batches(names):
+            configs = self.get_many(batch)
+            for name in batch:
+                if name in configs and selector_matches(selector, name, configs[name]):
+                    yield name, configs[name]
+
+    def upsert_many(self, configs):
+        """Write {name: config}, creating records that don't exist yet"""
+        existing = self.get_many(list(configs))
+        updates = {name: config for name, config in configs.items() if name in existing}
+        creates = {name: config for name, config in configs.items() if name not in existing}
+        return self.write_many(updates, creates)
+
+
+class DjangoConfigStore(BaseConfigStore):
+    """
+    Store backed by the ConfigRecord model through the Django ORM (djongo or SQL).
+    Writes go to the using database. Reads go there too when it is given,
+    otherwise the database routers pick one per query (see routing.py).
+    """
+
+    def __init__(self, using=None, **options):
+        super().__init__(**options)
+        self.using = using or router.db_for_write(ConfigRecord)
+        self.read_using = using
+
+    @property
+    def queryset(self):
+        return ConfigRecord.objects.using(self.using)
+
+    @property
+    def read_queryset(self):
+        return ConfigRecord.objects.using(self.read_using)
+
+    def get_many(self, names):
+        configs = {}
+        for batch in self.batches(names):
+            for name, config in self.read_queryset.filter(name__in=batch).values_list('name', 'config'):
+                # Keep the first record if a name was stored more than once
+                configs.setdefault(name, config)
+        return configs
+
+    def _write_many(self, updates, creates, expected):
+        failures = {}
+        for batch in self.batches(creates.items()):
+            try:
+                self.queryset.bulk_create([ConfigRecord(name=name, config=config) for name, config in batch])
+            except DatabaseError as exc:
+                failures.update((name, str(exc)) for name, _ in batch)
+
+        if not updates:
+            return failures
+
+        connection = connections[self.using]
+        if connection.settings_dict['ENGINE'] == 'djongo':
+            # djongo cannot translate the CASE expressions emitted by bulk_update,
+            # so send an unordered bulk write straight to the collection instead
+            failures.update(self._bulk_write_djongo(connection, updates, expected))
+            return failures
+
+        try:
+            with transaction.atomic(using=self.using):
+                records = []
+                for batch in self.batches(updates):
+                    queryset = self.queryset.filter(name__in=batch)
+                    if expected is not None:
+                        # Lock the rows so the comparison holds until the write
+                        queryset = queryset.select_for_update()
+                    for rec in queryset:
+                        if expected is not None and rec.name in expected and rec.config != expected[rec.name]:
+                            failures[rec.name] = WRITE_CONFLICT
+                            continue
+                        rec.config = updates[rec.name]
+                        records.append(rec)
+                self.queryset.bulk_update(records, ['config'], batch_size=self.batch_size)
+        except DatabaseError as exc:
+            failures.update((name, str(exc)) for name in updates)
+        return failures
+
+    def _bulk_write_djongo(self, connection, updates, expected):
+        field = ConfigRecord._meta.get_field('config')
+        collection = connection.cursor().db_conn[ConfigRecord._meta.db_table]
+        return bulk_write_updates(
+            collection, self.batches(updates.items()), expected,
+            encode=lambda config: field.get_db_prep_save(config, connection),
+            decode=lambda value: field.from_db_value(value, None, connection),
+            # Records may have been written by MongoConfigStore, keep its fields valid
+            match=lambda config: {'$in': stored_forms(config)},
+            fields=lambda config: {'data': structure_config(config)}
+        )
+
+    def _delete_many(self, names):
+        for batch in self.batches(names):
+            self.queryset.filter(name__in=batch).delete()
+
+    def _version_collection(self):
+        """The raw CollectionVersion collection on djongo, None on SQL databases"""
+        connection = connections[self.using]
+        if connection.settings_dict['ENGINE'] != 'djongo':
+            return None
+        return connection.cursor().db_conn[CollectionVersion._meta.db_table]
+
+    def version(self):
+        collection = self._version_collection()
+        if collection is not None:
+            return read_mongo_version(collection, RECORDS_VERSION)
+        versions = CollectionVersion.objects.using(self.using).filter(name=RECORDS_VERSION)
+        return versions.values_list('version', flat=True).first() or 0
+
+    def _bump_version(self):
+        collection = self._version_collection()
+        if collection is not None:
+            # djongo cannot translate F() updates, increment the document directly
+            return increment_mongo_version(collection, RECORDS_VERSION)
+        versions = CollectionVersion.objects.using(self.using)
+        with transaction.atomic(using=self.using):
+            if not versions.filter(name=RECORDS_VERSION).update(version=F('version') + 1):
+                versions.get_or_create(name=RECORDS_VERSION)
+                versions.filter(name=RECORDS_VERSION).update(version=F('version') + 1)
+            return versions.filter(name=RECORDS_VERSION).values_list('version', flat=True).get()
+
+    def _search(self, queryset, search):
+        if search:
+            queryset = queryset.filter(Q(name__icontains=search) | Q(config__icontains=search))
+        return queryset
+
+    def count(self, search=''):
+        return self._search(self.read_queryset, search).count()
+
+    def page(self, start, length, search='', descending=False):
+        queryset = self._search(self.read_queryset, search).order_by('-name' if descending else 'name')
+        queryset = queryset[start:start + length] if length >= 0 else queryset[start:]
+        return list(queryset.values_list('name', 'config'))
+
+    def iter_records(self):
+        return self.read_queryset.values_list('name', 'config').iterator(chunk_size=self.batch_size)
+
+    def select(self, selector):
+        indexed = self._select_indexed(selector)
+        if indexed is not None:
+            yield from indexed
+            return
+        queryset = self.read_queryset.order_by('name')
+        if selector.prefix:
+            queryset = queryset.filter(name__startswith=selector.prefix)
+        for key in text_prefilter_keys(selector):
+            # Coarse text prefilter, selector_matches() checks the category
+            queryset = queryset.filter(config__icontains=key)
+        for name, config in queryset.values_list('name', 'config').iterator(chunk_size=self.batch_size):
+            if selector_matches(selector, name, config):
+                yield name, config
+
+
+def text_prefilter_keys(selector):
+    """
+    Keys of a selector's conditions that the JSON text of every matching config
+    contains (ignoring case), whichever store wrote it. json.dumps() escapes
+    quotes, backslashes, control and non-ASCII characters, so keys with those
+    are left out, as are case-insensitive keys with a 'k': the Kelvin sign
+    lowercases to it.
+    """
+    return [
+        condition.key for condition in selector.keys
+        if condition.key and condition.key.isascii() and condition.key.isprintable()
+        and '"' not in condition.key and '\\' not in condition.key
+        and (condition.case_sensitive or 'k' not in condition.key.lower())
+    ]
+
+
+def bulk_write_updates(collection, batches, expected, encode, decode, match=None, fields=None):
+    """
+    Write batches of (name, config) updates to a Mongo collection with unordered
+    bulk writes. Configs are stored as encode(config), along with the fields(config)
+    dict when given. With expected, each update only matches a document whose
+    stored config matches match(expected[name]), encode(expected[name]) by default.
+    Returns a {name: error_message} dict.
+    """
+    from pymongo import UpdateOne
+    from pymongo.errors import BulkWriteError, PyMongoError
+
+    match = match or encode
+    failures = {}
+    for batch in batches:
+        requests = []
+        for name, config in batch:
+            query = {'name': name}
+            if expected is not None and name in expected:
+                query['config'] = match(expected[name])
+            values = {'config': encode(config), **(fields(config) if fields else {})}
+            requests.append(UpdateOne(query, {'$set': values}))
+        try:
+            result = collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as exc:
+            for error in exc.details.get('writeErrors', []):
+                failures[batch[error['index']][0]] = error.get('errmsg', 'Write failed')
+            continue
+        except PyMongoError as exc:
+            failures.update((name, str(exc)) for name, _ in batch)
+            continue
+
+        if expected is not None and result.matched_count < len(batch):
+            # Some compare-and-set filters did not match: find which ones
+            new_configs = dict(batch)
+            stored = collection.find({'name': {'$in': list(new_configs)}}, {'_id': 0, 'name': 1, 'config': 1})
+            written = {doc['name'] for doc in stored if decode(doc['config']) == new_configs[doc['name']]}
+            failures.update((name, WRITE_CONFLICT) for name in new_configs if name not in written)
+    return failures
+
+
+def read_mongo_version(collection, name):
+    doc = collection.find_one({'name': name}, {'_id': 0, 'version': 1})
+    return doc['version'] if doc else 0
+
+
+def increment_mongo_version(collection, name):
+    """Atomically increment the version counter document of name and return the new value"""
+    from pymongo import ReturnDocument
+
+    doc = collection.find_one_and_update(
+        {'name': name}, {'$inc': {'version': 1}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return doc['version']
+
+
+# MongoClients are thread-safe and pool their connections, so one client is
+# shared per host and pool configuration for the whole process
+_mongo_clients = {}
+_mongo_clients_lock = threading.Lock()
+
+
+def get_mongo_client(host, **client_options):
+    from pymongo import MongoClient
+
+    key = (host, tuple(sorted(client_options.items())))
+    with _mongo_clients_lock:
+        if key not in _mongo_clients:
+            _mongo_clients[key] = MongoClient(host, event_listeners=[_round_trip_listener()], **client_options)
+        return _mongo_clients[key]
+
+
+def _round_trip_listener():
+    from pymongo import monitoring
+
+    class RoundTripListener(monitoring.CommandListener):
+        """Counts Mongo commands as DB round trips of the instrumented request"""
+
+        def started(self, event):
+            count_round_trip()
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    return RoundTripListener()
+
+
+class MongoConfigStore(BaseConfigStore):
+    """
+    Store talking to MongoDB with pymongo, bypassing djongo's SQL translation.
+    It reads and writes the collection djongo manages for ConfigRecord, so both
+    stores can be used on the same data: config is kept as JSON text Django's
+    JSONField reads, and new documents get ids from djongo's __schema__ counter.
+
+    Documents also hold the structured form of their config (see structured.py),
+    which lets apply_plan() update records with a single update pipeline per
+    batch instead of reading and writing them back (atomic_updates).
+
+    Clients default to the host and pool options of DATABASES['default']; reads
+    made in routing.replica_reads() use the client of the read alias instead.
+    """
+
+    def __init__(self, host=None, db=None, collection=None, client_options=None, atomic_updates=True, **options):
+        super().__init__(**options)
+        self.atomic_updates = atomic_updates
+        self._swept_pending_updates = False
+        database = settings.DATABASES['default']
+        client_settings = dict(database.get('CLIENT', {}))
+        default_host = client_settings.pop('host', 'mongodb://localhost:27017/')
+        self.host = host or default_host
+        self.db_name = db or database['NAME']
+        self.collection_name = collection or ConfigRecord._meta.db_table
+        # The pool options given to djongo's client apply to this one too
+        self.client_options = client_settings if client_options is None else client_options
+
+    @property
+    def db(self):
+        return get_mongo_client(self.host, **self.client_options)[self.db_name]
+
+    @property
+    def collection(self):
+        return self.db[self.collection_name]
+
+    @property
+    def read_collection(self):
+        alias = read_alias()
+        if alias is None:
+            return self.collection
+        client_settings = dict(settings.DATABASES[alias].get('CLIENT', {}))
+        host = client_settings.pop('host', self.host)
+        return get_mongo_client(host, **client_settings)[self.db_name][self.collection_name]
+
+    def _decode(self, doc):
+        config = doc.get('config')
+        return json.loads(config) if isinstance(config, str) else (config or {})
+
+    def get_many(self, names):
+        configs = {}
+        for batch in self.batches(names):
+            cursor = self.read_collection.find({'name': {'$in': batch}}, {'_id': 0, 'name': 1, 'config': 1})
+            for doc in cursor:
+                configs.setdefault(doc['name'], self._decode(doc))
+        return configs
+
+    def _allocate_ids(self, count):
+        from pymongo import ReturnDocument
+
+        auto = self.db['__schema__'].find_one_and_update(
+            {'name': self.collection_name, 'auto': {'$exists': True}},
+            {'$inc': {'auto.seq': count}},
+            return_document=ReturnDocument.AFTER
+        )
+        if not auto:
+            return [None] * count
+        last_id = auto['auto']['seq']
+        return list(range(last_id - count + 1, last_id + 1))
+
+    def _write_many(self, updates, creates, expected):
+        from pymongo.errors import BulkWriteError, PyMongoError
+
+        failures = {}
+        if creates:
+            docs = []
+            for record_id, (name, config) in zip(self._allocate_ids(len(creates)), creates.items()):
+                doc = {'name': name, 'config': encode_config(config), 'data': structure_config(config)}
+                if record_id is not None:
+                    doc['id'] = record_id
+                docs.append(doc)
+            for start in range(0, len(docs), self.batch_size):
+                batch = docs[start:start + self.batch_size]
+                try:
+                    self.collection.insert_many(batch, ordered=False)
+                except BulkWriteError as exc:
+                    for error in exc.details.get('writeErrors', []):
+                        failures[batch[error['index']]['name']] = error.get('errmsg', 'Write failed')
+                except PyMongoError as exc:
+                    failures.update((doc['name'], str(exc)) for doc in batch)
+
+        failures.update(bulk_write_updates(
+            self.collection, self.batches(updates.items()), expected, encode=encode_config, decode=json.loads,
+            match=lambda config: {'$in': stored_forms(config)},
+            fields=lambda config: {'data': structure_config(config)}
+        ))
+        return failures
+
+    def apply_plan(self, names, plan):
+        """
+        Update every batch of records with one update_many() running the plan as
+        an update pipeline on their structured data. Each updated document gets
+        an entry tagged with a token of this call in its pending_updates array,
+        holding its config text before and after, which is read back and pulled
+        again: concurrent calls never lose track of the records they updated.
+        Entries older than PENDING_UPDATE_TIMEOUT, left by processes that died
+        in between, are dropped by the next update of their document and by a
+        sweep of the collection on the first call of each process.
+        Records it cannot update (missing, or last written by djongo or the
+        admin so their structured data is stale) are left to the caller, as
+        are plans with pattern operations.
+        """
+        from bson import ObjectId
+        from pymongo.errors import OperationFailure
+
+        if not self.atomic_updates or not supports_plan(plan):
+            return {}
+        token = ObjectId()
+        stale = ObjectId.from_datetime(token.generation_time - timedelta(seconds=PENDING_UPDATE_TIMEOUT))
+        if not self._swept_pending_updates:
+            self.collection.update_many(
+                {'pending_updates.t': {'$lt': stale}}, {'$pull': {'pending_updates': {'t': {'$lt': stale}}}}
+            )
+            self._swept_pending_updates = True
+        pipeline = [{'$set': {'_previous': '$config'}}] + update_pipeline(plan, create_categories=True) + [
+            {'$set': {'pending_updates': {'$concatArrays': [
+                {'$filter': {
+                    'input': {'$ifNull': ['$pending_updates', []]},
+                    'as': 'entry',
+                    'cond': {'$gt': ['$$entry.t', stale]},
+                }},
+                [{'t': token, 'old': '$_previous', 'new': '$config'}],
+            ]}}},
+            {'$unset': '_previous'},
+        ]
+        applied = {}
+        for batch in self.batches(names):
+            try:
+                self.collection.update_many({'name': {'$in': batch}, **in_sync_filter()}, pipeline)
+            except OperationFailure as exc:
+                # The remaining batches are left to the caller
+                if exc.code in UNSUPPORTED_PIPELINE_CODES:
+                    logger.exception('MongoDB cannot run the update pipeline, reading and writing records from now on')
+                    self.atomic_updates = False
+                else:
+                    logger.exception('Could not apply the update pipeline, reading and writing these records instead')
+                break
+            cursor = self.collection.find(
+                {'name': {'$in': batch}, 'pending_updates.t': token},
+                {'_id': 0, 'name': 1, 'pending_updates': {'$elemMatch': {'t': token}}}
+            )
+            for doc in cursor:
+                entry = doc['pending_updates'][0]
+                applied[doc['name']] = (json.loads(entry['old']), json.loads(entry['new']))
+            self.collection.update_many({'name': {'$in': batch}}, {'$pull': {'pending_updates': {'t': token}}})
+        self.changed(
+            applied,
+            configs={name: new_config for name, (_, new_config) in applied.items()},
+            previous={name: old_config for name, (old_config, _) in applied.items()},
+        )
+        return applied
+
+    def _delete_many(self, names):
+        for batch in self.batches(names):
+            self.collection.delete_many({'name': {'$in': batch}})
+
+    def version(self):
+        return read_mongo_version(self.db[CollectionVersion._meta.db_table], RECORDS_VERSION)
+
+    def _bump_version(self):
+        return increment_mongo_version(self.db[CollectionVersion._meta.db_table], RECORDS_VERSION)
+
+    def _filter(self, search):
+        if not search:
+            return {}
+        pattern = re.compile(re.escape(search), re.IGNORECASE)
+        return {'$or': [{'name': pattern}, {'config': pattern}]}
+
+    def count(self, search=''):
+        return self.read_collection.count_documents(self._filter(search))
+
+    def page(self, start, length, search='', descending=False):
+        from pymongo import ASCENDING, DESCENDING
+
+        cursor = (
+            self.read_collection.find(self._filter(search), {'_id': 0, 'name': 1, 'config': 1})
+            .sort('name', DESCENDING if descending else ASCENDING)
+            .skip(start)
+        )
+        if length >= 0:
+            cursor = cursor.limit(length)
+        return [(doc['name'], self._decode(doc)) for doc in cursor]
+
+    def iter_records(self):
+        cursor = self.read_collection.find({}, {'_id': 0, 'name': 1, 'config': 1}, batch_size=self.batch_size)
+        for doc in cursor:
+            yield doc['name'], self._decode(doc)
+
+    def select(self, selector):
+        from pymongo import ASCENDING
+
+        indexed = self._select_indexed(selector)
+        if indexed is not None:
+            yield from indexed
+            return
+        query = {}
+        if selector.prefix:
+            # An anchored, case-sensitive prefix regex uses the name index
+            query['name'] = {'$regex': '^' + re.escape(selector.prefix)}
+        keys = text_prefilter_keys(selector)
+        if keys:
+            query['$and'] = [{'config': re.compile(re.escape(key), re.IGNORECASE)} for key in keys]
+        cursor = (
+            self.read_collection.find(query, {'_id': 0, 'name': 1, 'config': 1}, batch_size=self.batch_size)
+            .sort('name', ASCENDING)
+        )
+        for doc in cursor:
+            name, config = doc['name'], self._decode(doc)
+            if selector_matches(selector, name, config):
+                yield name, config
+
+
+class MemoryConfigStore(BaseConfigStore):
+    """Process-local store for tests and local runs; contents are lost on restart"""
+
+    _records = {}
+    _version = 0
+    _lock = threading.Lock()
+
+    def get_many(self, names):
+        with self._lock:
+            return {name: dict(self._records[name]) for name in names if name in self._records}
+
+    def _write_many(self, updates, creates, expected):
+        failures = {}
+        with self._lock:
+            for name, config in updates.items():
+                if expected is not None and name in expected and self._records.get(name) != expected[name]:
+                    failures[name] = WRITE_CONFLICT
+                    continue
+                self._records[name] = dict(config)
+            for name, config in creates.items():
+                self._records[name] = dict(config)
+        return failures
+
+    def _delete_many(self, names):
+        with self._lock:
+            for name in names:
+                self._records.pop(name, None)
+
+    def version(self):
+        return MemoryConfigStore._version
+
+    def _bump_version(self):
+        with self._lock:
+            MemoryConfigStore._version += 1
+            return MemoryConfigStore._version
+
+    def _matching(self, search):
+        search = search.lower()
+        with self._lock:
+            records = list(self._records.items())
+        if search:
+            records = [
+                (name, config) for name, config in records
+                if search in name.lower() or search in json.dumps(config).lower()
+            ]
+        return records
+
+    def count(self, search=''):
+        return len(self._matching(search))
+
+    def page(self, start, length, search='', descending=False):
+        records = sorted(self._matching(search), reverse=descending)
+        records = records[start:start + length] if length >= 0 else records[start:]
+        return [(name, dict(config)) for name, config in records]
+
+    def iter_records(self):
+        for name, config in self._matching(''):
+            yield name, dict(config)
+
+
+@lru_cache(maxsize=None)
+def get_config_store():
+    """Return the store configured by settings.CONFIG_STORE"""
+    store_settings = getattr(settings, 'CONFIG_STORE', DEFAULT_CONFIG_STORE)
+    backend = import_string(store_settings['BACKEND'])
+    return backend(**store_settings.get('OPTIONS', {}))
+
+
+@receiver(setting_changed)
+def reset_config_store(*, setting, **kwargs):
+    if setting == 'CONFIG_STORE':
+        get_config_store.cache_clear()
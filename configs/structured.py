@@ -0,0 +1,197 @@
+import json
+
+from .operations import PATTERN_OPERATIONS, parse_config_string, stringify_config_object
+
+
+# Structured form of a config kept by the Mongo store next to its JSON text,
+# so updates can run inside the database: a list of
+# {'c': category, 's': config string, 'p': [{'k': key, 'v': value, 'l': lowercased key}]}
+# in category and key order. p is parse_config_string(s); l is computed here
+# because Mongo only lowercases ASCII.
+
+# json.dumps() escapes, applied in this order; other control characters become \u00XX
+JSON_ESCAPES = [('\\', '\\\\'), ('"', '\\"'), ('\n', '\\n'), ('\r', '\\r'), ('\t', '\\t'), ('\b', '\\b'), ('\f', '\\f')]
+JSON_ESCAPES += [(chr(code), f'\\u{code:04x}') for code in range(0x20) if chr(code) not in '\n\r\t\b\f']
+
+
+def encode_config(config):
+    """JSON text of a config as the Mongo store writes it, which the pipelines below reproduce"""
+    return json.dumps(config, ensure_ascii=False)
+
+
+def stored_forms(config):
+    """JSON texts a config may be stored as: by the Mongo store or by Django's JSONField"""
+    return [encode_config(config), json.dumps(config)]
+
+
+def structure_pairs(config_str):
+    return [{'k': key, 'v': value, 'l': key.lower()} for key, value in parse_config_string(config_str).items()]
+
+
+def structure_config(config):
+    return [{'c': category, 's': config_str, 'p': structure_pairs(config_str)} for category, config_str in config.items()]
+
+
+def supports_plan(plan):
+    """
+    Whether update_pipeline() gives the same result as apply_plan_to_config()
+    for a plan: no pattern operations, and no key or value that would change
+    meaning once written into a config string.
+    """
+    for group in plan:
+        for operation in group.operations:
+            if operation.op in PATTERN_OPERATIONS:
+                return False
+            if operation.op in ('edit', 'append') and (
+                not operation.key or ' ' in operation.key or ';' in operation.key or ';' in operation.value
+            ):
+                return False
+    return True
+
+
+def _literal(value):
+    # Strings starting with $ would otherwise be read as field paths
+    return {'$literal': value}
+
+
+def _escape(expression):
+    for char, escape in JSON_ESCAPES:
+        expression = {'$replaceAll': {'input': expression, 'find': char, 'replacement': escape}}
+    return expression
+
+
+def render_json(data):
+    """Expression rendering the structured data as encode_config() would the config"""
+    return {'$concat': ['{', {'$reduce': {'input': data, 'initialValue': '', 'in': {'$concat': [
+        '$$value', {'$cond': [{'$eq': ['$$value', '']}, '', ', ']},
+        '"', _escape('$$this.c'), '": "', _escape('$$this.s'), '"',
+    ]}}}, '}']}
+
+
+def _trimmed(value):
+    # Values only gain edge spaces from appending, so only spaces are trimmed
+    return {'$trim': {'input': value, 'chars': ' '}}
+
+
+def _apply_operation(pairs, operation):
+    """Expression applying one edit, append or delete to a pairs array, like apply_operations_to_config()"""
+    field = 'k' if operation.case_sensitive else 'l'
+    target = operation.key if operation.case_sensitive else operation.lower_key
+    if operation.op == 'delete':
+        # A case-insensitive delete removes every case variant of the key
+        return {'$filter': {'input': pairs, 'as': 'pair', 'cond': {'$ne': [f'$$pair.{field}', _literal(target)]}}}
+    if operation.op == 'edit':
+        replacement = {'$mergeObjects': ['$$found', {'v': _literal(operation.value)}]}
+    elif operation.op == 'append':
+        replacement = {'$mergeObjects': [
+            '$$found', {'v': {'$concat': ['$$found.v', ' ', _literal(operation.value)]}}
+        ]}
+    else:
+        return pairs  # 'add' only creates missing categories
+    return {'$let': {
+        'vars': {'pairs': pairs},
+        'in': {'$let': {
+            # The first key in key order matching (ignoring case when asked)
+            'vars': {'index': {'$indexOfArray': [f'$$pairs.{field}', _literal(target)]}},
+            'in': {'$cond': [
+                {'$gte': ['$$index', 0]},
+                {'$map': {
+                    'input': {'$range': [0, {'$size': '$$pairs'}]},
+                    'as': 'position',
+                    'in': {'$let': {
+                        'vars': {'found': {'$arrayElemAt': ['$$pairs', '$$position']}},
+                        'in': {'$cond': [{'$eq': ['$$position', '$$index']}, replacement, '$$found']},
+                    }},
+                }},
+                {'$concatArrays': ['$$pairs', [_literal(
+                    {'k': operation.key, 'v': operation.value, 'l': operation.lower_key}
+                )]]},
+            ]},
+        }},
+    }}
+
+
+def _apply_group(category, group, create_categories):
+    """Expression turning a category entry into the one apply_plan_to_config() produces"""
+    pairs = '$$category.p'
+    for operation in group.operations:
+        pairs = _apply_operation(pairs, operation)
+    applied = {'$let': {
+        'vars': {'pairs': pairs},
+        'in': {
+            'c': '$$category.c',
+            # stringify_config_object() strips values, and parsing the string
+            # back drops the keys left without one
+            's': {'$reduce': {'input': '$$pairs', 'initialValue': '', 'in': {'$concat': [
+                '$$value', '$$this.k', ' ', _trimmed('$$this.v'), ';'
+            ]}}},
+            'p': {'$map': {
+                'input': {'$filter': {'input': '$$pairs', 'as': 'pair', 'cond': {'$ne': [_trimmed('$$pair.v'), '']}}},
+                'as': 'pair',
+                'in': {'k': '$$pair.k', 'v': _trimmed('$$pair.v'), 'l': '$$pair.l'},
+            }},
+        },
+    }}
+    if not create_categories or group.add_operation is None:
+        return applied
+    created = stringify_config_object({group.add_operation.key: group.add_operation.value})
+    return {'$cond': [
+        {'$eq': ['$$category.s', '']},
+        _literal({'c': category, 's': created, 'p': structure_pairs(created)}),
+        applied,
+    ]}
+
+
+def update_pipeline(plan, create_categories=False):
+    """
+    Update pipeline (MongoDB 4.4+) applying a compiled plan to the structured
+    data of a document and rewriting its JSON text from it. Only valid for
+    plans accepted by supports_plan().
+    """
+    stages = []
+    for group in plan:
+        category = group.category
+        stages.append({'$set': {'data': {'$cond': [
+            {'$in': [_literal(category), '$data.c']},
+            '$data',
+            {'$concatArrays': ['$data', [_literal({'c': category, 's': '', 'p': []})]]},
+        ]}}})
+        stages.append({'$set': {'data': {'$map': {
+            'input': '$data',
+            'as': 'category',
+            'in': {'$cond': [
+                {'$eq': ['$$category.c', _literal(category)]},
+                _apply_group(category, group, create_categories),
+                '$$category',
+            ]},
+        }}}})
+    stages.append({'$set': {'config': render_json('$data')}})
+    return stages
+
+
+def in_sync_filter():
+    """
+    Query matching documents whose structured data still renders to their
+    JSON text. Writers that only rewrite the text (djongo, the admin) leave
+    documents out of sync, which then have to be updated from their text.
+    """
+    return {'$expr': {'$eq': ['$config', render_json('$data')]}}
+
+
+def convert_collection(collection, batch_size=500):
+    """Add the structured data to every document of a ConfigRecord collection, rewriting its text to match"""
+    from pymongo import UpdateOne
+
+    requests = []
+    converted = 0
+    for doc in collection.find({}, {'_id': 1, 'config': 1}, batch_size=batch_size):
+        config = json.loads(doc['config']) if isinstance(doc.get('config'), str) else (doc.get('config') or {})
+        requests.append(UpdateOne(
+            {'_id': doc['_id']}, {'$set': {'config': encode_config(config), 'data': structure_config(config)}}
+        ))
+        if len(requests) >= batch_size:
+            converted += collection.bulk_write(requests, ordered=False).modified_count
+            requests = []
+    if requests:
+        converted += collection.bulk_write(requests, ordered=False).modified_count
+    return converted
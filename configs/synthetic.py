@@ -0,0 +1,64 @@
+import random
+import string
+
+
+def random_token(rng, length):
+    return ''.join(rng.choice(string.ascii_lowercase + string.digits) for _ in range(length))
+
+
+def generate_config(rng, categories, keys, value_length):
+    """Build one {category: config_string} dict in the stored 'key value;' format"""
+    config = {}
+    for category_index in range(categories):
+        pairs = [f'key{key_index} {random_token(rng, value_length)}' for key_index in range(keys)]
+        config[f'config{category_index + 1}'] = ';'.join(pairs) + ';' if pairs else ''
+    return config
+
+
+def generate_fleet(records, categories=3, keys=20, value_length=12, duplication=0.5, seed=0, prefix='server'):
+    """
+    Yield (name, config) for a synthetic fleet.
+    duplication is the fraction of records that share their config with an
+    earlier record: 0 makes every config distinct, 0.99 leaves 1% distinct ones.
+    """
+    rng = random.Random(seed)
+    distinct = max(1, round(records * (1 - duplication)))
+    configs = [generate_config(rng, categories, keys, value_length) for _ in range(min(distinct, records))]
+    width = len(str(max(records - 1, 0)))
+    for index in range(records):
+        yield f'{prefix}-{index:0{width}d}', configs[index % len(configs)]
+
+
+# Characters that exercise the config string format: separators, whitespace
+# stripped by sanitizing, case variants and non-ASCII letters
+EDGE_ALPHABET = 'aAbBkK1 ;;\t\n\xa0éÉß_-'
+
+OPERATION_KINDS = ('edit', 'append', 'delete', 'edit_matching', 'delete_matching', 'substitute')
+
+
+def random_config_string(rng, max_pairs=6):
+    """A category string, half the time in the stored format and otherwise arbitrary"""
+    if rng.random() < 0.5:
+        return ''.join(rng.choice(EDGE_ALPHABET) for _ in range(rng.randint(0, 30)))
+    pairs = [f'{rng.choice(["a", "A", "b", "k", "ké", "K"])}{rng.randint(0, 3)} {random_token(rng, rng.randint(1, 6))}'
+             for _ in range(rng.randint(0, max_pairs))]
+    if rng.random() < 0.2 and pairs:
+        pairs.append(rng.choice(pairs))  # Duplicate key
+    return ';'.join(pairs) + ';' if pairs else ''
+
+
+def random_operation(rng, category):
+    """An operation dict as the client sends it"""
+    op = rng.choice(OPERATION_KINDS)
+    operation = {
+        'category': category,
+        'op': op,
+        'key': rng.choice(['a0', 'A1', 'b2', 'k3', 'ké0', 'K1', ' a0 ', 'new']),
+        'value': rng.choice(['', 'v', ' spaced value ', 'x y', random_token(rng, 4)]),
+        'caseSensitive': rng.random() < 0.5,
+    }
+    if op in ('edit_matching', 'delete_matching', 'substitute'):
+        operation['key'] = rng.choice(['a*', '*', 'k?', '[ab]*'])
+        operation['match'] = 'glob'
+        operation['find'] = rng.choice(['a', '[0-9]', 'x|y'])
+    return operation
@@ -1,3 +1,1175 @@
-from django.test import TestCase
+import asyncio
+import copy
+import gzip
+import json
+import random
+import threading
+import time
+import zlib
+from datetime import timedelta
+from functools import partial
+from unittest import mock
 
-# Create your tests here.
+from bson import ObjectId
+from django.core.cache import caches
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connections, router
+from django.http import StreamingHttpResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from pymongo.errors import OperationFailure
+
+from dvconfig.asgi import StreamingASGIHandler
+
+from . import changes, history, jobs, operations, parallel
+from .benchmarks import BENCHMARKS, BenchmarkFixture, compare_reports, run_benchmarks
+from .cache import cached_records
+from .diff import color_diff, diff_configs, format_config_for_display, render_diff_html, serialize_diff
+from .document import ConfigDocument
+from .history import configs_at, list_revisions, record_revisions, rollback_records
+from .instrumentation import aggregate
+from .jobs import claim_chunk, get_job_settings, job_progress, process_chunk, submit_update_job
+from .keyindex import index_rows, search_keys
+from .loadtest import compare_load_reports, percentile, run_load_test
+from .management.commands.load_test import parse_mix
+from .models import CollectionVersion, ConfigKey, ConfigRecord, ConfigRevision, TargetGroup, UpdateJobChunk
+from .operations import (
+    apply_operations_to_config, apply_plan_to_config, compile_operations, parse_config_string, sanitize_operation,
+    stringify_config_object
+)
+from .previews import get_preview_cache, stream_chunks
+from .routing import replica_reads
+from .selectors import compile_selector
+from .store import WRITE_CONFLICT, DjangoConfigStore, MemoryConfigStore, MongoConfigStore, get_config_store
+from .structured import encode_config, in_sync_filter, structure_config, supports_plan, update_pipeline
+from .synthetic import generate_fleet, random_config_string, random_operation
+from .transfer import EXPORT_FORMATS, import_records, read_csv, read_ndjson
+from .updates import MAX_WRITE_ATTEMPTS, update_records
+
+
+class ReplicaReadsMixin:
+    """For tests of views reading through the replica alias, a test mirror of 'default'"""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        super().setUp()
+        replica = connections['replica']
+        if replica.vendor == 'sqlite':
+            # The mirror is a second connection to the shared in-memory
+            # database; let it read this test's uncommitted writes
+            replica.cursor().execute('PRAGMA read_uncommitted = true')
+
+
+class BatchedRecordsTests(ReplicaReadsMixin, TestCase):
+    operations = [{'category': 'A', 'op': 'append', 'key': 'a', 'value': 'x', 'caseSensitive': True}]
+
+    def queries(self, path, count):
+        names = [f'{path}{count}-{index}' for index in range(count)]
+        get_config_store().upsert_many({name: {'A': 'a 1;'} for name in names})
+        body = json.dumps({'names': names, 'operations': self.operations})
+        with CaptureQueriesContext(connections['default']) as default, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.post(path, body, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return len(default) + len(replica)
+
+    def test_queries_do_not_grow_with_the_batch(self):
+        for path in ['/api/preview/', '/api/update/']:
+            with self.subTest(path=path):
+                self.assertEqual(self.queries(path, 5), self.queries(path, 50))
+
+
+@override_settings(CONFIG_HISTORY={'ENABLED': False})
+class ConfigStoreTests(TestCase):
+    def check_store(self, store):
+        version = store.version()
+        self.assertEqual(store.upsert_many({'b': {'A': 'x 1;'}, 'a': {'A': 'y 1;'}, 'c': {'B': 'x 2;'}}), {})
+        self.assertGreater(store.version(), version)
+        self.assertEqual(store.get_many(['a', 'missing']), {'a': {'A': 'y 1;'}})
+
+        failures = store.write_many({'a': {'A': 'y 2;'}, 'b': {'A': 'x 3;'}}, {}, expected={
+            'a': {'A': 'y 1;'}, 'b': {'A': 'stale;'}
+        })
+        self.assertEqual(failures, {'b': WRITE_CONFLICT})
+        self.assertEqual(store.get_many(['a', 'b']), {'a': {'A': 'y 2;'}, 'b': {'A': 'x 1;'}})
+
+        self.assertEqual((store.count(), store.count('X ')), (3, 2))
+        self.assertEqual([name for name, _ in store.page(1, 5)], ['b', 'c'])
+        self.assertEqual(store.page(0, 1, search='x ', descending=True), [('c', {'B': 'x 2;'})])
+        self.assertEqual(
+            sorted(store.iter_records()), [('a', {'A': 'y 2;'}), ('b', {'A': 'x 1;'}), ('c', {'B': 'x 2;'})]
+        )
+
+        store.delete_many(['a', 'c'])
+        self.assertEqual(store.get_many(['a', 'b', 'c']), {'b': {'A': 'x 1;'}})
+
+    def test_django_store(self):
+        self.check_store(DjangoConfigStore())
+
+    def test_memory_store(self):
+        MemoryConfigStore._records.clear()
+        self.addCleanup(MemoryConfigStore._records.clear)
+        self.check_store(MemoryConfigStore())
+
+
+class BenchmarkTests(TestCase):
+    def test_generate_fleet(self):
+        fleet = list(generate_fleet(10, categories=2, keys=3, duplication=0.8, seed=1, prefix='t'))
+        self.assertEqual(fleet, list(generate_fleet(10, categories=2, keys=3, duplication=0.8, seed=1, prefix='t')))
+        self.assertEqual([name for name, _ in fleet[:2]], ['t-0', 't-1'])
+        configs = {json.dumps(config) for _, config in fleet}
+        self.assertEqual(len(configs), 2)
+        self.assertEqual(
+            [list(parse_config_string(config['config2'])) for _, config in fleet[:1]], [['key0', 'key1', 'key2']]
+        )
+
+    def test_run_benchmarks_and_compare(self):
+        fixture = BenchmarkFixture(20, 2, 5, 6, 0.5, batch=10)
+        report = run_benchmarks(fixture, repeat=1)
+        self.assertEqual(set(report['results']), set(BENCHMARKS))
+        self.assertEqual(report['meta']['records'], 20)
+        self.assertEqual(MemoryConfigStore().get_many(list(fixture.fleet)), {})
+
+        report = {'results': {'parse': {'median_ms': 11.0}, 'apply': {'median_ms': 13.0}, 'new': {'median_ms': 1.0}}}
+        baseline = {'results': {'parse': {'median_ms': 10.0}, 'apply': {'median_ms': 10.0}}}
+        self.assertEqual(
+            [(name, regressed) for name, *_, regressed in compare_reports(report, baseline, tolerance=0.2)],
+            [('parse', False), ('apply', True)]
+        )
+
+
+class LoadTestTests(TransactionTestCase):
+    # The in-process server answers from its own threads and connections, which
+    # only see committed writes. One client: the sqlite test database locks
+    # whole tables under concurrent writers.
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix('page=5, preview,update=0.5,'), {'page': 5.0, 'preview': 1.0, 'update': 0.5})
+        for value in ('pages=1', 'page=x', 'page=0', ''):
+            with self.subTest(value=value), self.assertRaises(CommandError):
+                parse_mix(value)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual([percentile(values, p) for p in (0, 50, 95, 99, 100)], [1, 50, 95, 99, 100])
+        self.assertEqual(percentile([7], 99), 7)
+
+    def test_run_load_test_and_compare(self):
+        fleet = generate_fleet(20, categories=2, keys=3, seed=1, prefix='load')
+        report = run_load_test(fleet, {'page': 1, 'preview': 1, 'update': 1}, batch=5, operations='mixed',
+                               concurrency=1, duration=0.5, warmup=0)
+        self.assertEqual(report['totals']['errors'], 0)
+        self.assertGreater(report['totals']['requests'], 0)
+        for result in report['results'].values():
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+            self.assertLessEqual(result['p95_ms'], result['p99_ms'])
+        self.assertEqual(MemoryConfigStore().get_many([name for name, _ in fleet]), {})
+
+        baseline = {'results': {'page': {'p95_ms': 10.0, 'throughput_rps': 100.0, 'error_rate': 0.0}}}
+        report = {'results': {'page': {'p95_ms': 11.0, 'throughput_rps': 70.0, 'error_rate': 0.1},
+                              'update': {'p95_ms': 1.0, 'throughput_rps': 1.0, 'error_rate': 0.0}}}
+        self.assertEqual(
+            [(metric, regressed) for _, metric, *_, regressed in compare_load_reports(report, baseline)],
+            [('p95_ms', False), ('throughput_rps', True), ('error_rate', True)]
+        )
+
+
+class InstrumentationTests(ReplicaReadsMixin, TestCase):
+    def test_server_timing_log_and_percentiles(self):
+        get_config_store().upsert_many({'r1': {'A': 'a 1;'}})
+        self.assertFalse(self.client.get('/api/configs/', {'draw': 1}).has_header('Server-Timing'))
+
+        aggregate.reset()
+        self.addCleanup(aggregate.reset)
+        with override_settings(CONFIG_INSTRUMENTATION={'ENABLED': True}), \
+                self.assertLogs('configs.instrumentation', 'INFO') as logs:
+            response = self.client.get('/api/configs/', {'draw': 1})
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'\bdb;dur=[0-9.]+, serialize;dur=[0-9.]+, total;dur=[0-9.]+;desc="queries=[1-9]')
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line['endpoint'], line['status'], line['bytes']),
+                         ('api_get_configs', 200, len(response.content)))
+        self.assertEqual(set(aggregate.snapshot()['api_get_configs']), {'etag', 'db', 'serialize', 'total'})
+
+
+class ListingResponseTests(ReplicaReadsMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        get_config_store().upsert_many({f'r{i}': {'A': f'a {i};', 'B': 'b;'} for i in range(10)})
+
+    def test_compact_listing_and_etag_revalidation(self):
+        response = self.client.get('/api/configs/', {'compact': 1})
+        self.assertEqual(response.json()['data'][0], {'name': 'r0', 'config': {'A': 'a 0;', 'B': 'b;'}})
+        self.assertEqual(self.client.get('/api/configs/')['ETag'], response['ETag'].replace('-compact', ''))
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/configs/', {'compact': 1}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        get_config_store().upsert_many({'r0': {'A': 'a 2;'}})
+        self.assertEqual(self.client.get('/api/configs/', {'compact': 1}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_compression_weakens_etag(self):
+        plain = self.client.get('/api/configs/')
+        response = self.client.get('/api/configs/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+        response = self.client.get('/api/configs/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        fake_brotli = mock.Mock(compress=zlib.compress)
+        with mock.patch('configs.middleware.brotli', fake_brotli):
+            response = self.client.get('/api/configs/', HTTP_ACCEPT_ENCODING='gzip, br')
+            self.assertEqual(response['Content-Encoding'], 'br')
+            self.assertEqual(zlib.decompress(response.content), plain.content)
+            self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+            self.assertIn('Accept-Encoding', response['Vary'])
+
+            # Small bodies are not worth compressing
+            response = self.client.get('/api/configs/', {'draw': 1, 'length': 0}, HTTP_ACCEPT_ENCODING='br')
+            self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class TransferTests(ReplicaReadsMixin, TestCase):
+    configs = {'r1': {'A': 'a 1;'}, 'r2': {'B': 'b "quoted", 2;'}}
+
+    def test_export_view_round_trips_through_import(self):
+        get_config_store().upsert_many(self.configs)
+        for export_format, reader in (('ndjson', read_ndjson), ('csv', read_csv)):
+            response = self.client.get('/api/export/', {'format': export_format})
+            self.assertEqual(response['Content-Type'], EXPORT_FORMATS[export_format])
+            lines = b''.join(response.streaming_content).decode().splitlines(keepends=True)
+
+            store = MemoryConfigStore()
+            stats = import_records(reader(lines), store, batch_size=1)
+            self.assertEqual(stats, {'imported': 2, 'failed': 0, 'errors': []})
+            self.assertEqual(store.get_many(['r1', 'r2']), self.configs)
+
+        self.assertEqual(self.client.get('/api/export/', {'format': 'xml'}).status_code, 400)
+
+    def test_import_reports_invalid_lines(self):
+        lines = [
+            '{"name": "r1", "config": {"A": "a 1;"}}\n',
+            '\n',
+            'not json\n',
+            '{"name": "r2", "config": {"A": 1}}\n',
+            '{"name": "r1", "config": {"A": "a 2;"}}\n',
+        ]
+        store = MemoryConfigStore()
+        stats = import_records(read_ndjson(lines), store)
+        self.assertEqual((stats['imported'], stats['failed']), (1, 2))
+        self.assertEqual([(error['line'], error['name']) for error in stats['errors']], [(3, None), (4, 'r2')])
+        self.assertEqual(store.get_many(['r1']), {'r1': {'A': 'a 2;'}})
+
+
+class ListingPageTests(ReplicaReadsMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        get_config_store().upsert_many({'r1': {'A': 'a 1;'}, 'r2': {'A': 'b 2;'}, 'r3': {'B': 'b 3;'}})
+
+    def page(self, **params):
+        response = self.client.get('/api/configs/', {'draw': 3, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_search_and_order_in_the_database(self):
+        page = self.page(start=1, length=1)
+        self.assertEqual((page['draw'], page['recordsTotal'], page['recordsFiltered']), (3, 3, 3))
+        self.assertEqual([row['name'] for row in page['data']], ['r2'])
+
+        page = self.page(start=0, length=2, **{'order[0][column]': 0, 'order[0][dir]': 'desc'})
+        self.assertEqual([row['name'] for row in page['data']], ['r3', 'r2'])
+
+        page = self.page(start=0, length=-1, **{'search[value]': 'b '})
+        self.assertEqual((page['recordsTotal'], page['recordsFiltered']), (3, 2))
+        self.assertEqual([row['name'] for row in page['data']], ['r2', 'r3'])
+
+    def test_rejects_invalid_paging(self):
+        response = self.client.get('/api/configs/', {'draw': 1, 'start': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConfigDocumentTests(TestCase):
+    iterations = 5000
+
+    def test_matches_parse_and_stringify_on_random_inputs(self):
+        rng = random.Random(0)
+        for iteration in range(self.iterations):
+            source = random_config_string(rng)
+            plan = compile_operations([random_operation(rng, 'c') for _ in range(rng.randint(0, 4))])
+            operations = plan[0].operations if plan else ()
+            with self.subTest(iteration=iteration, source=source, operations=[op._asdict() for op in operations]):
+                document = ConfigDocument(source)
+                obj = parse_config_string(source)
+                self.assertEqual(list(document), list(obj))
+                self.assertEqual(dict(document.items()), obj)
+                self.assertEqual(document.serialize(), stringify_config_object(obj))
+                self.assertEqual(
+                    apply_operations_to_config(document, operations).serialize(),
+                    stringify_config_object(apply_operations_to_config(obj, operations))
+                )
+
+
+class RecordRevisionsTests(TestCase):
+    def record(self, version, configs, previous):
+        record_revisions(store=None, names=list(configs), version=version, configs=configs, previous=previous)
+
+    def test_delta_follows_recorded_write(self):
+        self.record(1, {'r': {'A': 'a 1;'}}, {'r': None})
+        self.record(2, {'r': {'A': 'a 2;'}}, {'r': {'A': 'a 1;'}})
+        revisions = ConfigRevision.objects.filter(name='r').order_by('revision')
+        self.assertEqual([rev.created for rev in revisions], [True, False])
+        self.assertIsNotNone(revisions[1].delta)
+        self.assertEqual(configs_at(['r'], seq=2), {'r': {'A': 'a 2;'}})
+
+    def test_concurrent_writer_takes_the_revision_number(self):
+        self.record(1, {'r': {'A': 'a 1;'}}, {'r': None})
+        tips = history._tips
+        raced = []
+
+        def racing_tips(names):
+            # A later write of the record is recorded between reading the
+            # latest revision and inserting the next one
+            result = tips(names)
+            if not raced:
+                raced.append(True)
+                self.record(3, {'r': {'A': 'a 3;'}}, {'r': {'A': 'a 2;'}})
+            return result
+
+        with mock.patch.object(history, '_tips', racing_tips), mock.patch.object(history.logger, 'exception') as log:
+            self.record(2, {'r': {'A': 'a 2;'}}, {'r': {'A': 'a 1;'}})
+
+        log.assert_not_called()
+        self.assertEqual([(rev['revision'], rev['seq']) for rev in list_revisions('r')], [(1, 1), (3, 2), (2, 3)])
+        for seq, value in [(1, '1'), (2, '2'), (3, '3')]:
+            self.assertEqual(configs_at(['r'], seq=seq), {'r': {'A': f'a {value};'}})
+
+        # Deltas resume once history ends with the config a write replaced
+        self.record(4, {'r': {'A': 'a 4;'}}, {'r': {'A': 'a 3;'}})
+        self.assertIsNotNone(ConfigRevision.objects.get(name='r', seq=4).delta)
+        self.assertEqual(configs_at(['r'], seq=4), {'r': {'A': 'a 4;'}})
+
+    def test_missing_revision_makes_next_write_a_snapshot(self):
+        self.record(1, {'r': {'A': 'a 1;'}}, {'r': None})
+        # The write of version 2 was never recorded
+        self.record(3, {'r': {'A': 'a 3;'}}, {'r': {'A': 'a 2;'}})
+        self.assertEqual(ConfigRevision.objects.get(name='r', seq=3).snapshot, {'A': 'a 3;'})
+        self.assertEqual(configs_at(['r'], seq=3), {'r': {'A': 'a 3;'}})
+
+
+    @override_settings(CONFIG_KEY_INDEX={'ENABLED': True})
+    def test_database_error_leaves_the_write_and_other_receivers(self):
+        store = get_config_store()
+        with mock.patch.object(history, '_tips', side_effect=DatabaseError('unsupported query')), \
+                mock.patch.object(history.logger, 'exception') as log:
+            store.upsert_many({'r': {'A': 'a 1;'}})
+        log.assert_called_once()
+        self.assertEqual(store.get_many(['r']), {'r': {'A': 'a 1;'}})
+        self.assertEqual(list(ConfigKey.objects.filter(name='r').values_list('key', flat=True)), ['a'])
+        self.assertFalse(ConfigRevision.objects.filter(name='r').exists())
+
+class UpdateJobTests(TestCase):
+    operations = [{'category': 'A', 'op': 'append', 'key': 'a', 'value': 'x', 'caseSensitive': True}]
+
+    def setUp(self):
+        self.store = get_config_store()
+        self.names = [f'r{index}' for index in range(5)]
+        self.store.upsert_many({name: {'A': 'a 1;'} for name in self.names})
+
+    def test_submit_validates_chunk_size(self):
+        body = {'names': self.names, 'operations': self.operations}
+        for chunk_size in ['x', [2], 0, -1]:
+            response = self.client.post('/api/jobs/', json.dumps({**body, 'chunk_size': chunk_size}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400, chunk_size)
+        self.assertFalse(UpdateJobChunk.objects.exists())
+
+        with override_settings(CONFIG_JOBS={'MAX_CHUNK_SIZE': 2}):
+            response = self.client.post('/api/jobs/', json.dumps({**body, 'chunk_size': '100'}),
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual([len(chunk.names) for chunk in UpdateJobChunk.objects.order_by('index')], [2, 2, 1])
+
+    def test_failed_chunk_reports_its_error(self):
+        job = submit_update_job(self.names, self.operations)
+        chunk = claim_chunk()
+        with mock.patch.object(jobs, 'update_records', side_effect=RuntimeError('boom')), \
+                mock.patch.object(jobs.logger, 'exception'):
+            self.assertFalse(process_chunk(chunk))
+
+        chunk.refresh_from_db()
+        self.assertEqual((chunk.status, chunk.error), (UpdateJobChunk.STATUS_FAILED, 'RuntimeError: boom'))
+        progress = job_progress(job)
+        self.assertEqual((progress['status'], progress['done'], progress['failed']), ('done', 0, 5))
+        self.assertIsNone(claim_chunk())
+
+    def test_reclaimed_chunk_resumes_after_saved_results(self):
+        job = submit_update_job(self.names, self.operations)
+        first = claim_chunk()
+        self.assertIsNone(claim_chunk(stale_after=60))
+
+        # The first worker saves the results of two names, then dies after
+        # writing the next two but before saving their results
+        update_records = jobs.update_records
+
+        def dying(names, plan):
+            results = update_records(names, plan)
+            if names[0] != self.names[0]:
+                raise SystemExit
+            return results
+
+        with mock.patch.object(jobs, 'update_records', dying), self.assertRaises(SystemExit):
+            process_chunk(first, progress_every=2)
+        UpdateJobChunk.objects.filter(pk=first.pk).update(claimed_at=timezone.now() - timedelta(hours=1))
+
+        second = claim_chunk(stale_after=60)
+        self.assertEqual(second.pk, first.pk)
+        self.assertNotEqual(second.claim_token, first.claim_token)
+        self.assertEqual(len(second.results), 4)
+        self.assertEqual((job_progress(job)['done'], job_progress(job)['failed']), (2, 0))
+        self.assertFalse(jobs._save_chunk(first, results=[]))
+
+        self.assertTrue(process_chunk(second, progress_every=2))
+        self.assertEqual(self.store.get_many(self.names), {name: {'A': 'a 1 x;'} for name in self.names})
+        progress = job_progress(job)
+        self.assertEqual((progress['status'], progress['done'], progress['failed']), ('done', 3, 2))
+        self.assertEqual(
+            [result['name'] for result in progress['results'] if result.get('error') == jobs.INTERRUPTED], ['r2', 'r3']
+        )
+
+
+@override_settings(CONFIG_CACHE={'ENABLED': True, 'KEY_PREFIX': 'configs-test'})
+class CachedRecordsTests(TestCase):
+    def test_write_in_another_process_expires_cached_records(self):
+        store = get_config_store()
+        store.upsert_many({'r': {'A': 'a 1;'}})
+        self.assertEqual(cached_records(store, ['r']), {'r': {'A': 'a 1;'}})
+
+        # Another process writes, invalidating only its own locmem cache;
+        # this one sees the new version once VERSION_TIMEOUT expires
+        with override_settings(CONFIG_CACHE={'ENABLED': False}):
+            store.upsert_many({'r': {'A': 'a 2;'}})
+        self.assertEqual(cached_records(store, ['r']), {'r': {'A': 'a 1;'}})
+        caches['default'].delete('configs-test:version')
+        self.assertEqual(cached_records(store, ['r']), {'r': {'A': 'a 2;'}})
+
+
+@override_settings(CONFIG_PREVIEW_CACHE={'KEY_PREFIX': 'configs-preview-test'})
+class PreviewCacheTests(ReplicaReadsMixin, TestCase):
+    def post(self, path, body):
+        return self.client.post(path, json.dumps(body), content_type='application/json')
+
+    def test_submit_reuses_preview_from_shared_cache(self):
+        get_config_store().upsert_many({'r': {'A': 'a 1;'}})
+        operations = [{'category': 'A', 'op': 'edit', 'key': 'a', 'value': '2', 'caseSensitive': True}]
+        token = self.post('/api/preview/', {'names': ['r'], 'operations': operations}).json()['preview_token']
+        self.assertIsNotNone(caches['previews'].get(f'configs-preview-test:{token}'))
+
+        # Another process builds its own PreviewCache around the same cache
+        get_preview_cache.cache_clear()
+        response = self.post('/api/update/', {'preview_token': token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['preview_reused'], 1)
+        self.assertEqual(get_config_store().get_many(['r']), {'r': {'A': 'a 2;'}})
+
+        self.assertEqual(self.post('/api/update/', {'preview_token': token}).status_code, 409)
+
+    def test_previews_submitted_as_jobs_are_not_kept(self):
+        get_config_store().upsert_many({'r1': {'A': 'a 1;'}, 'r2': {'A': 'a 1;'}})
+        with override_settings(CONFIG_JOBS={'ASYNC_THRESHOLD': 1}):
+            response = self.post('/api/preview/', {'names': ['r1', 'r2'], 'operations': []})
+        self.assertIsNone(response.json()['preview_token'])
+
+
+class StreamedPreviewTests(ReplicaReadsMixin, TestCase):
+    operations = [{'category': 'A', 'op': 'edit', 'key': 'a', 'value': '2', 'caseSensitive': True}]
+
+    def stream(self, body):
+        response = self.client.post('/api/preview/stream/', json.dumps(body), content_type='application/json')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_stream_lines(self):
+        get_config_store().upsert_many({'r1': {'A': 'a 1;'}, 'r2': {'A': 'a 1;'}})
+        with mock.patch('configs.views.stream_chunks', partial(stream_chunks, first=1)):
+            lines = self.stream({'names': ['r1', 'r2', 'missing'], 'operations': self.operations, 'format': 'json'})
+        self.assertEqual(lines[0], {'count': 3})
+        self.assertEqual([[row['name'] for row in line['rows']] for line in lines[1:-1]], [['r1'], ['r2', 'missing']])
+        done = lines[-1]
+        self.assertEqual((done['done'], done['count'], done['distinct_inputs']), (True, 3, 2))
+        entry = get_preview_cache().get(done['preview_token'])
+        self.assertEqual(entry.new_configs, {'r1': {'A': 'a 2;'}, 'r2': {'A': 'a 2;'}, 'missing': {'A': 'a 2;'}})
+
+        # Selectors do not know the count upfront
+        lines = self.stream({'selector': {'glob': 'r*'}, 'operations': self.operations})
+        self.assertEqual((lines[0], lines[-1]['count']), ({'count': None}, 2))
+
+    def test_failure_ends_the_stream_with_an_error_line(self):
+        with mock.patch('configs.previews.compute_preview', side_effect=RuntimeError), \
+                self.assertLogs('configs.previews', 'ERROR'):
+            lines = self.stream({'names': ['r1'], 'operations': self.operations})
+        self.assertEqual(lines, [{'count': 1}, {'error': 'Preview failed, please try again'}])
+
+
+class StreamingASGIHandlerTests(SimpleTestCase):
+    def test_parts_are_produced_off_the_event_loop(self):
+        threads = []
+
+        def parts():
+            try:
+                for part in (b'one\n', b'two\n'):
+                    threads.append(threading.current_thread().name)
+                    time.sleep(0.05)
+                    yield part
+            finally:
+                threads.append(threading.current_thread().name)
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        async def serve():
+            ticks = 0
+
+            async def tick():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.005)
+                    ticks += 1
+
+            ticker = asyncio.ensure_future(tick())
+            await StreamingASGIHandler().send_response(StreamingHttpResponse(parts()), send)
+            ticker.cancel()
+            return ticks
+
+        # The loop keeps running other tasks while the generator sleeps
+        self.assertGreater(asyncio.run(serve()), 5)
+        self.assertEqual([message['type'] for message in messages],
+                         ['http.response.start'] + ['http.response.body'] * 3)
+        self.assertEqual([message.get('body') for message in messages[1:]], [b'one\n', b'two\n', None])
+        # Every part, and the close, run in the stream's own thread
+        self.assertEqual(len(set(threads)), 1)
+        self.assertEqual(len(threads), 3)
+        self.assertTrue(threads[0].startswith('stream'))
+
+
+class SelectorTests(TestCase):
+    def setUp(self):
+        self.store = get_config_store()
+        with override_settings(CONFIG_KEY_INDEX={'ENABLED': True}):
+            self.store.upsert_many({
+                'r1': {'A': 'Ké0 1;'}, 'r2': {'A': 'x 1;'}, 'r3': {'B': 'ké0 1;'}, 'r4': {'A': 'ké0 2;'}
+            })
+
+    def select(self, selector):
+        return [name for name, _ in self.store.select(compile_selector(selector))]
+
+    def test_non_ascii_keys(self):
+        selectors = [
+            ({'has_key': {'category': 'A', 'key': 'ké0', 'caseSensitive': False}}, ['r1', 'r4']),
+            ({'has_key': {'category': 'A', 'key': 'Ké0'}}, ['r1']),
+            ({'value_matches': {'category': 'A', 'key': 'KÉ0', 'pattern': '^2', 'caseSensitive': False}}, ['r4']),
+        ]
+        for enabled in (True, False):
+            with override_settings(CONFIG_KEY_INDEX={'ENABLED': enabled}):
+                for selector, names in selectors:
+                    with self.subTest(selector=selector, key_index=enabled):
+                        self.assertEqual(self.select(selector), names)
+
+    def test_preview_rejects_invalid_selector_and_paging(self):
+        body = {'selector': {'glob': 'r*', 'unknown': 1}, 'operations': []}
+        response = self.client.post('/api/preview/', json.dumps(body), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Invalid selector')
+
+        body = {'selector': {'glob': 'r*'}, 'operations': [], 'start': 'x'}
+        response = self.client.post('/api/preview/', json.dumps(body), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Invalid paging parameters')
+
+    def test_update_rejects_invalid_selector(self):
+        for selector in [{'glob': 'r*', 'unknown': 1}, {'has_key': {'key': 'x'}}]:
+            response = self.client.post(
+                '/api/update/', json.dumps({'selector': selector, 'operations': []}), content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['error'], 'Invalid selector')
+
+        with mock.patch('configs.views.compile_selector', side_effect=TypeError('unhashable')):
+            response = self.client.post(
+                '/api/update/', json.dumps({'selector': {'glob': 'r*'}, 'operations': []}),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CONFIG_KEY_INDEX={'ENABLED': True})
+class KeyIndexTests(TestCase):
+    def rows(self, name):
+        return sorted(ConfigKey.objects.filter(name=name).values_list('id', 'category', 'key', 'lower_key', 'value'))
+
+    def test_writes_only_change_the_rows_of_changed_keys(self):
+        store = get_config_store()
+        store.upsert_many({'r': {'A': 'a 1;b 2;', 'B': 'Ké 1;', 'C': 'c 1;'}})
+        before = {row[1:3]: row for row in self.rows('r')}
+        store.write_many({'r': {'A': 'a 1;b 3;d 4;', 'B': 'Ké 1;'}}, {}, expected={'r': store.get_many(['r'])['r']})
+
+        after = {row[1:3]: row for row in self.rows('r')}
+        expected = index_rows('r', {'A': 'a 1;b 3;d 4;', 'B': 'Ké 1;'})
+        self.assertEqual(
+            sorted(row[1:] for row in after.values()),
+            sorted((row.category, row.key, row.lower_key, row.value) for row in expected)
+        )
+        # Unchanged keys keep their rows
+        self.assertEqual(after['A', 'a'], before['A', 'a'])
+        self.assertEqual(after['B', 'Ké'], before['B', 'Ké'])
+        self.assertNotEqual(after['A', 'b'][0], before['A', 'b'][0])
+
+    def test_search_needs_a_key(self):
+        with self.assertRaises(ValueError):
+            search_keys(value='1')
+        response = self.client.get('/api/keys/search/', {'value': '1'})
+        self.assertEqual(response.status_code, 400)
+
+        with override_settings(CONFIG_KEY_INDEX={'ENABLED': False}):
+            response = self.client.get('/api/keys/search/', {'key': 'a'})
+        self.assertEqual(response.status_code, 404)
+
+
+def per_record_update(config, operations):
+    """The update view's original per-record path: sanitize, group by category, parse, apply, stringify"""
+    new_config = config.copy()
+    category_operations = {}
+    for operation in map(sanitize_operation, operations):
+        category_operations.setdefault(operation['category'], []).append(operation)
+    for category, ops in category_operations.items():
+        if not new_config.get(category) and any(op['op'] == 'add' for op in ops):
+            add_op = next(op for op in ops if op['op'] == 'add')
+            new_config[category] = stringify_config_object({add_op['key']: add_op['value']})
+        else:
+            new_config[category] = stringify_config_object(
+                apply_operations_to_config(parse_config_string(new_config.get(category, '')), ops)
+            )
+    return new_config
+
+
+def random_update(rng, categories=('A', 'b', 'c"\\x', 'ü\n')):
+    """A random (config, operations) pair over a few categories, some of them empty or missing"""
+    config = {category: random_config_string(rng) for category in rng.sample(categories, rng.randint(0, 3))}
+    if config and rng.random() < 0.2:
+        config[next(iter(config))] = ''
+    operations = [random_operation(rng, rng.choice(categories)) for _ in range(rng.randint(1, 5))]
+    for operation in operations:
+        if rng.random() < 0.25:
+            operation['op'] = 'add'
+        elif rng.random() < 0.2:
+            operation['value'] = rng.choice(['', ' ', 'a\tb', 'é ß', '$x', 'q"'])
+    return config, operations
+
+
+class OperationPlanTests(TestCase):
+    iterations = 3000
+
+    def test_plan_matches_per_record_path(self):
+        rng = random.Random(1)
+        memo = {}
+        for iteration in range(self.iterations):
+            config, operations = random_update(rng)
+            plan = compile_operations(operations)
+            with self.subTest(iteration=iteration, config=config, operations=operations):
+                expected = per_record_update(config, operations)
+                self.assertEqual(list(apply_plan_to_config(config, plan, create_categories=True).items()),
+                                 list(expected.items()))
+                # The memo is shared by every record of a request using the same plan
+                self.assertEqual(apply_plan_to_config(config, plan, create_categories=True, memo=memo), expected)
+            memo.clear()
+
+
+def pattern_operation(op, key, value='', case_sensitive=True, match='glob', find=''):
+    return {'category': 'A', 'op': op, 'key': key, 'value': value, 'caseSensitive': case_sensitive,
+            'match': match, 'find': find}
+
+
+class PatternOperationTests(TestCase):
+    config = {'A': 'port_a 80;Port_b 81;host port;timeout 8080;'}
+
+    def apply(self, *operations):
+        return apply_plan_to_config(self.config, compile_operations(operations))['A']
+
+    def test_edit_and_delete_matching(self):
+        self.assertEqual(self.apply(pattern_operation('edit_matching', 'port_*', '90')),
+                         'port_a 90;Port_b 81;host port;timeout 8080;')
+        self.assertEqual(self.apply(pattern_operation('edit_matching', 'port_*', '90', case_sensitive=False)),
+                         'port_a 90;Port_b 90;host port;timeout 8080;')
+        self.assertEqual(self.apply(pattern_operation('delete_matching', r'port_[ab]|host', match='regex')),
+                         'Port_b 81;timeout 8080;')
+        # Regex patterns match the whole key
+        self.assertEqual(self.apply(pattern_operation('delete_matching', 'p.rt', match='regex', case_sensitive=False)),
+                         self.config['A'])
+        # A deleted key can be added back by a later operation of the same request
+        self.assertEqual(self.apply(pattern_operation('delete_matching', '*', case_sensitive=False),
+                                    {'category': 'A', 'op': 'edit', 'key': 'PORT_A', 'value': '1',
+                                     'caseSensitive': False}),
+                         'PORT_A 1;')
+
+    def test_substitute(self):
+        self.assertEqual(self.apply(pattern_operation('substitute', '*', r'\1', find='80')),
+                         'port_a \\1;Port_b 81;host port;timeout \\1\\1;')
+        self.assertEqual(self.apply(pattern_operation('substitute', 'HOST', 'proxy', False, find='PORT')),
+                         'port_a 80;Port_b 81;host proxy;timeout 8080;')
+
+    def test_invalid_patterns(self):
+        for operation in (pattern_operation('edit_matching', '(', match='regex'),
+                          pattern_operation('edit_matching', 'a*', match='sql'),
+                          pattern_operation('substitute', '*', find=''),
+                          pattern_operation('substitute', '*', find='[')):
+            with self.subTest(operation=operation), self.assertRaises(ValueError):
+                compile_operations([operation])
+
+        response = self.client.post('/api/preview/', json.dumps({
+            'names': ['r1'], 'operations': [pattern_operation('edit_matching', '(', match='regex')],
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Invalid operations')
+
+    def test_literal_prefix_does_not_skip_matching_keys(self):
+        self.assertEqual(operations._regex_literal_prefix(r'port_\d+'), 'port_')
+        self.assertEqual(operations._regex_literal_prefix('ports?'), 'port')
+        self.assertEqual(operations._regex_literal_prefix('a|b'), '')
+        self.assertEqual(self.apply(pattern_operation('edit_matching', 'ports?_a', '1', match='regex')),
+                         'port_a 1;Port_b 81;host port;timeout 8080;')
+        self.assertEqual(self.apply(pattern_operation('edit_matching', 'port_.', '1', match='regex',
+                                                      case_sensitive=False)),
+                         'port_a 1;Port_b 1;host port;timeout 8080;')
+
+
+class OperationMemoTests(TestCase):
+    def test_identical_category_strings_are_transformed_once(self):
+        plan = compile_operations([{'category': 'A', 'op': 'append', 'key': 'a', 'value': 'x', 'caseSensitive': True}])
+        configs = [{'A': 'a 1;'}, {'A': 'a 1;', 'B': 'b 1;'}, {'A': 'a 2;'}, {'B': 'b 1;'}]
+        memo = {}
+        with mock.patch.object(operations, '_apply_group', wraps=operations._apply_group) as apply_group:
+            memoized = [apply_plan_to_config(config, plan, memo=memo) for config in configs]
+        self.assertEqual(apply_group.call_count, 3)
+        self.assertEqual(memoized, [apply_plan_to_config(config, plan) for config in configs])
+        self.assertEqual(sorted(memo), [(0, ''), (0, 'a 1;'), (0, 'a 2;')])
+
+
+class DiffTests(TestCase):
+    old = {'A': 'a 1;b 2;c 3;', 'B': 'x 1;', 'C': 'y 1;'}
+    new = {'A': 'a 1;b 2 more;c 4;d 5;', 'B': 'x 1;', 'D': 'z 1;'}
+
+    def test_structured_diff(self):
+        diff = diff_configs(self.old, self.new)
+        self.assertEqual([(entry.category, entry.status) for entry in diff],
+                         [('A', 'changed'), ('B', 'unchanged'), ('D', 'added'), ('C', 'deleted')])
+        self.assertEqual([(key.key, key.status) for key in diff[0].keys],
+                         [('a', 'unchanged'), ('b', 'appended'), ('c', 'edited'), ('d', 'added')])
+        self.assertEqual(serialize_diff(diff), [
+            {'category': 'A', 'status': 'changed', 'keys': [
+                {'key': 'b', 'status': 'appended', 'old': '2', 'new': '2 more'},
+                {'key': 'c', 'status': 'edited', 'old': '3', 'new': '4'},
+                {'key': 'd', 'status': 'added', 'old': None, 'new': '5'},
+            ]},
+            {'category': 'D', 'status': 'added', 'old': '', 'new': 'z 1;'},
+            {'category': 'C', 'status': 'deleted', 'old': 'y 1;', 'new': ''},
+        ])
+
+    def test_html_matches_the_formatted_round_trip(self):
+        memo = {}
+        html = render_diff_html(diff_configs(self.old, self.new, memo=memo))
+        self.assertEqual(html, color_diff(format_config_for_display(self.old), format_config_for_display(self.new)))
+        self.assertEqual(list(memo), [(self.old['A'], self.new['A'])])
+
+
+class ParallelApplyTests(TestCase):
+    def test_largest_request_update_uses_the_pool(self):
+        names = [f'r{index}' for index in range(get_job_settings()['ASYNC_THRESHOLD'])]
+        get_config_store().upsert_many({name: {'A': f'a {name};'} for name in names})
+        plan = compile_operations([{'category': 'A', 'op': 'append', 'key': 'a', 'value': 'x', 'caseSensitive': True}])
+        self.addCleanup(parallel.shutdown_process_pool)
+        with mock.patch.object(parallel, 'run_chunks', wraps=parallel.run_chunks) as run_chunks:
+            results, _ = update_records(names, plan)
+        run_chunks.assert_called_once()
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(get_config_store().get_many(names[-1:]), {names[-1]: {'A': f'a {names[-1]} x;'}})
+
+
+class UpdateRecordsTests(TestCase):
+    operations = [{'category': 'A', 'op': 'append', 'key': 'a', 'value': 'x', 'caseSensitive': True}]
+
+    def setUp(self):
+        self.store = get_config_store()
+        self.store.upsert_many({'r1': {'A': 'a 1;'}, 'r2': {'A': 'a 2;'}})
+        self.plan = compile_operations(self.operations)
+
+    def test_record_changed_between_read_and_write_is_recomputed(self):
+        write_many = self.store.write_many
+        calls = []
+
+        def racing_write_many(updates, creates, expected=None):
+            if not calls:
+                # Another writer changes r1 after it was read
+                write_many({'r1': {'A': 'a 9;'}}, {})
+            calls.append(sorted(updates))
+            return write_many(updates, creates, expected=expected)
+
+        with mock.patch.object(self.store, 'write_many', racing_write_many):
+            results, _ = update_records(['r1', 'r2'], self.plan)
+
+        self.assertEqual(calls, [['r1', 'r2'], ['r1']])
+        self.assertEqual([result['success'] for result in results], [True, True])
+        self.assertEqual(results[0]['old_config'], {'A': 'a 9;'})
+        self.assertEqual(self.store.get_many(['r1', 'r2']), {'r1': {'A': 'a 9 x;'}, 'r2': {'A': 'a 2 x;'}})
+
+    def test_gives_up_after_max_write_attempts(self):
+        with mock.patch.object(self.store, 'write_many', return_value={'r1': WRITE_CONFLICT}) as write_many:
+            results, _ = update_records(['r1', 'r2'], self.plan)
+
+        self.assertEqual(write_many.call_count, MAX_WRITE_ATTEMPTS)
+        self.assertEqual(results[0]['success'], False)
+        self.assertEqual(results[0]['error'], WRITE_CONFLICT)
+        self.assertEqual(results[1]['success'], True)
+
+
+# A minimal evaluator of the aggregation expressions configs.structured builds,
+# enough to run update pipelines without a MongoDB server
+MISSING = object()
+
+
+def _field(value, path):
+    for part in path:
+        if isinstance(value, list):
+            value = [item[part] for item in value if isinstance(item, dict) and part in item]
+        elif isinstance(value, dict):
+            value = value.get(part, MISSING)
+        else:
+            return MISSING
+        if value is MISSING:
+            return MISSING
+    return value
+
+
+def evaluate(expression, doc, variables):
+    if isinstance(expression, str):
+        if expression.startswith('$$'):
+            name, *path = expression[2:].split('.')
+            return _field(variables[name], path)
+        if expression.startswith('$'):
+            return _field(doc, expression[1:].split('.'))
+        return expression
+    if isinstance(expression, list):
+        return [evaluate(item, doc, variables) for item in expression]
+    if isinstance(expression, dict):
+        if len(expression) == 1 and next(iter(expression)).startswith('$'):
+            (operator, argument), = expression.items()
+            return EXPRESSION_OPERATORS[operator](argument, doc, variables)
+        return {key: evaluate(value, doc, variables) for key, value in expression.items()}
+    return expression
+
+
+def _reduce(argument, doc, variables):
+    value = evaluate(argument['initialValue'], doc, variables)
+    for item in evaluate(argument['input'], doc, variables):
+        value = evaluate(argument['in'], doc, {**variables, 'value': value, 'this': item})
+    return value
+
+
+def _concat(argument, doc, variables):
+    parts = evaluate(argument, doc, variables)
+    return None if any(part is None or part is MISSING for part in parts) else ''.join(parts)
+
+
+def _equal(argument, doc, variables):
+    left, right = evaluate(argument, doc, variables)
+    return left is right if MISSING in (left, right) else (left == right and type(left) is type(right))
+
+
+def _if_null(argument, doc, variables):
+    value = evaluate(argument[0], doc, variables)
+    return evaluate(argument[1], doc, variables) if value is None or value is MISSING else value
+
+
+def _replace_all(argument, doc, variables):
+    value = evaluate(argument['input'], doc, variables)
+    if value is None or value is MISSING:
+        return None
+    return value.replace(evaluate(argument['find'], doc, variables), evaluate(argument['replacement'], doc, variables))
+
+
+def _each(argument, doc, variables):
+    name = argument.get('as', 'this')
+    return [(item, {**variables, name: item}) for item in evaluate(argument['input'], doc, variables)]
+
+
+EXPRESSION_OPERATORS = {
+    '$map': lambda a, d, v: [evaluate(a['in'], d, scope) for _, scope in _each(a, d, v)],
+    '$filter': lambda a, d, v: [item for item, scope in _each(a, d, v) if evaluate(a['cond'], d, scope) is True],
+    '$reduce': _reduce,
+    '$let': lambda a, d, v: evaluate(a['in'], d, {**v, **{k: evaluate(x, d, v) for k, x in a['vars'].items()}}),
+    '$cond': lambda a, d, v: evaluate(a[1] if evaluate(a[0], d, v) is True else a[2], d, v),
+    '$concat': _concat,
+    '$concatArrays': lambda a, d, v: [item for items in evaluate(a, d, v) for item in items],
+    '$in': lambda a, d, v: evaluate(a[0], d, v) in evaluate(a[1], d, v),
+    '$eq': _equal,
+    '$ne': lambda a, d, v: not _equal(a, d, v),
+    '$gt': lambda a, d, v: evaluate(a[0], d, v) > evaluate(a[1], d, v),
+    '$gte': lambda a, d, v: evaluate(a[0], d, v) >= evaluate(a[1], d, v),
+    '$indexOfArray': lambda a, d, v: next(
+        (index for index, item in enumerate(evaluate(a[0], d, v)) if item == evaluate(a[1], d, v)), -1
+    ),
+    '$range': lambda a, d, v: list(range(evaluate(a[0], d, v), evaluate(a[1], d, v))),
+    '$size': lambda a, d, v: len(evaluate(a, d, v)),
+    '$arrayElemAt': lambda a, d, v: evaluate(a[0], d, v)[evaluate(a[1], d, v)],
+    '$mergeObjects': lambda a, d, v: {key: value for item in evaluate(a, d, v) for key, value in item.items()},
+    '$trim': lambda a, d, v: evaluate(a['input'], d, v).strip(evaluate(a['chars'], d, v)),
+    '$replaceAll': _replace_all,
+    '$ifNull': _if_null,
+    '$literal': lambda a, d, v: a,
+}
+
+
+def run_pipeline(doc, pipeline):
+    doc = copy.deepcopy(doc)
+    for stage in pipeline:
+        (kind, spec), = stage.items()
+        if kind == '$unset':
+            for field in [spec] if isinstance(spec, str) else spec:
+                doc.pop(field, None)
+        else:
+            doc.update({field: evaluate(expression, doc, {'ROOT': doc}) for field, expression in spec.items()})
+    return doc
+
+
+class FakeCollection:
+    """The part of a pymongo collection MongoConfigStore.apply_plan() uses"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def _matches(self, doc, query):
+        for field, condition in query.items():
+            if field == '$expr':
+                if evaluate(condition, doc, {'ROOT': doc}) is not True:
+                    return False
+            elif field == 'pending_updates.t':
+                if not any(self._token_matches(entry, condition) for entry in doc.get('pending_updates', [])):
+                    return False
+            elif doc.get(field) not in condition['$in']:
+                return False
+        return True
+
+    @staticmethod
+    def _token_matches(entry, condition):
+        return entry['t'] < condition['$lt'] if isinstance(condition, dict) else entry['t'] == condition
+
+    def update_many(self, query, update):
+        for index, doc in enumerate(self.docs):
+            if not self._matches(doc, query):
+                continue
+            if isinstance(update, list):
+                self.docs[index] = run_pipeline(doc, update)
+            else:
+                condition = update['$pull']['pending_updates']['t']
+                doc['pending_updates'] = [
+                    entry for entry in doc.get('pending_updates', []) if not self._token_matches(entry, condition)
+                ]
+
+    def find(self, query, projection):
+        token = projection['pending_updates']['$elemMatch']['t']
+        return [
+            {'name': doc['name'], 'pending_updates': [entry for entry in doc['pending_updates'] if entry['t'] == token]}
+            for doc in self.docs if self._matches(doc, query)
+        ]
+
+
+class FakeMongoConfigStore(MongoConfigStore):
+    """MongoConfigStore updating FakeCollection documents; reads and writes other than apply_plan() go to memory"""
+
+    def __init__(self, configs):
+        super().__init__(host='mongodb://fake', db='fake')
+        self.fake_collection = FakeCollection([
+            {'name': name, 'config': encode_config(config), 'data': structure_config(config)}
+            for name, config in configs.items()
+        ])
+        self.written = {}
+
+    @property
+    def collection(self):
+        return self.fake_collection
+
+    def get_many(self, names):
+        configs = {doc['name']: json.loads(doc['config']) for doc in self.fake_collection.docs}
+        return {name: configs[name] for name in names if name in configs}
+
+    def _write_many(self, updates, creates, expected):
+        self.written.update(updates)
+        self.written.update(creates)
+        return {}
+
+    def _bump_version(self):
+        # Shared with the memory store, so the change feed gets distinct versions
+        return MemoryConfigStore()._bump_version()
+
+
+@override_settings(
+    CONFIG_STORE={'BACKEND': 'configs.store.MemoryConfigStore', 'OPTIONS': {}},
+    CONFIG_HISTORY={'ENABLED': False}, CONFIG_KEY_INDEX={'ENABLED': False},
+)
+class UpdatePipelineTests(TestCase):
+    iterations = 500
+
+    def test_pipeline_matches_apply_plan_to_config(self):
+        rng = random.Random(2)
+        checked = 0
+        for iteration in range(self.iterations):
+            config, operations = random_update(rng)
+            plan = compile_operations(operations)
+            if not supports_plan(plan):
+                continue
+            with self.subTest(iteration=iteration, config=config, operations=operations):
+                doc = {'name': 'r', 'config': encode_config(config), 'data': structure_config(config)}
+                self.assertIs(evaluate(in_sync_filter()['$expr'], doc, {'ROOT': doc}), True)
+                updated = run_pipeline(doc, update_pipeline(plan, create_categories=True))
+                expected = apply_plan_to_config(config, plan, create_categories=True)
+                self.assertEqual(updated['config'], encode_config(expected))
+                self.assertEqual(updated['data'], structure_config(expected))
+            checked += 1
+        self.assertGreater(checked, self.iterations // 4)
+
+    def test_update_records_matches_memory_store(self):
+        rng = random.Random(3)
+        configs = {f'r{index}': random_update(rng)[0] for index in range(50)}
+        operations = [
+            {'category': 'A', 'op': 'append', 'key': 'k0', 'value': 'x', 'caseSensitive': False},
+            {'category': 'b', 'op': 'delete', 'key': 'a1', 'value': '', 'caseSensitive': True},
+            {'category': 'ü\n', 'op': 'add', 'key': 'new', 'value': 'v', 'caseSensitive': True},
+        ]
+        plan = compile_operations(operations)
+        memory_store = get_config_store()
+        MemoryConfigStore._records.clear()
+        memory_store.upsert_many(configs)
+        mongo_store = FakeMongoConfigStore(configs)
+        # Written by djongo: stale structured data, left to the caller
+        mongo_store.fake_collection.docs[0]['config'] = encode_config({'A': 'k0 9;'})
+        memory_store.upsert_many({'r0': {'A': 'k0 9;'}})
+        names = [*configs, 'missing']
+
+        with mock.patch('configs.updates.get_config_store', return_value=mongo_store):
+            mongo_results, _ = update_records(names, plan)
+        memory_results, _ = update_records(names, plan)
+
+        self.assertEqual(mongo_results, memory_results)
+        self.assertEqual(sorted(mongo_store.written), ['missing', 'r0'])
+        self.assertTrue(all(not doc['pending_updates'] for doc in mongo_store.fake_collection.docs[1:]))
+        MemoryConfigStore._records.clear()
+
+    def test_only_unsupported_pipelines_turn_atomic_updates_off(self):
+        plan = compile_operations([{'category': 'A', 'op': 'edit', 'key': 'a', 'value': '2', 'caseSensitive': True}])
+        for code, atomic_updates in [(11600, True), (168, False)]:
+            store = FakeMongoConfigStore({'r': {'A': 'a 1;'}})
+            failure = OperationFailure('pipeline failed', code=code)
+            with mock.patch.object(store.fake_collection, 'update_many', side_effect=[None, failure]), \
+                    mock.patch('configs.store.logger'):
+                self.assertEqual(store.apply_plan(['r'], plan), {})
+            self.assertIs(store.atomic_updates, atomic_updates, code)
+
+    def test_stale_pending_updates_are_dropped(self):
+        plan = compile_operations([{'category': 'A', 'op': 'edit', 'key': 'a', 'value': '2', 'caseSensitive': True}])
+        store = FakeMongoConfigStore({'r1': {'A': 'a 1;'}, 'r2': {'A': 'a 1;'}})
+        # Left by calls whose process died before pulling their entries
+        stale = {'t': ObjectId.from_datetime(timezone.now() - timedelta(hours=2)), 'old': '{}', 'new': '{}'}
+        for doc in store.fake_collection.docs:
+            doc['pending_updates'] = [dict(stale)]
+
+        self.assertEqual(store.apply_plan(['r1'], plan), {'r1': ({'A': 'a 1;'}, {'A': 'a 2;'})})
+        self.assertEqual([doc['pending_updates'] for doc in store.fake_collection.docs], [[], []])
+
+
+@override_settings(CONFIG_HISTORY={'ENABLED': True, 'SNAPSHOT_EVERY': 3})
+class HistoryRoundTripTests(TestCase):
+    def test_configs_at_and_rollback(self):
+        store = get_config_store()
+        names = ['r1', 'r2', 'r3']
+        rng = random.Random(4)
+        states = {}
+
+        def remember():
+            states[store.version()] = store.get_many(names)
+
+        store.upsert_many({'r1': {'A': 'a 1;'}, 'r2': {'A': 'b 1;', 'B': 'c 1;'}})
+        remember()
+        for _ in range(8):
+            current = store.get_many(['r1', 'r2'])
+            updates = {name: apply_plan_to_config(config, compile_operations([random_operation(rng, 'A')]))
+                       for name, config in current.items()}
+            store.write_many(updates, {}, expected=current)
+            remember()
+        store.delete_many(['r2'])
+        remember()
+        store.upsert_many({'r3': {'C': 'k é;'}})
+        remember()
+
+        self.assertTrue(ConfigRevision.objects.filter(delta__isnull=False).exists())
+        for seq, configs in states.items():
+            with self.subTest(seq=seq):
+                # Records missing at seq map to None: history saw them created or deleted
+                self.assertEqual(configs_at(names, seq=seq), {name: configs.get(name) for name in names})
+
+        first = min(states)
+        results = rollback_records(names, first)
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(store.get_many(names), states[first])
+        self.assertEqual(configs_at(names, seq=store.version()), {name: states[first].get(name) for name in names})
+
+
+class ReadReplicaRouterTests(TestCase):
+    def test_only_record_reads_go_to_the_replica(self):
+        self.assertEqual(router.db_for_read(ConfigRecord), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(ConfigRecord), 'replica')
+            self.assertEqual(router.db_for_write(ConfigRecord), 'default')
+            for model in [TargetGroup, ConfigKey, CollectionVersion]:
+                self.assertEqual(router.db_for_read(model), 'default', model)
+            with override_settings(CONFIG_ROUTING={'READ_ALIAS': 'missing'}), replica_reads():
+                self.assertEqual(router.db_for_read(ConfigRecord), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'configs'))
+
+
+class IndexPageTests(ReplicaReadsMixin, TestCase):
+    def test_first_page_is_embedded_only_with_the_listing_cache(self):
+        get_config_store().upsert_many({'r1': {'A': 'a 1;'}, 'r2': {'A': 'a 2;'}})
+        with self.assertNumQueries(0, using='replica'), self.assertNumQueries(0):
+            response = self.client.get('/')
+        self.assertNotContains(response, 'id="initial-page"')
+
+        with override_settings(CONFIG_CACHE={'ENABLED': True, 'KEY_PREFIX': 'configs-index-test'}):
+            response = self.client.get('/')
+            page = json.loads(response.content.decode().split('id="initial-page" type="application/json">')[1]
+                              .split('</script>')[0])
+            self.assertEqual((page['start'], page['recordsTotal']), (0, 2))
+            self.assertEqual([row['name'] for row in page['data']], ['r1', 'r2'])
+            # The fragment is served from the cache until the next write
+            with self.assertNumQueries(0, using='replica'), self.assertNumQueries(0):
+                self.assertContains(self.client.get('/'), 'id="initial-page"')
+
+
+class ChangeFeedTests(ReplicaReadsMixin, TestCase):
+    def test_long_polls_are_opt_in(self):
+        store = get_config_store()
+        store.upsert_many({'r': {'A': 'a 1;'}})
+        since = store.version()
+        response = self.client.get('/')
+        self.assertContains(response, '<script id="change-feed" type="application/json">{"wait": 0, "interval": 10}')
+
+        with mock.patch.object(changes._changed, 'wait') as wait:
+            response = self.client.get('/api/changes/', {'since': since, 'wait': 25})
+        wait.assert_not_called()
+        self.assertEqual(response.json()['changes'], [])
+
+        with override_settings(CONFIG_CHANGES={'LONG_POLL': True, 'MAX_WAIT': 0.2}):
+            self.assertContains(self.client.get('/'), '{"wait": 0.2, "interval": 10}')
+            with mock.patch.object(changes._changed, 'wait') as wait:
+                self.client.get('/api/changes/', {'since': since, 'wait': 25})
+            wait.assert_called()
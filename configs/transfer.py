@@ -0,0 +1,119 @@
+import csv
+import json
+from itertools import islice
+
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Column headers of the CSV format; config holds the JSON-encoded config dict
+CSV_FIELDS = ['name', 'config']
+
+# Import errors reported back in detail; later ones are only counted
+MAX_REPORTED_ERRORS = 100
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+
+def export_ndjson(records):
+    """Yield one JSON line per (name, config) record"""
+    for name, config in records:
+        yield json.dumps({'name': name, 'config': config}) + '\n'
+
+
+def export_csv(records):
+    """Yield CSV lines, a header first, for (name, config) records"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_FIELDS)
+    for name, config in records:
+        yield writer.writerow([name, json.dumps(config)])
+
+
+def export_records(records, export_format):
+    if export_format == 'csv':
+        return export_csv(records)
+    return export_ndjson(records)
+
+
+def read_ndjson(lines):
+    """Yield (line_number, record) from NDJSON lines; blank lines are skipped"""
+    for line_number, line in enumerate(lines, start=1):
+        if line.strip():
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as exc:
+                yield line_number, exc
+
+
+def read_csv(lines):
+    """Yield (line_number, record) from CSV lines with a name,config header"""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        try:
+            yield reader.line_num, {'name': row.get('name'), 'config': json.loads(row.get('config') or '{}')}
+        except ValueError as exc:
+            yield reader.line_num, exc
+
+
+def validate_record(record):
+    """Return (name, config) for a valid record, raise ValueError otherwise"""
+    if isinstance(record, Exception):
+        raise ValueError(f'Invalid syntax: {record}')
+    if not isinstance(record, dict):
+        raise ValueError('Record must be an object with name and config')
+    name = record.get('name')
+    config = record.get('config')
+    if not isinstance(name, str) or not name.strip() or len(name) > 100:
+        raise ValueError('name must be a non-empty string of at most 100 characters')
+    if not isinstance(config, dict):
+        raise ValueError('config must be an object')
+    for category, value in config.items():
+        if not isinstance(value, str):
+            raise ValueError(f'config value of category {category!r} must be a string')
+    return name.strip(), config
+
+
+def import_records(rows, store, batch_size=1000):
+    """
+    Validate (line_number, record) rows and upsert them into the store in
+    batches, so memory use does not depend on the size of the input.
+    Returns {'imported': n, 'failed': n, 'errors': [{'line', 'name', 'error'}]}.
+    """
+    stats = {'imported': 0, 'failed': 0, 'errors': []}
+
+    def fail(line_number, name, error):
+        stats['failed'] += 1
+        if len(stats['errors']) < MAX_REPORTED_ERRORS:
+            stats['errors'].append({'line': line_number, 'name': name, 'error': error})
+
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        batch = {}
+        lines = {}
+        for line_number, record in chunk:
+            try:
+                name, config = validate_record(record)
+            except ValueError as exc:
+                fail(line_number, record.get('name') if isinstance(record, dict) else None, str(exc))
+                continue
+            # A later line for the same name wins, as it would in a later batch
+            batch[name] = config
+            lines[name] = line_number
+        if not batch:
+            continue
+
+        failures = store.upsert_many(batch)
+        stats['imported'] += len(batch) - len(failures)
+        for name, error in failures.items():
+            fail(lines[name], name, error)
+    return stats
@@ -0,0 +1,79 @@
+from .instrumentation import phase
+from .parallel import apply_plan_many
+from .previews import config_fingerprint
+from .store import WRITE_CONFLICT, get_config_store
+
+
+# Attempts at writing a record that keeps changing between read and compare-and-set
+MAX_WRITE_ATTEMPTS = 3
+
+
+def update_records(names, plan, preview=None, memo=None):
+    """
+    Apply a compiled plan to the named records and write them with compare-and-set.
+    Records still matching the fingerprint taken by a preview reuse the config it
+    computed; others are recomputed from their current config. Records that change
+    between read and write are re-read and recomputed, up to MAX_WRITE_ATTEMPTS.
+    Without a preview, stores that can apply the plan inside the database do so
+    first.
+    Returns (results in names order, number of records that reused the preview).
+    """
+    store = get_config_store()
+    memo = {} if memo is None else memo
+    results = {}
+    reused = 0
+    pending = list(names)
+
+    if preview is None:
+        with phase('db'):
+            applied = store.apply_plan(pending, plan)
+        for name, (old_config, new_config) in applied.items():
+            results[name] = {'name': name, 'success': True, 'old_config': old_config, 'new_config': new_config}
+        pending = [name for name in pending if name not in applied]
+
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        with phase('db'):
+            configs = store.get_many(pending)
+        updates = {}
+        creates = {}
+
+        with phase('apply'):
+            new_configs = {}
+            recompute = []
+            for name in pending:
+                old_config = configs.get(name)
+                if preview is not None and preview.fingerprints.get(name, False) == config_fingerprint(old_config):
+                    new_configs[name] = preview.new_configs[name]
+                    reused += 1
+                else:
+                    recompute.append(name)
+            # Large batches are sharded over the worker processes; writes stay here
+            new_configs.update(zip(recompute, apply_plan_many(
+                [configs.get(name) or {} for name in recompute], plan, create_categories=True, memo=memo
+            )))
+
+            for name in pending:
+                old_config = configs.get(name)
+                new_config = new_configs[name]
+                if old_config is None:
+                    creates[name] = new_config
+                else:
+                    updates[name] = new_config
+
+                results[name] = {
+                    'name': name,
+                    'success': True,
+                    'old_config': old_config or {},
+                    'new_config': new_config
+                }
+
+        with phase('db'):
+            failures = store.write_many(updates, creates, expected=configs)
+        pending = [name for name, error in failures.items() if error == WRITE_CONFLICT]
+        for name, error in failures.items():
+            results[name]['success'] = False
+            results[name]['error'] = error
+        if not pending:
+            break
+
+    return [results[name] for name in names], reused
@@ -5,5 +5,15 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('api/configs/', views.api_get_configs, name='api_get_configs'),
     path('api/preview/', views.api_preview_configs, name='api_preview_configs'),
+    path('api/preview/stream/', views.api_preview_stream, name='api_preview_stream'),
     path('api/update/', views.api_update_configs, name='api_update_configs'),
+    path('api/groups/', views.api_groups, name='api_groups'),
+    path('api/jobs/', views.api_submit_job, name='api_submit_job'),
+    path('api/jobs/<int:job_id>/', views.api_job_progress, name='api_job_progress'),
+    path('api/history/<str:name>/', views.api_config_history, name='api_config_history'),
+    path('api/rollback/', views.api_rollback_configs, name='api_rollback_configs'),
+    path('api/keys/search/', views.api_search_keys, name='api_search_keys'),
+    path('api/changes/', views.api_changes, name='api_changes'),
+    path('api/export/', views.api_export_configs, name='api_export_configs'),
+    path('api/metrics/', views.api_metrics, name='api_metrics'),
 ] 
\ No newline at end of file
@@ -1,391 +1,509 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from .models import ConfigRecord
+from django.views.decorators.http import condition
+from django.utils.dateparse import parse_datetime
+from django.utils.html import json_script
+from django.contrib.admin.views.decorators import staff_member_required
+from .models import TargetGroup, UpdateJob
+from .cache import cached_listing, cached_records, cached_version, get_cache_settings, stats as cache_stats
+from .changes import wait_for_changes, watch_options
+from .history import configs_at, list_revisions, rollback_records, seq_at
+from .keyindex import get_key_index_settings, search_keys
+from .instrumentation import aggregate, instrumented, phase, pool_stats
+from .jobs import get_job_settings, job_progress, submit_update_job
+from .operations import compile_operations, plan_operations
+from .parallel import preview_many
+from .previews import PreviewEntry, config_fingerprint, get_preview_cache, stream_chunks, stream_preview
+from .routing import iter_replica_reads, reads_from_replica
+from .selectors import compile_selector, select_page
+from .store import get_config_store
+from .transfer import EXPORT_FORMATS, export_records
+from .updates import update_records
 import json
-import re
 
 
+# Records embedded in the index page, DataTables' default page length
+INITIAL_PAGE_LENGTH = 10
+
+
+@reads_from_replica
 def index(request):
-    return render(request, 'configs/index.html')
+    # With the listing cache on, the first listing page is embedded so the
+    # table shows without another round trip. The rendered <script> fragment
+    # is cached per collection version, so a write makes the next render
+    # rebuild it. Without the cache every render would query the database,
+    # so the table fetches the page itself.
+    initial_page = ''
+    if get_cache_settings()['ENABLED']:
+        store = get_config_store()
+        version = cached_version(store)
 
+        def build():
+            page = listing_page(store, version, 0, INITIAL_PAGE_LENGTH, '', False, compact=True)
+            return json_script({'start': 0, 'length': INITIAL_PAGE_LENGTH, **page}, 'initial-page')
 
-def sanitize_key_value(key, value):
-    """
-    Sanitize key-value pairs (frontend validation already handled invalid data).
-    Returns (sanitized_key, sanitized_value)
-    """
-    # Strip whitespace
-    sanitized_key = key.strip() if key else ""
-    sanitized_value = value.strip() if value else ""
-    
-    return sanitized_key, sanitized_value
+        initial_page = cached_listing(version, ('index', INITIAL_PAGE_LENGTH), build)
+    return render(request, 'configs/index.html', {
+        'initial_page': initial_page,
+        'change_feed': json_script(watch_options(), 'change-feed'),
+    })
 
 
-def sanitize_operation(operation):
-    """
-    Sanitize a single operation (frontend validation already handled invalid data).
-    Returns sanitized_operation
-    """
-    # Basic sanitization - frontend validation already handled the rest
-    sanitized_operation = {
-        'category': operation['category'].strip(),
-        'op': operation['op'].strip(),
-        'key': operation['key'].strip() if operation['key'] else "",
-        'value': operation['value'].strip() if operation['value'] else "",
-        'caseSensitive': bool(operation['caseSensitive'])
+# Helper: Serialize a record for the listing table
+def serialize_config_record(name, config, compact=False):
+    if compact:
+        # The client builds the display string from the structured config
+        return {'name': name, 'config': config}
+    # Flatten categories for display: show as 'category1: ...; category2: ...'
+    config_str = '; '.join([f"{cat}: {val}" for cat, val in config.items()])
+    return {
+        'name': name,
+        'config': config_str,
+        'raw_config': config  # for modal preview
     }
-    
-    return sanitized_operation
 
 
+def is_compact(request):
+    return request.GET.get('compact', '0') not in ('', '0', 'false')
+
+
+def configs_etag(request, *args, **kwargs):
+    # Every write bumps the collection version, so it identifies the listing
+    # content; compact responses are a different representation
+    with phase('etag'):
+        version = cached_version(get_config_store())
+    return f'{version}-compact' if is_compact(request) else str(version)
+
+
+@instrumented('api_get_configs')
+@condition(etag_func=configs_etag)
+@reads_from_replica
 def api_get_configs(request):
-    records = ConfigRecord.objects.all()
-    data = []
-    for rec in records:
-        # Flatten categories for display: show as 'category1: ...; category2: ...'
-        config_str = '; '.join([f"{cat}: {val}" for cat, val in rec.config.items()])
-        data.append({
-            'name': rec.name,
-            'config': config_str,
-            'raw_config': rec.config  # for modal preview
-        })
-    return JsonResponse({'data': data})
-
-
-# Helper: Converts a config string to a key-value object
-def parse_config_string(config_str):
-    obj = {}
-    if config_str:
-        for pair in config_str.split(';'):
-            pair = pair.strip()
-            if pair:
-                parts = pair.split(' ', 1)
-                if len(parts) == 2:
-                    k, v = parts
-                    # Sanitize the key-value pair
-                    sanitized_key, sanitized_value = sanitize_key_value(k, v)
-                    if sanitized_key:  # Only add if key is not empty
-                        obj[sanitized_key] = sanitized_value
-                # Skip malformed pairs (no space separator)
-    return obj
-
-
-# Helper: Converts a key-value object to a config string
-def stringify_config_object(obj):
-    """Convert config object to string format with semicolon delimiter at the end"""
-    if not obj:
-        return ""  # Empty config returns empty string (no semicolon)
-    
-    # Sanitize and filter key-value pairs
-    valid_pairs = []
-    for k, v in obj.items():
-        sanitized_key, sanitized_value = sanitize_key_value(k, v)
-        if sanitized_key:  # Only include if key is not empty
-            valid_pairs.append(f"{sanitized_key} {sanitized_value}")
-    
-    if not valid_pairs:
-        return ""  # No valid pairs, return empty string
-    
-    # Join all valid key-value pairs with semicolon and add semicolon at the end
-    config_str = ';'.join(valid_pairs)
-    return config_str + ';'  # Add semicolon at the end for non-empty configs
-
-
-# Helper: Apply operations to config objects
-def apply_operations_to_config(config_obj, operations):
-    new_obj = config_obj.copy()
-    for operation in operations:
-        category = operation['category']
-        op = operation['op']
-        key = operation['key']
-        value = operation['value']
-        case_sensitive = operation['caseSensitive']
-        
-        if op == 'edit':
-            # Edit: Replace value if key exists, add if key doesn't exist
-            if case_sensitive:
-                if key in new_obj:
-                    new_obj[key] = value
-                else:
-                    new_obj[key] = value
-            else:
-                # Case insensitive: find existing key and replace, or add new
-                existing_key = None
-                for k in new_obj.keys():
-                    if k.lower() == key.lower():
-                        existing_key = k
-                        break
-                if existing_key:
-                    new_obj[existing_key] = value
-                else:
-                    new_obj[key] = value
-                    
-        elif op == 'append':
-            # Append: If key exists, add at end of existing value. If not, add new key
-            if case_sensitive:
-                if key in new_obj:
-                    # Append to existing value
-                    new_obj[key] = new_obj[key] + ' ' + value
-                else:
-                    # Add new key
-                    new_obj[key] = value
-            else:
-                # Case insensitive: find existing key and append, or add new
-                existing_key = None
-                for k in new_obj.keys():
-                    if k.lower() == key.lower():
-                        existing_key = k
-                        break
-                if existing_key:
-                    # Append to existing value
-                    new_obj[existing_key] = new_obj[existing_key] + ' ' + value
-                else:
-                    # Add new key
-                    new_obj[key] = value
-                    
-        elif op == 'delete':
-            if case_sensitive:
-                if key in new_obj:
-                    del new_obj[key]
-            else:
-                # Case insensitive delete
-                for k in list(new_obj.keys()):
-                    if k.lower() == key.lower():
-                        del new_obj[k]
-    return new_obj
-
-
-# Helper: Generate color-coded diff for formatted config strings
-def color_diff(old_formatted_str, new_formatted_str):
-    """Generate color-coded diff for config strings in format 'config1:"key1 value1;key2 value2;"'"""
-    
-    # Parse the formatted strings back to dictionaries
-    old_config = parse_formatted_config(old_formatted_str)
-    new_config = parse_formatted_config(new_formatted_str)
-    
-    html_parts = []
-    
-    # Process all categories in new config
-    for category in new_config:
-        if category not in old_config:
-            # New category added
-            config_str = new_config[category]
-            html_parts.append(f'<span class="added">{category}:"{config_str}"</span>')
-        else:
-            # Category exists in both, compare the config strings
-            old_config_str = old_config[category]
-            new_config_str = new_config[category]
-            
-            if old_config_str != new_config_str:
-                # Config changed, generate diff for this category
-                old_obj = parse_config_string(old_config_str)
-                new_obj = parse_config_string(new_config_str)
-                
-                category_html_parts = []
-                
-                # Process keys in new config
-                for k, v in new_obj.items():
-                    if k not in old_obj:
-                        # New key added - GREEN
-                        category_html_parts.append(f'<span class="added">{k} {v}</span>')
-                    elif old_obj[k] != v:
-                        # Check if this is an append operation (new value contains old value + more)
-                        if v.startswith(old_obj[k]) and len(v) > len(old_obj[k]):
-                            # Value was appended - PINK
-                            category_html_parts.append(f'<span class="appended">{k} {v}</span>')
-                        else:
-                            # Value was edited/changed - ORANGE
-                            category_html_parts.append(f'<span class="edited">{k} {v}</span>')
-                    else:
-                        # No change
-                        category_html_parts.append(f'{k} {v}')
-                
-                # Process keys that were deleted (in old but not in new)
-                for k, v in old_obj.items():
-                    if k not in new_obj:
-                        # Key was deleted - ORANGE
-                        category_html_parts.append(f'<span class="edited">{k} {v}</span>')
-                
-                category_diff = ';'.join(category_html_parts)
-                html_parts.append(f'{category}:"{category_diff}"')
-            else:
-                # No change in this category
-                html_parts.append(f'{category}:"{new_config_str}"')
-    
-    # Add categories that were deleted
-    for category in old_config:
-        if category not in new_config:
-            config_str = old_config[category]
-            html_parts.append(f'<span class="edited">{category}:"{config_str}"</span>')
-    
-    return '<br>'.join(html_parts)
+    # DataTables sends 'draw' with every server-side processing request
+    if 'draw' in request.GET:
+        return get_configs_page(request)
+
+    compact = is_compact(request)
+    store = get_config_store()
+
+    def build():
+        with phase('db'):
+            records = list(store.iter_records())
+        with phase('serialize'):
+            data = [serialize_config_record(name, config, compact) for name, config in records]
+            return JsonResponse({'data': data}).content
+
+    # The encoded listing is cached, a hit skips both the query and the encoding
+    content = cached_listing(cached_version(store), ('all', compact), build)
+    return HttpResponse(content, content_type='application/json')
+
+
+def get_configs_page(request):
+    """
+    Answer a DataTables server-side processing request: one page of records,
+    filtered on name and config text and ordered on name by the database.
+    """
+    params = request.GET
+    try:
+        draw = int(params.get('draw', 0))
+        start = max(int(params.get('start', 0)), 0)
+        length = int(params.get('length', 10))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid paging parameters'}, status=400)
+
+    search = params.get('search[value]', '').strip()
+    # Only the name column (index 0) is orderable
+    descending = params.get('order[0][column]', '0') == '0' and params.get('order[0][dir]') == 'desc'
+
+    store = get_config_store()
+    version = cached_version(store)
+    page = listing_page(store, version, start, length, search, descending, is_compact(request))
+    with phase('serialize'):
+        return JsonResponse({'draw': draw, **page})
+
+
+def listing_page(store, version, start, length, search, descending, compact):
+    """One page of records in the DataTables server-side format, cached per collection version"""
+    def build():
+        with phase('db'):
+            records_total = store.count()
+            records_filtered = store.count(search) if search else records_total
+            # A length of -1 means "show all" in DataTables
+            records = store.page(start, length, search=search, descending=descending)
+        return {
+            # Change feed position the page is current with, see api_changes
+            'version': version,
+            'recordsTotal': records_total,
+            'recordsFiltered': records_filtered,
+            'data': [serialize_config_record(name, config, compact) for name, config in records]
+        }
+
+    # draw only echoes the request, so it is not part of the cached page
+    return cached_listing(version, ('page', start, length, search, descending, compact), build)
 
-def parse_formatted_config(formatted_str):
-    """Parse formatted config string back to dictionary"""
-    if not formatted_str:
-        return {}
-    
-    config_dict = {}
-    
-    # Split by semicolon, line breaks, or <br> tags but be careful not to split inside quotes
-    # First replace <br> tags with newlines for easier parsing
-    formatted_str = formatted_str.replace('<br>', '\n')
-    
-    parts = []
-    current_part = ""
-    in_quotes = False
-    
-    for char in formatted_str:
-        if char == '"':
-            in_quotes = not in_quotes
-            current_part += char
-        elif (char == ';' or char == '\n') and not in_quotes:
-            if current_part.strip():
-                parts.append(current_part.strip())
-            current_part = ""
-        else:
-            current_part += char
-    
-    # Add the last part
-    if current_part.strip():
-        parts.append(current_part.strip())
-    
-    for part in parts:
-        if not part:
-            continue
-            
-        # Look for pattern: category:"config_string"
-        if ':"' in part and part.endswith('"'):
-            colon_quote_pos = part.find(':"')
-            category = part[:colon_quote_pos]
-            config_str = part[colon_quote_pos + 2:-1]  # Remove ':"' and '"'
-            config_dict[category] = config_str
-    
-    return config_dict
+
+def invalid_operations(exc):
+    # The front end lists 'details' under the error message
+    return JsonResponse({'error': 'Invalid operations', 'details': [str(exc)]}, status=400)
+
+
+def invalid_selector(exc):
+    return JsonResponse({'error': 'Invalid selector', 'details': [str(exc)]}, status=400)
 
 
 @csrf_exempt
+@instrumented('api_preview_configs')
+@reads_from_replica
 def api_preview_configs(request):
     if request.method == 'POST':
         body = json.loads(request.body)
         names = body.get('names', [])
         operations = body.get('operations', [])
+        # 'html' renders color-coded diffs, 'json' returns compact structured diffs
+        diff_format = body.get('format', 'html')
 
-        # Sanitize operations (frontend validation already handled invalid data)
-        sanitized_operations = []
-        for operation in operations:
-            sanitized_operations.append(sanitize_operation(operation))
-
-        preview_rows = []
+        # Sanitize and compile operations once for the whole request
+        try:
+            plan = compile_operations(operations)
+        except ValueError as exc:
+            return invalid_operations(exc)
 
-        for name in names:
+        # A selector targets the records matching it instead of explicit names;
+        # only one page of them (start, length) is previewed
+        selector = body.get('selector')
+        count = None
+        if selector:
             try:
-                rec = ConfigRecord.objects.get(name=name)
-                old_config = rec.config
-            except ConfigRecord.DoesNotExist:
-                old_config = {}
-
-            # Create a copy of old config for modification
-            new_config = old_config.copy()
-
-            # Group operations by category
-            category_operations = {}
-            for op in sanitized_operations:
-                category = op['category']
-                if category not in category_operations:
-                    category_operations[category] = []
-                category_operations[category].append(op)
-
-            # Apply operations to each category
-            for category, ops in category_operations.items():
-                old_config_str = new_config.get(category, '')
-                old_config_obj = parse_config_string(old_config_str)
-                
-                new_config_obj = apply_operations_to_config(old_config_obj, ops)
-                new_config[category] = stringify_config_object(new_config_obj)
-
-            # Convert configs to string format for display
-            old_config_str = format_config_for_display(old_config)
-            new_config_str = format_config_for_display(new_config)
-
-            preview_rows.append({
-                'name': name,
-                'old_config': old_config_str,
-                'new_config': color_diff(old_config_str, new_config_str)
-            })
+                start = max(int(body.get('start', 0)), 0)
+                length = int(body.get('length', 50))
+            except (TypeError, ValueError):
+                return JsonResponse({'error': 'Invalid paging parameters'}, status=400)
+            try:
+                compiled = compile_selector(selector)
+            except (TypeError, ValueError) as exc:
+                return invalid_selector(exc)
+            with phase('db'):
+                count, configs = select_page(get_config_store().select(compiled), start, length)
+            names = list(configs)
+        else:
+            with phase('db'):
+                # Submit compares fingerprints with the database, so a stale cached
+                # record only costs a recomputation there
+                configs = cached_records(get_config_store(), names)
 
-        return JsonResponse({'preview_rows': preview_rows})
+        # Records sharing identical category strings reuse the transform and
+        # key diff computed for the first of them. Large batches are sharded
+        # over the worker processes, which memoize per chunk.
+        memo = {}
+        submit_memo = {}
+        diff_memo = {}
+        items = [(name, configs.get(name, {})) for name in names]
+        preview_rows, submit_configs, distinct_diffs = preview_many(items, plan, diff_format, memo, submit_memo, diff_memo)
+        # Configs Submit will write. They only differ from the previewed ones
+        # when 'add' operations create missing categories.
+        submit_configs = dict(zip(names, submit_configs))
+
+        # Keep the computed configs so Submit can write them without recomputing.
+        # A selector preview only covers one page, so Submit resolves it again.
+        preview_token = None
+        if not selector:
+            unique_names = list(dict.fromkeys(names))
+            preview_token = get_preview_cache().add(PreviewEntry(
+                names=unique_names,
+                plan=plan,
+                fingerprints={name: config_fingerprint(configs.get(name)) for name in unique_names},
+                new_configs=submit_configs
+            ))
+
+        response = {
+            'preview_rows': preview_rows,
+            'preview_token': preview_token,
+            'distinct_inputs': len(memo),
+            'distinct_diffs': distinct_diffs
+        }
+        if selector:
+            response.update(count=count, start=start, length=length)
+        with phase('serialize'):
+            return JsonResponse(response)
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
-def format_config_for_display(config_dict):
-    """Convert config dictionary to string format like 'config1:"key1 value1;key2 value2;"'"""
-    if not config_dict:
-        return ""
-    
-    formatted_parts = []
-    for category, config_str in config_dict.items():
-        if config_str:  # Only include non-empty configs
-            formatted_parts.append(f'{category}:"{config_str}"')
-    
-    return '<br>'.join(formatted_parts)
+@csrf_exempt
+def api_preview_stream(request):
+    """
+    Preview like api_preview_configs, streamed as NDJSON lines while the rows
+    are computed (see stream_preview), so the first rows arrive in the same
+    time whatever the number of records. Selectors preview every matching
+    record rather than one page, and get a preview token too.
+    Served over ASGI, dvconfig.asgi runs each chunk in a worker thread.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+    body = json.loads(request.body)
+    diff_format = body.get('format', 'html')
+    try:
+        plan = compile_operations(body.get('operations', []))
+    except ValueError as exc:
+        return invalid_operations(exc)
+
+    store = get_config_store()
+    selector = body.get('selector')
+    if selector:
+        try:
+            compiled = compile_selector(selector)
+        except (TypeError, ValueError) as exc:
+            return invalid_selector(exc)
+        count = None
+        chunks = stream_chunks(store.select(compiled))
+    else:
+        names = body.get('names', [])
+        count = len(names)
+        version = cached_version(store)
+
+        def fetch(chunk):
+            configs = cached_records(store, chunk, version)
+            return [(name, configs.get(name)) for name in chunk]
+
+        chunks = map(fetch, stream_chunks(names))
+
+    # The records are read while the response streams, after this view returned
+    response = StreamingHttpResponse(
+        stream_preview(iter_replica_reads(chunks), plan, diff_format, count), content_type='application/x-ndjson'
+    )
+    # Proxies must pass the rows on as they come
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @csrf_exempt
+@instrumented('api_update_configs')
 def api_update_configs(request):
     if request.method == 'POST':
         body = json.loads(request.body)
         names = body.get('names', [])
         operations = body.get('operations', [])
         
-        # Sanitize operations (frontend validation already handled invalid data)
-        sanitized_operations = []
-        for operation in operations:
-            sanitized_operations.append(sanitize_operation(operation))
-        
-        results = []
+        # A preview token lets Submit write the configs computed by the preview
+        preview_token = body.get('preview_token')
+        preview = get_preview_cache().pop(preview_token) if preview_token else None
         
-        for name in names:
+        selector = body.get('selector')
+        if preview is not None:
+            names = preview.names
+            plan = preview.plan
+        elif preview_token and not operations:
+            return JsonResponse({'error': 'Preview expired, please preview again'}, status=409)
+        elif selector:
             try:
-                rec = ConfigRecord.objects.get(name=name)
-                old_config = rec.config.copy()
-            except ConfigRecord.DoesNotExist:
-                rec = ConfigRecord.objects.create(name=name, config={})
-                old_config = {}
-            
-            new_config = old_config.copy()
-            
-            # Group operations by category
-            category_operations = {}
-            for op in sanitized_operations:
-                category = op['category']
-                if category not in category_operations:
-                    category_operations[category] = []
-                category_operations[category].append(op)
-            
-            # Apply operations to each category
-            for category, ops in category_operations.items():
-                old_config_str = new_config.get(category, '')
-                old_config_obj = parse_config_string(old_config_str)
-                
-                if not new_config.get(category) and any(op['op'] == 'add' for op in ops):
-                    # Create new category for add operation
-                    add_op = next(op for op in ops if op['op'] == 'add')
-                    new_config[category] = stringify_config_object({add_op['key']: add_op['value']})
-                else:
-                    new_config_obj = apply_operations_to_config(old_config_obj, ops)
-                    new_config[category] = stringify_config_object(new_config_obj)
-            
-            rec.config = new_config
-            rec.save()
-            
-            results.append({
-                'name': name,
-                'success': True,
-                'old_config': old_config,
-                'new_config': new_config
-            })
+                compiled = compile_selector(selector)
+            except (TypeError, ValueError) as exc:
+                return invalid_selector(exc)
+            try:
+                plan = compile_operations(operations)
+            except ValueError as exc:
+                return invalid_operations(exc)
+            with phase('db'):
+                names = [name for name, _ in get_config_store().select(compiled)]
+        else:
+            # Sanitize and compile operations once for the whole request
+            try:
+                plan = compile_operations(operations)
+            except ValueError as exc:
+                return invalid_operations(exc)
+            # Each name is processed once, in the order it was requested
+            names = list(dict.fromkeys(names))
+        
+        # Large batches are queued for the worker pool instead of tying up this request
+        if len(names) > get_job_settings()['ASYNC_THRESHOLD']:
+            job = submit_update_job(names, plan_operations(plan))
+            return JsonResponse(job_progress(job, include_results=False), status=202)
+        
+        memo = {}
+        results, reused = update_records(names, plan, preview=preview, memo=memo)
         
-        return JsonResponse({'results': results})
+        with phase('serialize'):
+            return JsonResponse({
+                'count': len(names),
+                'results': results,
+                'preview_reused': reused,
+                'distinct_inputs': len(memo)
+            })
     
     return JsonResponse({'error': 'Invalid request'}, status=400)
+
+
+@csrf_exempt
+def api_submit_job(request):
+    if request.method == 'POST':
+        body = json.loads(request.body)
+        names = list(dict.fromkeys(body.get('names', [])))
+        try:
+            plan = compile_operations(body.get('operations', []))
+        except ValueError as exc:
+            return invalid_operations(exc)
+        chunk_size = body.get('chunk_size')
+        if chunk_size is not None:
+            try:
+                chunk_size = int(chunk_size)
+            except (TypeError, ValueError):
+                chunk_size = 0
+            if chunk_size < 1:
+                return JsonResponse({'error': 'chunk_size must be a positive integer'}, status=400)
+            chunk_size = min(chunk_size, get_job_settings()['MAX_CHUNK_SIZE'])
+        job = submit_update_job(names, plan_operations(plan), chunk_size=chunk_size)
+        return JsonResponse(job_progress(job, include_results=False), status=202)
+    return JsonResponse({'error': 'Invalid request'}, status=400)
+
+
+def api_job_progress(request, job_id):
+    try:
+        job = UpdateJob.objects.get(pk=job_id)
+    except UpdateJob.DoesNotExist:
+        return JsonResponse({'error': 'Job not found'}, status=404)
+    include_results = request.GET.get('results', '1') != '0'
+    return JsonResponse(job_progress(job, include_results=include_results))
+
+
+@staff_member_required
+def api_metrics(request):
+    """p50/p95/p99 phase timings per endpoint collected by the instrumentation"""
+    return JsonResponse({'endpoints': aggregate.snapshot(), 'cache': cache_stats.snapshot(), 'pool': pool_stats.snapshot()})
+
+
+def api_export_configs(request):
+    """Stream every record as NDJSON (default) or CSV without loading the collection in memory"""
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f'Unknown format, expected one of: {", ".join(EXPORT_FORMATS)}'}, status=400)
+    response = StreamingHttpResponse(
+        export_records(get_config_store().iter_records(), export_format),
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="configs.{export_format}"'
+    return response
+
+
+@instrumented('api_changes')
+def api_changes(request):
+    """
+    Records written after change sequence ?since=, with their current config
+    (null once deleted). With ?wait=seconds and CONFIG_CHANGES['LONG_POLL'] on,
+    the request is held until a write happens, so clients can long-poll the feed.
+    """
+    try:
+        since = int(request.GET.get('since', 0))
+        wait = float(request.GET.get('wait', 0))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid since or wait'}, status=400)
+
+    store = get_config_store()
+    with phase('wait'):
+        result = wait_for_changes(since, store, wait)
+    compact = is_compact(request)
+    with phase('db'):
+        configs = store.get_many(result['names'])
+    with phase('serialize'):
+        return JsonResponse({
+            'seq': result['seq'],
+            'reset': result['reset'],
+            'changes': [
+                serialize_config_record(name, configs[name], compact) if name in configs
+                else {'name': name, 'config': None, 'deleted': True}
+                for name in result['names']
+            ]
+        })
+
+
+def api_config_history(request, name):
+    """
+    Revisions of a record, or with ?revision=N or ?seq=N (a collection version)
+    its config at that point, rebuilt from the nearest snapshot.
+    """
+    try:
+        revision = int(request.GET['revision']) if 'revision' in request.GET else None
+        seq = int(request.GET['seq']) if 'seq' in request.GET else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid revision or seq'}, status=400)
+
+    if revision is None and seq is None:
+        return JsonResponse({'name': name, 'revisions': list_revisions(name)})
+    configs = configs_at([name], seq=seq, revision=revision)
+    if name not in configs:
+        return JsonResponse({'error': 'No history at that point'}, status=404)
+    return JsonResponse({'name': name, 'revision': revision, 'seq': seq, 'config': configs[name]})
+
+
+@csrf_exempt
+@instrumented('api_rollback_configs')
+def api_rollback_configs(request):
+    """Restore records to their configs as of a collection version (seq) or a time (at, ISO 8601)"""
+    if request.method == 'POST':
+        body = json.loads(request.body)
+        names = body.get('names', [])
+        if body.get('at'):
+            moment = parse_datetime(body['at'])
+            if moment is None:
+                return JsonResponse({'error': 'Invalid at'}, status=400)
+            seq = seq_at(moment)
+        else:
+            try:
+                seq = int(body['seq'])
+            except (KeyError, TypeError, ValueError):
+                return JsonResponse({'error': 'seq or at is required'}, status=400)
+
+        with phase('db'):
+            results = rollback_records(names, seq)
+        with phase('serialize'):
+            return JsonResponse({'seq': seq, 'results': results})
+    return JsonResponse({'error': 'Invalid request'}, status=400)
+
+
+@csrf_exempt
+def api_groups(request):
+    """List saved target groups, or save one ({name, selector}) on POST"""
+    if request.method == 'POST':
+        body = json.loads(request.body)
+        name = str(body.get('name') or '').strip()
+        if not name:
+            return JsonResponse({'error': 'Group name is required'}, status=400)
+        try:
+            compile_selector(body.get('selector'))
+        except (TypeError, ValueError) as exc:
+            return invalid_selector(exc)
+        TargetGroup.objects.update_or_create(name=name, defaults={'selector': body['selector']})
+        return JsonResponse({'name': name, 'selector': body['selector']}, status=201)
+    return JsonResponse({'groups': list(TargetGroup.objects.order_by('name').values('name', 'selector'))})
+
+
+@instrumented('api_search_keys')
+def api_search_keys(request):
+    """
+    Records setting a key, answered from the key index: ?key= (exact) or
+    ?key_prefix=, optionally narrowed by ?category= and ?value= (exact).
+    Paged with ?start= and ?length=. Keys match case-sensitively, and keys
+    longer than 255 characters are not indexed, so never found. Only served
+    while CONFIG_KEY_INDEX is enabled.
+    """
+    if not get_key_index_settings()['ENABLED']:
+        return JsonResponse({'error': 'The key index is disabled'}, status=404)
+    params = request.GET
+    if not any(params.get(lookup) for lookup in ('key', 'key_prefix')):
+        return JsonResponse({'error': 'key or key_prefix is required'}, status=400)
+    try:
+        start = max(int(params.get('start', 0)), 0)
+        length = min(max(int(params.get('length', 100)), 1), 1000)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid paging parameters'}, status=400)
+
+    queryset = search_keys(
+        category=params.get('category', ''),
+        key=params.get('key', ''),
+        key_prefix=params.get('key_prefix', ''),
+        value=params.get('value'),
+    )
+    with phase('db'):
+        count = queryset.count()
+        results = list(queryset.values('name', 'category', 'key', 'value')[start:start + length])
+    with phase('serialize'):
+        return JsonResponse({'count': count, 'start': start, 'results': results})
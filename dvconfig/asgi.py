@@ -8,9 +8,64 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 
-from django.core.asgi import get_asgi_application
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connections
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dvconfig.settings')
 
+
+class StreamingASGIHandler(ASGIHandler):
+    """
+    Django's ASGI handler iterates streaming responses on the event loop, so a
+    generator doing queries or computation (like the streamed preview) blocks
+    every other request until it is exhausted. This one advances each such
+    generator in a thread of its own, one part at a time, so streams neither
+    block the loop nor queue behind each other and the sync views.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        headers = [
+            (str(header).encode('ascii'), str(value).encode('latin1')) for header, value in response.items()
+        ]
+        headers.extend((b'Set-Cookie', c.output(header='').encode('ascii').strip()) for c in response.cookies.values())
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+
+        # One thread per stream keeps the generator's database connection in
+        # the thread that closes the response
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stream')
+        try:
+            parts = iter(response)
+            next_part = sync_to_async(next, thread_sensitive=False, executor=executor)
+            done = object()
+            while True:
+                part = await next_part(parts, done)
+                if part is done:
+                    break
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body'})
+        finally:
+            await sync_to_async(_close_response, thread_sensitive=False, executor=executor)(response)
+            executor.shutdown(wait=False)
+
+
+def _close_response(response):
+    response.close()
+    # The stream's thread goes away with its executor, so do its connections
+    connections.close_all()
+
+
+def get_asgi_application():
+    # Like django.core.asgi.get_asgi_application(), with the handler above
+    import django
+    django.setup(set_prefix=False)
+    return StreamingASGIHandler()
+
+
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # gzip, or brotli when the brotli package is installed
+    'configs.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -74,15 +77,165 @@ WSGI_APPLICATION = 'dvconfig.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Connection settings can be overridden from the environment:
+# - DVCONFIG_MONGO_HOST: MongoDB URI of the primary (or the replica set)
+# - DVCONFIG_MONGO_READ_HOST, DVCONFIG_MONGO_READ_PREFERENCE: where listing and
+#   preview reads go (see configs.routing); a secondary's URI, or the replica
+#   set URI with secondaryPreferred. A standalone server or a one-node replica
+#   set (mongod --replSet rs0) serves them from the primary.
+# - DVCONFIG_MONGO_POOL_SIZE, DVCONFIG_MONGO_MIN_POOL_SIZE, DVCONFIG_MONGO_MAX_IDLE_MS,
+#   DVCONFIG_MONGO_WAIT_QUEUE_TIMEOUT_MS: pymongo pool of every client
+# - DVCONFIG_CONN_MAX_AGE: seconds a request's connection is kept for the next
+#   ones, 0 to close it after every request
+MONGO_HOST = os.environ.get('DVCONFIG_MONGO_HOST', 'mongodb://localhost:27017/')
+MONGO_POOL_OPTIONS = {
+    'maxPoolSize': int(os.environ.get('DVCONFIG_MONGO_POOL_SIZE', 100)),
+    'minPoolSize': int(os.environ.get('DVCONFIG_MONGO_MIN_POOL_SIZE', 0)),
+    'maxIdleTimeMS': int(os.environ.get('DVCONFIG_MONGO_MAX_IDLE_MS', 300000)),
+    'waitQueueTimeoutMS': int(os.environ.get('DVCONFIG_MONGO_WAIT_QUEUE_TIMEOUT_MS', 10000)),
+}
+CONN_MAX_AGE = int(os.environ.get('DVCONFIG_CONN_MAX_AGE', 60))
+
 DATABASES = {
     'default': {
         'ENGINE': 'djongo',
         'NAME': 'dvconfigdb',
         'ENFORCE_SCHEMA': False,
+        'CONN_MAX_AGE': CONN_MAX_AGE,
         'CLIENT': {
-            'host': 'mongodb://localhost:27017/',
+            'host': MONGO_HOST,
+            **MONGO_POOL_OPTIONS,
+        },
+    },
+    # Read-only view of the same database, see DATABASE_ROUTERS
+    'replica': {
+        'ENGINE': 'djongo',
+        'NAME': 'dvconfigdb',
+        'ENFORCE_SCHEMA': False,
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CLIENT': {
+            'host': os.environ.get('DVCONFIG_MONGO_READ_HOST', MONGO_HOST),
+            'readPreference': os.environ.get('DVCONFIG_MONGO_READ_PREFERENCE', 'secondaryPreferred'),
+            **MONGO_POOL_OPTIONS,
+        },
+        'TEST': {
+            'MIRROR': 'default',
         },
-    }
+    },
+}
+
+# ConfigRecord reads of listings and previews go to CONFIG_ROUTING['READ_ALIAS']
+# (default 'replica'); writes, the reads updates compare against and metadata
+# reads (groups, key index, versions) stay on 'default'
+DATABASE_ROUTERS = ['configs.routing.ReadReplicaRouter']
+
+# Storage used by the configs app for ConfigRecords:
+# - configs.store.DjangoConfigStore: the Django ORM (djongo with the settings above)
+# - configs.store.MongoConfigStore: pymongo directly, skipping djongo's SQL translation
+#   (OPTIONS: host, db, collection, client_options; defaults come from DATABASES).
+#   With atomic_updates (default True), updates without pattern operations run
+#   as one update pipeline per batch inside MongoDB 4.4+ instead of read-modify-write
+# - configs.store.MemoryConfigStore: in-process dict for tests and local runs
+
+CONFIG_STORE = {
+    'BACKEND': 'configs.store.DjangoConfigStore',
+    'OPTIONS': {},
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Previews only, see CONFIG_PREVIEW_CACHE. Each holds at most
+    # CONFIG_JOBS['ASYNC_THRESHOLD'] configs, so MAX_ENTRIES bounds their
+    # memory (64 x 1000 configs here) without evicting the listing cache.
+    'previews': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'configs-previews',
+        'OPTIONS': {'MAX_ENTRIES': 64},
+    },
+}
+
+# Previews kept in the ALIAS entry of CACHES so Submit can write them without
+# recomputing. With several processes, point ALIAS at a shared cache (file,
+# memcached) with its own entry or size limit: a locmem preview is only found
+# by the process that made it.
+CONFIG_PREVIEW_CACHE = {
+    'ALIAS': 'previews',
+    'KEY_PREFIX': 'configs-preview',
+    'TTL': 600,
+}
+
+# Bulk updates larger than ASYNC_THRESHOLD names are queued as jobs and
+# processed in CHUNK_SIZE slices (clients may ask for up to MAX_CHUNK_SIZE) by
+# `manage.py run_update_worker`. Workers save results every PROGRESS_EVERY
+# names; a chunk without progress for STALE_AFTER seconds is reclaimed and
+# resumes after the last batch its worker started. The names of that batch are
+# reported as interrupted, never applied twice.
+CONFIG_JOBS = {
+    'ASYNC_THRESHOLD': 1000,
+    'CHUNK_SIZE': 500,
+    'MAX_CHUNK_SIZE': 5000,
+    'PROGRESS_EVERY': 100,
+    'STALE_AFTER': 600,
+}
+
+# Previews and updates of THRESHOLD records or more apply the operations in a
+# pool of WORKERS processes (one per CPU when None), CHUNK_SIZE records per task.
+# Updates larger than CONFIG_JOBS['ASYNC_THRESHOLD'] become jobs whose workers
+# apply PROGRESS_EVERY names at a time in-process, so THRESHOLD must stay at
+# or below ASYNC_THRESHOLD for updates to reach the pool.
+CONFIG_PARALLEL = {
+    'ENABLED': True,
+    'THRESHOLD': 1000,
+    'WORKERS': None,
+    'CHUNK_SIZE': 250,
+}
+
+# Read cache of config listings and records in the CACHES entry ALIAS (locmem
+# by default, or e.g. django.core.cache.backends.filebased.FileBasedCache).
+# Keys include the collection version, which every write bumps.
+CONFIG_CACHE = {
+    'ENABLED': False,
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'VERSION_TIMEOUT': 5,
+}
+
+# Feed of written record names served by /api/changes/, polled by the UI every
+# CLIENT_POLL_INTERVAL seconds. With LONG_POLL the UI long-polls it instead and
+# each request holds a server thread for up to MAX_WAIT seconds, so only turn
+# it on with a threaded WSGI server (sync views share one thread under ASGI).
+CONFIG_CHANGES = {
+    'RETAIN': 10000,
+    'MAX_NAMES': 1000,
+    'LONG_POLL': False,
+    'MAX_WAIT': 25,
+    'CLIENT_POLL_INTERVAL': 10,
+    'POLL_INTERVAL': 0.5,
+}
+
+# Record history kept as per-key deltas with a full snapshot every
+# SNAPSHOT_EVERY revisions (/api/history/<name>/, /api/rollback/)
+CONFIG_HISTORY = {
+    'ENABLED': True,
+    'SNAPSHOT_EVERY': 20,
+}
+
+# ConfigKey rows (record, category, key, value) for /api/keys/search/ and
+# selector key lookups. When enabled, every write replaces the rows of its
+# records in the same request, which slows bulk imports and generate_fleet;
+# run `manage.py rebuild_key_index` after turning it on. Searches match keys
+# case-sensitively and skip keys longer than 255 characters.
+CONFIG_KEY_INDEX = {
+    'ENABLED': False,
+}
+
+# Per-phase timing of the config API views: Server-Timing headers, JSON log lines
+# on the 'configs.instrumentation' logger and percentiles at /api/metrics/
+CONFIG_INSTRUMENTATION = {
+    'ENABLED': False,
+    'SAMPLES': 1000,
 }
 
 